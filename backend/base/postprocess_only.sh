@@ -198,6 +198,12 @@ if [ $? -ne 0 ]; then
   exit 1
 fi
 
+# XYZ 瓦片金字塔（前端按视野加载）；失败不影响整体结果
+emit_progress 80 "precompute_visualization"
+if ! python3 "${UTILS_DIR}/precompute_tiles.py" --caseId "${CASE_ID}"; then
+  echo "[Warning] precompute_tiles.py 失败，跳过瓦片生成"
+fi
+
 emit_progress 100 "precompute_visualization"
 echo "=== 可视化预计算完成 ==="
 sleep 1
@@ -183,8 +183,10 @@ emit_progress 50 "modeling"
 sleep 1
 
 # Step 6: Execute buildTerrain.py
+# MESH_WRITER=polyMesh 时 buildTerrain 直接写出 constant/polyMesh，跳过 output.neu 与 gambitToFoam
+MESH_WRITER="${MESH_WRITER:-neu}"
 emit_task_start "build_terrain"
-python3 ../../../base/solver/buildTerrain.py
+python3 ../../../base/solver/buildTerrain.py --writer "${MESH_WRITER}"
 if [ $? -ne 0 ]; then
   echo "{\"action\":\"progress\", \"progress\": \"ERROR\", \"taskId\":\"build_terrain\"}"
   exit 1
@@ -204,7 +206,11 @@ sleep 1
 
 # Step 8: Execute gambitToFoam
 emit_task_start "gambit_to_foam"
-gambitToFoam output.neu
+if [ "${MESH_WRITER}" = "polyMesh" ]; then
+  echo "[Info] 已直接写出 constant/polyMesh，跳过 gambitToFoam"
+else
+  gambitToFoam output.neu
+fi
 emit_progress 80 "gambit_to_foam"
 sleep 1
 
@@ -248,13 +254,16 @@ sleep 1
 # Step 12: Reconstruct and post-process
 emit_task_start "post_process"
 reconstructPar
+# postFoam 同时写出文本与二进制高度层（Output/plt/<h>.bin），post.py 优先读取二进制
+export POSTFOAM_FORMAT="${POSTFOAM_FORMAT:-both}"
 postFoam
 emit_progress 100 "post_process"
 sleep 1
 
 # Final step: Execute post.py
 emit_task_start "execute_post_script"
-python3 ../../../base/solver/post.py
+# 各高度层相互独立，MPI 求解结束后用全部核并行插值（POST_WORKERS 可覆盖）
+python3 ../../../base/solver/post.py --workers "${POST_WORKERS:-${num_cores}}"
 emit_progress 100 "execute_post_script"
 sleep 1
 
@@ -563,6 +572,12 @@ if [ $? -ne 0 ]; then
   exit 1
 fi
 
+# XYZ 瓦片金字塔（前端按视野加载）；失败不影响整体结果
+emit_progress 80 "precompute_visualization"
+if ! python3 "${UTILS_DIR}/precompute_tiles.py" --caseId "${CASE_ID}"; then
+  echo "[Warning] precompute_tiles.py 失败，跳过瓦片生成"
+fi
+
 emit_progress 100 "precompute_visualization"
 echo "=== 可视化预计算完成 ==="
 sleep 1
@@ -69,9 +69,12 @@ emit_progress 15 "template_configs"
 emit_task_start "meshing_pipeline"
 python3 ../../../base/solver/makeGmsh.py
 gmsh -3 modeling.geo -o flat.msh
-python3 ../../../base/solver/buildTerrain.py
+MESH_WRITER="${MESH_WRITER:-neu}"
+python3 ../../../base/solver/buildTerrain.py --writer "${MESH_WRITER}"
 python3 ../../../base/solver/makeInput.py
-gambitToFoam output.neu
+if [ "${MESH_WRITER}" != "polyMesh" ]; then
+  gambitToFoam output.neu
+fi
 emit_progress 50 "meshing_pipeline"
 
 emit_task_start "finalize_mesh"
@@ -97,11 +100,14 @@ reconstructPar
 echo "--- 执行 C++ postFoam ---"
 mkdir -p ./Input ./Output/plt
 cp ../info.json ./Input/input.json
+# postFoam 同时写出文本与二进制高度层（Output/plt/<h>.bin），post.py 优先读取二进制
+export POSTFOAM_FORMAT="${POSTFOAM_FORMAT:-both}"
 postFoam
 
 # 执行 Python 后处理器以生成最终文件
 echo "--- 执行 Python post.py ---"
-python3 ../../../base/solver/post.py
+# 各高度层相互独立，MPI 求解结束后用全部核并行插值（POST_WORKERS 可覆盖）
+python3 ../../../base/solver/post.py --workers "${POST_WORKERS:-${num_cores}}"
 
 
 echo "=== 后处理完成 ==="
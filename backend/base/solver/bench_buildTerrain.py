@@ -0,0 +1,172 @@
+# @Description: buildTerrain 基准测试：在合成算例上对比 legacy 与 numpy 模式的耗时，并校验 output.neu 逐字节一致
+#   --reference 另与改动前的实现比较：可以是旧版 buildTerrain.py（在同一合成算例上运行），
+#   也可以是同样参数下冻结的 output.neu（--save-reference 写出）
+#
+# 用法：python3 bench_buildTerrain.py --n 200 --layers 30 --dtype float32
+#       git show 313718c:backend/base/solver/buildTerrain.py > /tmp/buildTerrain_ref.py
+#       python3 bench_buildTerrain.py --size 777 --dtype float64 --reference /tmp/buildTerrain_ref.py
+
+import argparse
+import filecmp
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy
+import rasterio
+from rasterio.transform import from_bounds
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import buildTerrain as bt  # noqa: E402
+
+passTimings = {}
+
+
+def timed(name, func):
+    """包装 buildTerrain 内部的单个处理阶段以统计耗时"""
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            passTimings[name] = time.perf_counter() - t0
+    return wrapper
+
+
+bt.writeNodesLegacy = timed('nodes', bt.writeNodesLegacy)
+bt.writeNodesBlock = timed('nodes', bt.writeNodesBlock)
+bt.writeElementsLegacy = timed('elements', bt.writeElementsLegacy)
+bt.writeElementsBlock = timed('elements', bt.writeElementsBlock)
+
+
+def makeTerrain(path, dtype, size=400, seed=0):
+    """生成带随机起伏的 EPSG:4326 地形 tif（约 22km × 22km）"""
+    rng = numpy.random.default_rng(seed)
+    yy, xx = numpy.mgrid[0:size, 0:size] / size
+    dem = 300 + 200 * numpy.sin(6 * xx) * numpy.cos(4 * yy) + 5 * rng.standard_normal((size, size))
+    transform = from_bounds(111.9, 28.25, 112.1, 28.45, size, size)
+    with rasterio.open(path, 'w', driver='GTiff', width=size, height=size, count=1,
+                       dtype=dtype, crs='EPSG:4326', transform=transform) as dst:
+        dst.write(dem.astype(dtype), 1)
+
+
+def makeMesh(path, n, layers, lt, h, num_center):
+    """生成与 gmsh msh2 结构一致的分层三棱柱网格（底层节点在前，逐层写出）"""
+    aa = lt / 2
+    xs = numpy.linspace(-aa, aa, n)
+    gx, gy = numpy.meshgrid(xs, xs)
+    levels = h * (numpy.arange(layers + 1) / layers) ** 1.5
+    nbot = n * n
+    with open(path, 'w') as f:
+        f.write('$MeshFormat\n2.2 0 8\n$EndMeshFormat\n$Nodes\n')
+        f.write('%d\n' % (num_center + nbot * (layers + 1)))
+        for c in range(num_center):
+            f.write('%d 0 0 0\n' % (c + 1))
+        nid = num_center + 1
+        for oz in levels:
+            ids = numpy.arange(nid, nid + nbot)
+            block = numpy.column_stack([ids, gx.ravel(), gy.ravel(), numpy.full(nbot, oz)])
+            numpy.savetxt(f, block, fmt=['%d', '%.17g', '%.17g', '%.17g'])
+            nid += nbot
+
+        a = (numpy.arange(n - 1)[None, :] + n * numpy.arange(n - 1)[:, None]).ravel()
+        tris = numpy.concatenate([numpy.column_stack([a, a + 1, a + n + 1]),
+                                  numpy.column_stack([a, a + n + 1, a + n])])
+        ntri = len(tris)
+        f.write('$EndNodes\n$Elements\n%d\n' % (1 + ntri * layers))
+        f.write('1 15 2 0 1 1\n')
+        eid = 2
+        for k in range(layers):
+            lo = tris + num_center + 1 + k * nbot
+            prisms = numpy.column_stack([numpy.arange(eid, eid + ntri), numpy.full(ntri, 6),
+                                         numpy.full(ntri, 2), numpy.zeros(ntri, int), numpy.ones(ntri, int),
+                                         lo, lo + nbot])
+            numpy.savetxt(f, prisms, fmt='%d')
+            eid += ntri
+        f.write('$EndElements\n')
+
+
+def runReference(path, inp):
+    """在当前目录运行旧版 buildTerrain.py，返回其 output.neu 的新文件名"""
+    spec = importlib.util.spec_from_file_location('buildTerrain_reference', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    t0 = time.perf_counter()
+    module.buildTerrain(inp)
+    print('\nreference 总计 %.2f s' % (time.perf_counter() - t0))
+    os.replace('output.neu', 'output.reference.neu')
+    return 'output.reference.neu'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='buildTerrain legacy/numpy 基准测试')
+    parser.add_argument('--n', type=int, default=150, help='底层每边节点数')
+    parser.add_argument('--layers', type=int, default=20, help='竖向单元层数')
+    parser.add_argument('--dtype', default='float32', help='合成 DEM 的数据类型')
+    parser.add_argument('--size', type=int, default=400, help='合成 DEM 每边像素数')
+    parser.add_argument('--seed', type=int, default=0, help='合成 DEM 的随机种子')
+    parser.add_argument('--reference', help='旧版 buildTerrain.py，或同样参数下冻结的 output.neu')
+    parser.add_argument('--save-reference', help='将 --reference 脚本生成的 output.neu 另存到该路径')
+    parser.add_argument('--modes', nargs='+', default=['legacy', 'numpy'])
+    parser.add_argument('--polymesh', action='store_true', help='同时测试直接写出 binary polyMesh 的耗时')
+    args = parser.parse_args()
+
+    inp = {
+        'domain': {'lt': 10000, 'h': 3000},
+        'mesh': {'tr1': 3000, 'tr2': 4500, 'scale': 0.001},
+        'wind': {'angle': 30},
+        'turbines': [{}, {}],
+    }
+    reference = os.path.abspath(args.reference) if args.reference else None
+    saveReference = os.path.abspath(args.save_reference) if args.save_reference else None
+    root = tempfile.mkdtemp(prefix='bench_buildTerrain_')
+    cwd = os.getcwd()
+    try:
+        run = os.path.join(root, 'run')
+        os.makedirs(run)
+        makeTerrain(os.path.join(root, 'terrain.tif'), args.dtype, args.size, args.seed)
+        makeMesh(os.path.join(run, 'flat.msh'), args.n, args.layers,
+                 inp['domain']['lt'], inp['domain']['h'], len(inp['turbines']))
+        os.chdir(run)
+        nodes = args.n * args.n * (args.layers + 1)
+        print('合成网格: %d 节点, %d 单元' % (nodes, 2 * (args.n - 1) ** 2 * args.layers))
+
+        timings = {}
+        for mode in args.modes:
+            t0 = time.perf_counter()
+            bt.buildTerrain(inp, mode=mode)
+            timings[mode] = (time.perf_counter() - t0, dict(passTimings))
+            os.replace('output.neu', 'output.%s.neu' % mode)
+        if reference and reference.endswith('.py'):
+            reference = runReference(reference, inp)
+            if saveReference:
+                shutil.copyfile(reference, saveReference)
+
+        if args.polymesh:
+            t0 = time.perf_counter()
+            bt.buildTerrain(inp, writer='polyMesh', binary=True)
+            print('\npolyMesh (binary) 总计 %.2f s' % (time.perf_counter() - t0))
+
+        print()
+        for mode, (t, passes) in timings.items():
+            print('%-8s 总计 %8.2f s | 节点段 %8.2f s (%.0f 节点/s) | 单元段 %8.2f s'
+                  % (mode, t, passes['nodes'], nodes / passes['nodes'], passes['elements']))
+        pairs = [(args.modes[0], mode) for mode in args.modes[1:]]
+        if reference:
+            pairs = [('reference', mode) for mode in args.modes] + pairs
+        for a, b in pairs:
+            ref = reference if a == 'reference' else 'output.%s.neu' % a
+            same = filecmp.cmp(ref, 'output.%s.neu' % b, shallow=False)
+            print('%s vs %s: %s' % (a, b, '逐字节一致' if same else '不一致!'))
+            if not same:
+                sys.exit(1)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
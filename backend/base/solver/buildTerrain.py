@@ -7,11 +7,15 @@
 # 
 # Copyright (c) 2025 by joe, All Rights Reserved.
 
+import itertools
 import math
+import subprocess
+import sys
 import numpy
 from shapely.geometry import Point
 from utils.interpolate import linearInterpolate
-import rasterio
+from utils.polyMesh import buildPolyMesh, writePolyMesh, readPolyMesh, comparePolyMesh
+from utils.terrain import TerrainSampler, RAD_PER_DEG
 
 
 def binarySearch(arr, l, r, x):
@@ -26,11 +30,298 @@ def binarySearch(arr, l, r, x):
     else:
         return -1
 
-# @jit
-def buildTerrain(inp):
-    EARTH_RADIUS = 6371
-    RAD_PER_DEG = math.pi / 180
+# 节点分块大小（行），分块读取 $Nodes 段并向量化计算
+NODE_CHUNK = 200000
+NODE_FORMAT = '%10d%20.11e%20.11e%20.11e\n'
+# 单元分块大小（行，须为 10 的倍数以对齐 ELEMENT GROUP 换行）
+ELEMENT_CHUNK = 200000
+# 单元行：编号、类型 5（三棱柱）、节点数 6、6 个节点编号
+ELEMENT_FORMAT = '%8d  5  6%8d%8d%8d%8d%8d%8d\n'
+BOUNDARY_FORMAT = '%10d %4d %4d\n'
+SIDE_PATCHES = ('inlet', 'outlet', 'front', 'back')
+
+
+def writeNodesLegacy(msh, out, np, terrain):
+    """逐节点处理 $Nodes 段（原始实现，保留作为 numpy 模式的对照基准）"""
+    lt, h, r1, r2 = terrain['lt'], terrain['h'], terrain['r1'], terrain['r2']
+    windAngle, scale = terrain['windAngle'], terrain['scale']
+    geodata, zeroElevation = terrain['geodata'], terrain['zeroElevation']
+    xmin, xmax, ymin, ymax = terrain['xmin'], terrain['xmax'], terrain['ymin'], terrain['ymax']
+    xnum, ynum = terrain['xnum'], terrain['ynum']
+    center = Point(0, 0)
+
+    p_bot = {}   # 底层节点 { (x, y) ： (el, flr) }
+    aa = lt / 2  # 半边长，最大（边界）xy坐标值
+    # 边界编号（原msh文件）
+    p_inlet, p_outlet, p_front, p_back = numpy.empty((4,0))
+    # 建筑编号（原msh文件）
+    p_building = []
+    for ip in range(0, np):
+        if ip % 10000 == 0: print('writting points %dw/%dw' % (ip / 10000, np / 10000), end='\r')
+        i, x, y, oz = map(float, msh.readline().split())
+        i = int(i)
+        if oz == 0:
+            p = Point(x, y)
+            distance = p.distance(center)
+            # 计算高程
+            if distance < r2:
+                px = x * math.cos(windAngle) + y * math.sin(windAngle)
+                py = y * math.cos(windAngle) - x * math.sin(windAngle)
+                el = linearInterpolate([
+                    ((px - xmin) / (xmax - xmin)) * (xnum - 1),
+                    ((ymax - py) / (ymax - ymin)) * (ynum - 1),
+                ], lambda ix, iy: geodata[iy][ix] if ix >= 0 and ix < xnum and iy >= 0 and iy < ynum else zeroElevation) - zeroElevation
+            else:
+                el = 0
+            if distance > r1 and distance < r2:
+                el = el * (r2 - distance) / (r2 - r1)
+            # 建筑层数
+            flr = 0
+            p_bot.update({(float(x), float(y)):  (el, flr)})   # 统计底层节点
+        else:
+            el, flr = p_bot[(float(x), float(y))]
+        # 保存边界点编号
+        if x == -aa:
+            p_inlet = numpy.append(p_inlet, i)
+        if x == aa:
+            p_outlet = numpy.append(p_outlet, i)
+        if y == aa:
+            p_back = numpy.append(p_back, i)
+        if y == -aa:
+            p_front = numpy.append(p_front, i)
+        z = (oz * (h - el)) / h + el
+        # 保存建筑编号
+        if flr > 0 and z - el < flr * FLOOR_HEIGHT:
+            p_building.append(i)
+        # 写入节点
+        out.write('%10d%20.11e%20.11e%20.11e\n' %
+                  (i - 1, *[v * scale for v in (x, y, z)]))
+    return len(p_bot), (p_inlet, p_outlet, p_front, p_back)
+
+
+def elevationBlock(x, y, terrain):
+    """
+    向量化计算底层节点高程，逐元素复现 writeNodesLegacy 中的标量运算顺序与 dtype，
+    保证输出与逐点实现完全一致。返回 (el, near)：near 为 distance < r2 的掩码，
+    el 仅在 near 处有效（其余节点 legacy 中 el 为整数 0）。
+    """
+    r1, r2 = terrain['r1'], terrain['r2']
+    sampler, zeroElevation, work = terrain['sampler'], terrain['zeroElevation'], terrain['work']
+
+    distance = numpy.sqrt(x * x + y * y)
+    near = distance < r2
+    x, y, distance = x[near], y[near], distance[near]
+
+    el = sampler.sample(x, y, fill=zeroElevation, dtype=work) - work.type(zeroElevation)
+    # 过渡区线性衰减
+    blend = distance > r1
+    el[blend] = el[blend] * (r2 - distance[blend]).astype(work) / work.type(r2 - r1)
+    return el, near
+
+
+def writeNodesBlock(msh, out, np, terrain, collect=None):
+    """
+    分块读取 $Nodes 段，向量化计算高程与 z 映射，并批量格式化写出。
+    out 为 None 时不写 output.neu；collect 为列表时追加每块的 (节点编号, 缩放后坐标)。
+    """
+    lt, h, scale, work = terrain['lt'], terrain['h'], terrain['scale'], terrain['work']
+    aa = lt / 2  # 半边长，最大（边界）xy坐标值
+    bounds = [[], [], [], []]  # inlet, outlet, front, back
+    bot = []
+    for start in range(0, np, NODE_CHUNK):
+        count = min(NODE_CHUNK, np - start)
+        print('writting points %dw/%dw' % (start / 10000, np / 10000), end='\r')
+        data = numpy.loadtxt(itertools.islice(msh, count), dtype=numpy.float64, ndmin=2)
+        if data.shape[0] != count:
+            raise RuntimeError("flat.msh 在读取 Nodes 时意外结束（文件可能不完整）")
+        i, x, y, oz = data.T
+        i = i.astype(numpy.int64)
+
+        # 上层节点与同 (x, y) 的底层节点高程相同，直接按 (x, y) 计算
+        el, near = elevationBlock(x, y, terrain)
+        isBot = oz == 0
+        bot.append(numpy.stack([x[isBot], y[isBot]], axis=1) + 0.0)
+
+        # 保存边界点编号
+        for k, mask in enumerate((x == -aa, x == aa, y == -aa, y == aa)):
+            bounds[k].append(i[mask].astype(numpy.float64))
+
+        # el 为 0 的节点按 float64 计算，其余按高程数据类型计算
+        z = (oz * (h - 0)) / h + 0
+        z = z * scale
+        ozn = oz[near].astype(work)
+        hw = work.type(h)
+        z[near] = ((ozn * (hw - el)) / hw + el) * work.type(scale)
+
+        if collect is not None:
+            collect.append((i, numpy.column_stack([x * scale, y * scale, z])))
+        # 写入节点
+        if out is not None:
+            rows = zip((i - 1).tolist(), (x * scale).tolist(), (y * scale).tolist(), z.tolist())
+            out.write((NODE_FORMAT * count) % tuple(itertools.chain.from_iterable(rows)))
+
+    num_bot_p = len(numpy.unique(numpy.concatenate(bot), axis=0)) if bot else 0
+    p_inlet, p_outlet, p_front, p_back = [numpy.concatenate(b) if b else numpy.empty(0) for b in bounds]
+    return num_bot_p, (p_inlet, p_outlet, p_front, p_back)
+
+
+def writeElementsLegacy(msh, out, nele, p_bounds):
+    """逐单元处理 $Elements 段（原始实现，保留作为 numpy 模式的对照基准）"""
+    p_inlet, p_outlet, p_front, p_back = p_bounds
+    numtri = 0  # 统计单元个数
+    # 边界单元（原msh文件）
+    e_inlet, e_outlet, e_front, e_back = [], [], [], []
+    for iele in range(0, nele):
+        if iele % 10000 == 0: print('writting elemnets %dw/%dw' % (iele / 10000, nele / 10000), end='\r')
+        line = msh.readline()
+        if not line:
+            raise RuntimeError("flat.msh 在读取 Elements 时意外结束（文件可能不完整：gmsh 被系统终止或写入失败）")
+        data = [*map(int, line.split())]
+        if len(data) < 3:
+            raise RuntimeError(f"flat.msh 元素行格式错误（列数不足）：{line.strip()[:200]}")
+
+        if data[1] != 6:
+            continue
+
+        num_tags = data[2]
+        node_start = 3 + num_tags
+        if len(data) < node_start + 6:
+            raise RuntimeError(
+                "flat.msh 元素行不完整（可能 gmsh 被系统终止或网格文件损坏）。"
+                f" 期望至少 {node_start + 6} 列，实际 {len(data)} 列。行内容：{line.strip()[:200]}"
+            )
+
+        nodes = data[node_start:node_start + 6]
+
+        numtri = numtri + 1
+        out.write('%8d%3d%3d' % (numtri, 5, 6) +
+                  ''.join(['%8d' % (v - 1) for v in (nodes[3], nodes[5], nodes[4], nodes[0], nodes[2], nodes[1])]) + '\n')
+        # 判断单元是否在边界上
+        for p_bound, e_bound in [(p_inlet, e_inlet), (p_outlet, e_outlet),
+                                 (p_front, e_front), (p_back, e_back)]:
+            a1, a2, a3 = [binarySearch(p_bound, 0, p_bound.size - 1, v) >= 0 for v in (nodes[3], nodes[5], nodes[4])]
+            numface = 1 if a1 and a2 else \
+                3 if a1 and a3 else \
+                2 if a2 and a3 else 0
+            if numface > 0:
+                e_bound.append((numtri, numface))
+
+    return numtri, (e_inlet, e_outlet, e_front, e_back)
+
+
+def parsePrismLine(line):
+    """解析单行三棱柱单元，返回 6 个节点编号（与逐单元实现的校验一致）"""
+    data = [*map(int, line.split())]
+    num_tags = data[2]
+    node_start = 3 + num_tags
+    if len(data) < node_start + 6:
+        raise RuntimeError(
+            "flat.msh 元素行不完整（可能 gmsh 被系统终止或网格文件损坏）。"
+            f" 期望至少 {node_start + 6} 列，实际 {len(data)} 列。行内容：{line.strip()[:200]}"
+        )
+    return data[node_start:node_start + 6]
+
+
+def readPrisms(lines):
+    """从一块元素行中筛出三棱柱（类型 6）单元，返回 (k, 6) 的节点编号数组"""
+    prisms = []
+    for line in lines:
+        head = line.split(None, 3)
+        if len(head) < 3:
+            raise RuntimeError(f"flat.msh 元素行格式错误（列数不足）：{line.strip()[:200]}")
+        if int(head[1]) == 6:
+            prisms.append(line)
+    if not prisms:
+        return numpy.empty((0, 6), dtype=numpy.int64)
+    try:
+        data = numpy.loadtxt(prisms, dtype=numpy.int64, ndmin=2)
+    except ValueError:
+        data = None
+    # 标签数不一致或列数不足时逐行解析（并给出与逐单元实现相同的错误信息）
+    if data is None or (data[:, 2] != data[0, 2]).any() or data.shape[1] < 9 + data[0, 2]:
+        return numpy.array([parsePrismLine(line) for line in prisms], dtype=numpy.int64)
+    node_start = 3 + int(data[0, 2])
+    return data[:, node_start:node_start + 6]
+
+
+def isMember(mask, ids):
+    """按节点编号查询布尔掩码，越界编号视为不在集合中"""
+    hit = numpy.zeros(ids.shape, dtype=bool)
+    inside = (ids >= 0) & (ids < mask.size)
+    hit[inside] = mask[ids[inside]]
+    return hit
+
+
+def writeElementsBlock(msh, out, nele, p_bounds, numNodes, collect=None):
+    """
+    分块读取 $Elements 段：边界节点预先展开为按节点编号索引的布尔掩码，
+    单元写出与边界面（1/2/3）判定均按连接数组向量化完成。
+    out 为 None 时不写 output.neu；collect 为列表时追加每块 Gambit 节点顺序的单元连接（msh 节点编号）。
+    """
+    masks = []
+    for p_bound in p_bounds:
+        ids = p_bound.astype(numpy.int64)
+        mask = numpy.zeros(max(numNodes, int(ids.max(initial=0))) + 1, dtype=bool)
+        mask[ids] = True
+        masks.append(mask)
 
+    numtri = 0  # 统计单元个数
+    # 边界单元（原msh文件），每项为 (单元编号, 面编号) 数组
+    e_bounds = [[], [], [], []]
+    for start in range(0, nele, ELEMENT_CHUNK):
+        count = min(ELEMENT_CHUNK, nele - start)
+        print('writting elemnets %dw/%dw' % (start / 10000, nele / 10000), end='\r')
+        lines = list(itertools.islice(msh, count))
+        if len(lines) < count:
+            raise RuntimeError("flat.msh 在读取 Elements 时意外结束（文件可能不完整：gmsh 被系统终止或写入失败）")
+        nodes = readPrisms(lines)
+        k = len(nodes)
+        if k == 0:
+            continue
+
+        ids = numpy.arange(numtri + 1, numtri + k + 1, dtype=numpy.int64)
+        cell = nodes[:, [3, 5, 4, 0, 2, 1]]
+        if collect is not None:
+            collect.append(cell)
+        if out is not None:
+            writeRows(out, ELEMENT_FORMAT, numpy.column_stack([ids, cell - 1]))
+
+        # 判断单元是否在边界上
+        for mask, e_bound in zip(masks, e_bounds):
+            a1, a2, a3 = [isMember(mask, cell[:, c]) for c in range(3)]
+            numface = numpy.select([a1 & a2, a1 & a3, a2 & a3], [1, 3, 2], 0)
+            hit = numface > 0
+            e_bound.append(numpy.column_stack([ids[hit], numface[hit]]))
+        numtri += k
+
+    return numtri, [numpy.concatenate(e) if e else numpy.empty((0, 2), dtype=numpy.int64) for e in e_bounds]
+
+
+def writeRows(out, fmt, rows):
+    """按块批量格式化写出整数行（fmt 为单行格式）"""
+    rows = numpy.asarray(rows, dtype=numpy.int64).reshape(len(rows), -1)
+    for start in range(0, len(rows), ELEMENT_CHUNK):
+        block = rows[start:start + ELEMENT_CHUNK]
+        out.write((fmt * len(block)) % tuple(block.ravel().tolist()))
+
+
+def writeBoundaryRange(out, first, last, face):
+    """写出编号连续的边界单元 [first, last)"""
+    for start in range(first, last, ELEMENT_CHUNK):
+        ids = numpy.arange(start, min(start + ELEMENT_CHUNK, last))
+        writeRows(out, BOUNDARY_FORMAT, numpy.column_stack([ids, numpy.full(len(ids), 5), numpy.full(len(ids), face)]))
+
+
+def writeElementGroup(out, numtri):
+    """写出 ELEMENT GROUP 的单元编号列表，每 10 个换行"""
+    for start in range(0, numtri, ELEMENT_CHUNK):
+        n = min(ELEMENT_CHUNK, numtri - start)
+        fmt = ('\n' + '%8d' * 10) * (n // 10) + ('\n' + '%8d' * (n % 10) if n % 10 else '')
+        out.write(fmt % tuple(range(start + 1, start + n + 1)))
+
+
+# @jit
+def buildTerrain(inp, mode='numpy', writer='neu', meshDir='constant/polyMesh', binary=False):
     # 输入文件参数
     # lat = inp['domain']['lat']
     # lon = inp['domain']['long']
@@ -40,93 +331,51 @@ def buildTerrain(inp):
     r2 = inp['mesh']['tr2']
     windAngle = (inp['wind']['angle'] + 90) * RAD_PER_DEG
     scale = inp['mesh']['scale']
-    center = Point(0, 0)
     num_center = len(inp['turbines'])
 
-    georaster = rasterio.open("../terrain.tif")
-    geodata = georaster.read(1)
-
-    lon = (georaster.bounds.left + georaster.bounds.right) / 2.0
-    lat = (georaster.bounds.bottom + georaster.bounds.top) / 2.0
-
-    # 地形
-    METER_PER_DEG_LAT = 1000 * EARTH_RADIUS * RAD_PER_DEG
-    LONG_LAT_RATIO = math.cos(lat * RAD_PER_DEG)
-    
-    zeroElevation = numpy.average(geodata)
-    xmin, xmax = [(v - lon) * METER_PER_DEG_LAT * LONG_LAT_RATIO
-                  for v in [georaster.bounds.left, georaster.bounds.right]]
-    ymin, ymax = [(v - lat) * METER_PER_DEG_LAT
-                  for v in [georaster.bounds.bottom, georaster.bounds.top]]
-    xnum, ynum = georaster.width, georaster.height
+    # 逐点模式读取整幅 DEM；numpy 模式只读取覆盖 r2 圆的栅格窗口
+    sampler = TerrainSampler("../terrain.tif", windAngle)
+    geodata = sampler.load(radius=None if mode == 'legacy' else r2)
+    zeroElevation = numpy.average(geodata) if mode == 'legacy' else sampler.mean()
+    xmin, xmax, ymin, ymax = sampler.xmin, sampler.xmax, sampler.ymin, sampler.ymax
+    xnum, ynum = sampler.xnum, sampler.ynum
     # print('loaded terrian:', [xnum, ynum], [xmin, xmax], [ymin, ymax], zeroElevation)
+    # 逐点实现中插值结果的数值类型（float32 DEM 为 float32，整型 DEM 为 float64）
+    work = (numpy.zeros((), dtype=sampler.dtype) * 0.5 + numpy.asarray(zeroElevation) * 0.5).dtype
+    terrain = {
+        'lt': lt, 'h': h, 'r1': r1, 'r2': r2, 'windAngle': windAngle, 'scale': scale,
+        'sampler': sampler, 'geodata': geodata, 'zeroElevation': zeroElevation, 'work': work,
+        'xmin': xmin, 'xmax': xmax, 'ymin': ymin, 'ymax': ymax, 'xnum': xnum, 'ynum': ynum,
+    }
 
     # 读写文件
-    out = open('output.neu', 'w+', newline='')
+    writeNeu, writeFoam = writer in ('neu', 'both'), writer in ('polyMesh', 'both')
+    if mode == 'legacy' and writeFoam:
+        raise ValueError('polyMesh 直接输出仅支持 numpy 模式')
+    nodeBlocks, cellBlocks = ([], []) if writeFoam else (None, None)
+    out = open('output.neu', 'w+', newline='') if writeNeu else None
     with open('flat.msh') as msh:
         head = ''.join(['        CONTROL INFO 2.4.6\n',
                         '** GAMBIT NEUTRAL FILE\n',
                         'example\n',
                         'PROGRAM :                Gambit     VERSION :  2.4.6\n\n',
                         '     NUMNP     NELEM     NGRPS    NBSETS     NDFCD     NDFVL\n'])
-        out.write(head)
-        out.writelines(['%30d%10d%10d%10d\n' % (1, 6, 3, 3),
-                        'ENDOFSECTION\n'])
+        if out:
+            out.write(head)
+            out.writelines(['%30d%10d%10d%10d\n' % (1, 6, 3, 3),
+                            'ENDOFSECTION\n'])
+            out.write('   NODAL COORDINATES 2.4.6\n')
         while True:
             line = msh.readline()
             if line.startswith('$Nodes'):
                 break
-        out.write('   NODAL COORDINATES 2.4.6\n')
         np = int(msh.readline()) - num_center
         for i in range(num_center):
             msh.readline()  # 跳过加密区中心
-        p_bot = {}   # 底层节点 { (x, y) ： (el, flr) }
-        aa = lt / 2  # 半边长，最大（边界）xy坐标值
-        # 边界编号（原msh文件）
-        p_inlet, p_outlet, p_front, p_back = numpy.empty((4,0))
-        # 建筑编号（原msh文件）
-        p_building = []
-        for ip in range(0, np):
-            if ip % 10000 == 0: print('writting points %dw/%dw' % (ip / 10000, np / 10000), end='\r')
-            i, x, y, oz = map(float, msh.readline().split())
-            i = int(i)
-            if oz == 0:
-                p = Point(x, y)
-                distance = p.distance(center)
-                # 计算高程
-                if distance < r2:
-                    px = x * math.cos(windAngle) + y * math.sin(windAngle)
-                    py = y * math.cos(windAngle) - x * math.sin(windAngle)
-                    el = linearInterpolate([
-                        ((px - xmin) / (xmax - xmin)) * (xnum - 1),
-                        ((ymax - py) / (ymax - ymin)) * (ynum - 1),
-                    ], lambda ix, iy: geodata[iy][ix] if ix >= 0 and ix < xnum and iy >= 0 and iy < ynum else zeroElevation) - zeroElevation
-                else:
-                    el = 0
-                if distance > r1 and distance < r2:
-                    el = el * (r2 - distance) / (r2 - r1)
-                # 建筑层数
-                flr = 0
-                p_bot.update({(float(x), float(y)):  (el, flr)})   # 统计底层节点
-            else:
-                el, flr = p_bot[(float(x), float(y))]
-            # 保存边界点编号
-            if x == -aa:
-                p_inlet = numpy.append(p_inlet, i)
-            if x == aa:
-                p_outlet = numpy.append(p_outlet, i)
-            if y == aa:
-                p_back = numpy.append(p_back, i)
-            if y == -aa:
-                p_front = numpy.append(p_front, i)
-            z = (oz * (h - el)) / h + el
-            # 保存建筑编号
-            if flr > 0 and z - el < flr * FLOOR_HEIGHT:
-                p_building.append(i)
-            # 写入节点
-            out.write('%10d%20.11e%20.11e%20.11e\n' %
-                      (i - 1, *[v * scale for v in (x, y, z)]))
-        out.write('ENDOFSECTION\n')
+        if mode == 'legacy':
+            num_bot_p, (p_inlet, p_outlet, p_front, p_back) = writeNodesLegacy(msh, out, np, terrain)
+        else:
+            num_bot_p, (p_inlet, p_outlet, p_front, p_back) = writeNodesBlock(msh, out, np, terrain, nodeBlocks)
         print('written points:', np, '. ')
 
         # 写单元
@@ -134,99 +383,123 @@ def buildTerrain(inp):
             line = msh.readline()
             if line.startswith('$Elements'):
                 break
-        out.write('      ELEMENTS/CELLS 2.4.6\n')
+        if out:
+            out.write('ENDOFSECTION\n')
+            out.write('      ELEMENTS/CELLS 2.4.6\n')
         nele = int(msh.readline())
-        numtri = 0  # 统计单元个数
-        # 边界单元（原msh文件）
-        e_inlet, e_outlet, e_front, e_back = [], [], [], []
-        for iele in range(0, nele):
-            if iele % 10000 == 0: print('writting elemnets %dw/%dw' % (iele / 10000, nele / 10000), end='\r')
-            line = msh.readline()
-            if not line:
-                raise RuntimeError("flat.msh 在读取 Elements 时意外结束（文件可能不完整：gmsh 被系统终止或写入失败）")
-            data = [*map(int, line.split())]
-            if len(data) < 3:
-                raise RuntimeError(f"flat.msh 元素行格式错误（列数不足）：{line.strip()[:200]}")
-
-            if data[1] != 6:
-                continue
-
-            num_tags = data[2]
-            node_start = 3 + num_tags
-            if len(data) < node_start + 6:
-                raise RuntimeError(
-                    "flat.msh 元素行不完整（可能 gmsh 被系统终止或网格文件损坏）。"
-                    f" 期望至少 {node_start + 6} 列，实际 {len(data)} 列。行内容：{line.strip()[:200]}"
-                )
-
-            nodes = data[node_start:node_start + 6]
-
-            numtri = numtri + 1
-            out.write('%8d%3d%3d' % (numtri, 5, 6) +
-                      ''.join(['%8d' % (v - 1) for v in (nodes[3], nodes[5], nodes[4], nodes[0], nodes[2], nodes[1])]) + '\n')
-            # 判断单元是否在边界上
-            for p_bound, e_bound in [(p_inlet, e_inlet), (p_outlet, e_outlet),
-                                     (p_front, e_front), (p_back, e_back)]:
-                a1, a2, a3 = [binarySearch(p_bound, 0, p_bound.size - 1, v) >= 0 for v in (nodes[3], nodes[5], nodes[4])]
-                numface = 1 if a1 and a2 else \
-                    3 if a1 and a3 else \
-                    2 if a2 and a3 else 0
-                if numface > 0:
-                    e_bound.append((numtri, numface))
-
-        out.write('ENDOFSECTION\n')
+        p_bounds = (p_inlet, p_outlet, p_front, p_back)
+        if mode == 'legacy':
+            numtri, e_bounds = writeElementsLegacy(msh, out, nele, p_bounds)
+        else:
+            numtri, e_bounds = writeElementsBlock(msh, out, nele, p_bounds, np + num_center, cellBlocks)
         print('written elements:', numtri, '. ')
 
+    # 单元层数 = 节点数 / 底层节点数 - 1
+    num_ceng = np / num_bot_p - 1
+    num_bot = int(numtri / num_ceng)
+    if out:
+        out.write('ENDOFSECTION\n')
         # 回到文件开头，更新节点数、单元数
         out.seek(len(head), 0)
         out.write(' %9d %9d' % (np, numtri))
         out.seek(0, 2)
+        writeNeuSections(out, numtri, e_bounds, num_bot)
+        out.close()
+    sampler.close()
+    if writeFoam:
+        writeFoamMesh(meshDir, nodeBlocks, cellBlocks, numtri, e_bounds, num_bot, binary)
+    print("底层结点数:",num_bot_p,"层数:", num_ceng, "底层网格数:",numtri / num_ceng)
 
-        # 输出domain1
-        out.writelines([
-            '       ELEMENT GROUP 2.4.6\n',
-            'GROUP:          1 ELEMENTS: %10d MATERIAL:          2 NFLAGS:          1\n' % numtri,
-            '%32s\n' % 'all',
-            '%8d' % 0
-        ])
-        for i in range(0, numtri):
-            if i % 10 == 0:
-                out.write('\n')
-            out.write('%8d' % (i+1))
-        out.write('\nENDOFSECTION\n')
-
-        # 输出侧边
-        for e_tag, e_bound in [('inlet', e_inlet), ('outlet', e_outlet),
-                               ('front', e_front), ('back', e_back)]:
-            out.writelines([' BOUNDARY CONDITIONS 2.4.6\n',
-                            '%32s%8d%8d%8d%8d\n' % (e_tag, 1, len(e_bound), 0, 6)])
-            for e_index, e_face in e_bound:
-                out.write('%10d %4d %4d\n' % (e_index, 5, e_face))
-            out.write('ENDOFSECTION\n')
 
-        # 输出bottom
-        # 单元层数 = 节点数 / 底层节点数 - 1
-        num_bot_p = len(p_bot)
-        num_ceng = np / num_bot_p - 1
-        num_bot = int(numtri / num_ceng)
-        # print(numtri, num_bot)
-        out.writelines([' BOUNDARY CONDITIONS 2.4.6\n',
-                        '%32s%8d%8d%8d%8d\n' % ('bot', 1, num_bot, 0, 6)])
-        for e_index in range(1, num_bot + 1):
-            out.write('%10d %4d %4d\n' % (e_index, 5, 5))
-        out.write('ENDOFSECTION\n')
+def writeNeuSections(out, numtri, e_bounds, num_bot):
+    """写出 output.neu 的单元组与边界条件段"""
+    # 输出domain1
+    out.writelines([
+        '       ELEMENT GROUP 2.4.6\n',
+        'GROUP:          1 ELEMENTS: %10d MATERIAL:          2 NFLAGS:          1\n' % numtri,
+        '%32s\n' % 'all',
+        '%8d' % 0
+    ])
+    writeElementGroup(out, numtri)
+    out.write('\nENDOFSECTION\n')
 
-        # 输出top
+    # 输出侧边
+    for e_tag, e_bound in zip(SIDE_PATCHES, e_bounds):
         out.writelines([' BOUNDARY CONDITIONS 2.4.6\n',
-                        '%32s%8d%8d%8d%8d\n' % ('top', 1, num_bot, 0, 6)])
-        for e_index in range(numtri - num_bot + 1, numtri + 1):
-            out.write('%10d %4d %4d\n' % (e_index, 5, 4))
+                        '%32s%8d%8d%8d%8d\n' % (e_tag, 1, len(e_bound), 0, 6)])
+        e_bound = numpy.asarray(e_bound, dtype=numpy.int64).reshape(-1, 2)
+        writeRows(out, BOUNDARY_FORMAT, numpy.column_stack([e_bound[:, 0], numpy.full(len(e_bound), 5), e_bound[:, 1]]))
         out.write('ENDOFSECTION\n')
-    out.close()
-    print("底层结点数:",num_bot_p,"层数:", num_ceng, "底层网格数:",numtri / num_ceng)
+
+    # 输出bottom
+    out.writelines([' BOUNDARY CONDITIONS 2.4.6\n',
+                    '%32s%8d%8d%8d%8d\n' % ('bot', 1, num_bot, 0, 6)])
+    writeBoundaryRange(out, 1, num_bot + 1, 5)
+    out.write('ENDOFSECTION\n')
+
+    # 输出top
+    out.writelines([' BOUNDARY CONDITIONS 2.4.6\n',
+                    '%32s%8d%8d%8d%8d\n' % ('top', 1, num_bot, 0, 6)])
+    writeBoundaryRange(out, numtri - num_bot + 1, numtri + 1, 4)
+    out.write('ENDOFSECTION\n')
+
+
+def writeFoamMesh(meshDir, nodeBlocks, cellBlocks, numtri, e_bounds, num_bot, binary):
+    """将节点/单元/边界数据直接写为 OpenFOAM polyMesh，补丁与 output.neu 的边界条件段一一对应"""
+    ids = numpy.concatenate([b[0] for b in nodeBlocks])
+    points = numpy.concatenate([b[1] for b in nodeBlocks])
+    del nodeBlocks[:]
+    # msh 节点编号 -> 点序号（与 gambitToFoam 按节点出现顺序编号一致）
+    index = numpy.full(int(ids.max(initial=0)) + 1, -1, dtype=numpy.int64)
+    index[ids] = numpy.arange(len(ids))
+    cells = index[numpy.concatenate(cellBlocks)] if cellBlocks else numpy.empty((0, 6), dtype=numpy.int64)
+    del cellBlocks[:]
+    if (cells < 0).any():
+        raise RuntimeError('flat.msh 单元引用了不存在的节点')
+
+    patches = [(tag, 'patch', e_bound[:, 0] - 1, e_bound[:, 1]) for tag, e_bound in zip(SIDE_PATCHES, e_bounds)]
+    bot = numpy.arange(num_bot)
+    patches += [('bot', 'patch', bot, numpy.full(num_bot, 5)),
+                ('top', 'patch', bot + numtri - num_bot, numpy.full(num_bot, 4))]
+    mesh = buildPolyMesh(points, cells, patches)
+    writePolyMesh(meshDir, points, mesh, binary=binary)
+    print('written polyMesh:', meshDir, '(%s)' % ('binary' if binary else 'ascii'),
+          'faces:', len(mesh['faces']), 'internal:', len(mesh['neighbour']))
+
+
+def validateAgainstGambit(inp, meshDir='constant/polyMesh', directDir='constant/polyMeshDirect', binary=False):
+    """
+    验证模式：同时生成 output.neu 与直接输出的 polyMesh，再运行 gambitToFoam，
+    比较两者的点、单元、内部面与补丁。constant/polyMesh 保留 gambitToFoam 的结果。
+    """
+    buildTerrain(inp, writer='neu')
+    if subprocess.call(['gambitToFoam', 'output.neu']) != 0:
+        raise RuntimeError('gambitToFoam 执行失败（需要已加载 OpenFOAM 环境）')
+    buildTerrain(inp, writer='polyMesh', meshDir=directDir, binary=binary)
+    points, mesh = readPolyMesh(directDir)
+    gambitPoints, gambitMesh = readPolyMesh(meshDir)
+    problems = comparePolyMesh(points, mesh, gambitPoints, gambitMesh)
+    for p in problems:
+        print('[VALIDATE] ' + p)
+    print('[VALIDATE] %s' % ('polyMesh 与 gambitToFoam 输出一致' if not problems else '发现 %d 处差异' % len(problems)))
+    return not problems
+
 
 if __name__ == '__main__':
+    import argparse
     import json
+    parser = argparse.ArgumentParser(description='将 flat.msh 映射到地形并输出 output.neu 或 constant/polyMesh')
+    parser.add_argument('--mode', choices=['numpy', 'legacy'], default='numpy',
+                        help='节点/单元处理方式：numpy 分块向量化（默认）或 legacy 逐点')
+    parser.add_argument('--writer', choices=['neu', 'polyMesh', 'both'], default='neu',
+                        help='输出格式：neu（供 gambitToFoam 转换，默认）、polyMesh（直接写 constant/polyMesh）或 both')
+    parser.add_argument('--binary', action='store_true', help='polyMesh 以 OpenFOAM binary 格式写出')
+    parser.add_argument('--validate', action='store_true',
+                        help='小算例验证：与 gambitToFoam 转换结果比较（需要 OpenFOAM 环境）')
+    args = parser.parse_args()
     with open("../info.json", 'r') as f:
-        buildTerrain(json.load(f))
+        inp = json.load(f)
+    if args.validate:
+        sys.exit(0 if validateAgainstGambit(inp, binary=args.binary) else 1)
+    buildTerrain(inp, mode=args.mode, writer=args.writer, binary=args.binary)
 
@@ -9,12 +9,309 @@
 
 import os
 import numpy as np
-from scipy.interpolate import griddata
+from scipy.interpolate import CloughTocher2DInterpolator
+from scipy.spatial import Delaunay, cKDTree
 from scipy.spatial.qhull import QhullError
 import json
 import sys
 
-def process_data():
+try:
+    import pandas as pd
+except ImportError:  # pandas 可选，缺失时退回 np.loadtxt
+    pd = None
+
+# 分块压缩多分辨率存储（speed_tiles/）的读写与 utils 下的读取脚本共用 backend/utils/speed_cube.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'utils'))
+try:
+    import speed_cube
+except ImportError:
+    speed_cube = None
+# 逐层插值的进程池与 utils 下的预计算脚本共用 backend/utils/worker_pool.py；缺失时串行
+try:
+    import worker_pool
+except ImportError:
+    worker_pool = None
+
+PLT_MAGIC = b'PLT1'
+PLT_HEADER_SIZE = 16   # "PLT1" + int32 列数 + int64 行数
+PLT_COLUMNS = 6        # x, y, z, Ux, Uy, Uz（第 7 列 p 不参与后处理）
+
+
+def read_plt_binary(filepath):
+    """读取 postFoam 写出的 <height>.bin（小端 float32 行存储），返回 (N, 6) float32 数组。"""
+    with open(filepath, 'rb') as f:
+        header = f.read(PLT_HEADER_SIZE)
+    if len(header) < PLT_HEADER_SIZE or header[:4] != PLT_MAGIC:
+        raise ValueError(f"invalid binary layer header in {filepath}")
+    ncols = int(np.frombuffer(header, dtype='<i4', count=1, offset=4)[0])
+    nrows = int(np.frombuffer(header, dtype='<i8', count=1, offset=8)[0])
+    if ncols < PLT_COLUMNS:
+        raise ValueError(f"binary layer {filepath} has only {ncols} columns")
+    data = np.fromfile(filepath, dtype='<f4', offset=PLT_HEADER_SIZE)
+    if data.size != nrows * ncols:
+        raise ValueError(f"binary layer {filepath} is truncated ({data.size} of {nrows * ncols} values)")
+    return data.reshape(nrows, ncols)[:, :PLT_COLUMNS]
+
+
+def count_plt_columns(filepath):
+    """统计文本层文件首个非空行的列数。"""
+    with open(filepath, 'r') as f:
+        for line in f:
+            if line.strip():
+                return len(line.split())
+    return 0
+
+
+def read_plt_text(filepath):
+    """按列批量解析文本层文件，只取前 6 列并直接解析为 float32。"""
+    if pd is not None:
+        try:
+            frame = pd.read_csv(filepath, sep='\t', header=None, usecols=range(PLT_COLUMNS),
+                                dtype=np.float32, engine='c')
+            return frame.to_numpy()
+        except (ValueError, pd.errors.ParserError):
+            pass  # 非制表符分隔等情况交给 loadtxt
+    return np.loadtxt(filepath, dtype=np.float32, usecols=range(PLT_COLUMNS), ndmin=2)
+
+
+def load_plt_layer(filepath):
+    """
+    读取单个高度层，返回 (N, 6) float32 数组；文件缺失或为空时返回 None。
+    优先读取 postFoam 写出的二进制 <height>.bin（不早于文本文件时），否则解析文本。
+    """
+    binpath = filepath + '.bin'
+    if os.path.exists(binpath) and (not os.path.exists(filepath)
+                                    or os.path.getmtime(binpath) >= os.path.getmtime(filepath)):
+        try:
+            data = read_plt_binary(binpath)
+            print(f"[INFO] Read binary layer {binpath}")
+            return data if data.shape[0] else None
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] {e}. Falling back to text file.")
+
+    if not os.path.exists(filepath):
+        print(f"[WARNING] File not found: {filepath}. Skipping this height.")
+        return None
+    if os.path.getsize(filepath) == 0:
+        print(f"[WARNING] File is empty: {filepath}. Skipping this height.")
+        return None
+    ncols = count_plt_columns(filepath)
+    if ncols < PLT_COLUMNS:
+        print(f"[WARNING] Not enough columns in {filepath}. Skipping.")
+        return None
+    return read_plt_text(filepath)
+
+
+class LayerRegridder:
+    """
+    各高度层共用同一组水平散点 (x, y)（postFoam 按底层网格单元中心输出），
+    因此 Delaunay 三角化、目标网格点所在单元及重心坐标、凸包外点的最近邻索引只需计算一次，
+    之后每层只做取值与加权。结果与逐层调用 griddata(cubic/linear) + nearest 补 NaN 一致。
+    """
+
+    def __init__(self, x, y, X, Y):
+        self.x = np.array(x, copy=True)
+        self.y = np.array(y, copy=True)
+        self.points = np.column_stack([x, y]).astype(np.float64)
+        self.targets = np.column_stack([X.ravel(), Y.ravel()]).astype(np.float64)
+        self.shape = X.shape
+        self.tree = cKDTree(self.points)
+        try:
+            self.tri = Delaunay(self.points)
+        except QhullError:
+            print("[WARNING] Delaunay triangulation failed. Falling back to 'nearest'.")
+            self.tri = None
+            self.nearest = self.tree.query(self.targets)[1]
+            return
+
+        # 目标点所在单元与重心坐标（linear 插值直接加权）
+        simplex = self.tri.find_simplex(self.targets)
+        self.outside = simplex < 0
+        inside = ~self.outside
+        self.vertices = self.tri.simplices[simplex[inside]]
+        transform = self.tri.transform[simplex[inside]]
+        delta = self.targets[inside] - transform[:, 2]
+        bary = np.einsum('ijk,ik->ij', transform[:, :2], delta)
+        self.weights = np.column_stack([bary, 1 - bary.sum(axis=1)])
+        # 凸包外的目标点（插值结果为 NaN）预先求最近邻散点
+        self.outside_nearest = self.tree.query(self.targets[self.outside])[1]
+        print(f"[INFO] Triangulated {len(self.points)} points once; "
+              f"{int(self.outside.sum())} grid points outside the convex hull.")
+
+    def matches(self, x, y):
+        """判断新一层的散点是否与缓存的三角化一致。"""
+        return x.shape == self.x.shape and np.array_equal(x, self.x) and np.array_equal(y, self.y)
+
+    def interpolate(self, U, method='cubic'):
+        """插值一层标量到目标网格，并用最近邻补齐 NaN，返回 (height, width) float64 数组。"""
+        if self.tri is None:
+            return np.asarray(U, dtype=np.float64)[self.nearest].reshape(self.shape)
+
+        if method == 'cubic':
+            print("[INFO] Attempting 'cubic' interpolation (shared triangulation)...")
+            result = CloughTocher2DInterpolator(self.tri, U, fill_value=np.nan)(self.targets)
+        else:
+            print("[INFO] Attempting 'linear' interpolation (precomputed barycentric weights)...")
+            result = np.full(len(self.targets), np.nan)
+            values = np.asarray(U, dtype=np.float64)
+            result[~self.outside] = np.einsum('ij,ij->i', values[self.vertices], self.weights)
+
+        values = np.asarray(U, dtype=np.float64)
+        result[self.outside] = values[self.outside_nearest]
+        isnan_mask = np.isnan(result)
+        if np.any(isnan_mask):
+            # 散点值本身含 NaN 时才会走到这里
+            print(f"[INFO] Filling {np.sum(isnan_mask)} NaN values using 'nearest' neighbor.")
+            result[isnan_mask] = values[self.tree.query(self.targets[isnan_mask])[1]]
+        return result.reshape(self.shape)
+
+
+def target_grid(grid):
+    """由 (lt, width, height) 生成插值目标网格 X, Y（形状为 (height, width)）。"""
+    lt, width, height = grid
+    # 定义网格化的目标坐标
+    x_range = np.linspace(-lt/2, lt/2, width)  # 这里保持不变
+    y_range = np.linspace(-lt/2, lt/2, height)
+    return np.meshgrid(x_range, y_range)
+
+
+def layer_path(height_val):
+    return os.path.join('Output/plt', str(int(height_val))) # 使用int()确保文件名是整数
+
+
+def regrid_layer(i, height_val, out, state):
+    """
+    读取并插值单个高度层，写入 out[i]。state 保存网格参数与可复用的 LayerRegridder。
+    返回该层是否成功插值（缺失/损坏的层写入 NaN）。
+    """
+    filepath = layer_path(height_val)
+    print(f"\n[INFO] Processing height {height_val}m (index {i}) from file: {filepath}")
+
+    try:
+        data = load_plt_layer(filepath)
+    except ValueError as e:
+        print(f"[ERROR] Failed to load {filepath}. Error: {e}. Skipping.")
+        data = None
+    if data is None:
+        out[i,:,:] = np.nan
+        write_layer_tiles(i, out[i], state)
+        return False
+
+    print(f"[INFO] Loaded {data.shape[0]} data points.")
+    scale = state['scale']
+    x = data[:, 0] /scale
+    y = data[:, 1]  /scale
+
+    # ---- ② 打印当前层散点范围 ----
+    print(f"[DEBUG] Points range: x [{x.min():.2f}, {x.max():.2f}], "
+          f"y [{y.min():.2f}, {y.max():.2f}] "
+          f"({data.shape[0]} pts)")
+    U = np.sqrt(np.sum(data[:, 3:6]**2, axis=1))
+
+    regridder = state['regridder']
+    if regridder is None or not regridder.matches(x, y):
+        X, Y = target_grid(state['grid'])
+        regridder = state['regridder'] = LayerRegridder(x, y, X, Y)
+    U_interp = regridder.interpolate(U, method=state['method'])
+
+    # 之前我们猜测这里可能需要转置，这取决于X,Y的顺序和numpy数组索引的对应关系
+    # 通常 griddata 的输出形状与 X, Y 相同，而 numpy 数组索引是 (row, col) 即 (y, x)
+    # 所以 out[i, :, :] 对应 (height, width)，而 U_interp 是 (height, width) 形状，不需要转置
+    out[i,:,:] = U_interp
+    write_layer_tiles(i, out[i], state)
+
+    # ---- ③ 统计 NaN 比例 ----
+    nan_ratio = np.isnan(U_interp).sum() / U_interp.size
+    print(f"[DEBUG] NaN ratio after fill: {nan_ratio:.3%}")
+    return True
+
+
+def write_layer_tiles(i, layer, state):
+    """写出第 i 层的分块金字塔（未启用分块存储时跳过）。"""
+    if state.get('tiles'):
+        speed_cube.write_tile_layer(state['tiles'], i, layer)
+
+
+def prepare_tiles(tile_dir):
+    """
+    是否同时写出分块压缩存储：POST_TILES=0 关闭。
+    先删除旧的 index.json，保证读取方不会在重写过程中看到新旧混杂的分块。
+    """
+    if os.environ.get('POST_TILES', '1') == '0':
+        return None
+    if speed_cube is None:
+        print("[WARNING] speed_cube module not found. Skipping tiled output.")
+        return None
+    index_path = os.path.join(tile_dir, speed_cube.TILE_INDEX)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    os.makedirs(tile_dir, exist_ok=True)
+    return tile_dir
+
+
+# 子进程状态：fork 时直接继承主进程已建好的 LayerRegridder
+_worker_state = None
+_worker_out = None
+
+
+def _init_layer_worker(path, shape, state):
+    global _worker_state, _worker_out
+    if _worker_state is None:
+        _worker_state = state
+    _worker_out = np.memmap(path, dtype=np.float32, mode='r+', shape=shape)
+
+
+def _regrid_layer_task(i, height_val):
+    ok = regrid_layer(i, height_val, _worker_out, _worker_state)
+    _worker_out.flush()
+    sys.stdout.flush()
+    return ok
+
+
+def regrid_layers_parallel(height_levels, state, workers, path, shape):
+    """
+    多进程逐层插值，各进程直接写入已创建的 speed.bin（内存映射）中各自的层。
+    进程池不可用（无信号量 / 权限受限等）时由 worker_pool 在本进程串行完成；
+    反复崩溃的层记为插值失败。
+    """
+    global _worker_state, _worker_out
+
+    # 先在主进程用首个可用层建好三角化，fork 出的子进程共享，避免每个进程重复 Qhull
+    for height_val in height_levels:
+        try:
+            data = load_plt_layer(layer_path(height_val))
+        except ValueError:
+            data = None
+        if data is not None:
+            X, Y = target_grid(state['grid'])
+            state['regridder'] = LayerRegridder(data[:, 0] / state['scale'], data[:, 1] / state['scale'], X, Y)
+            break
+    _worker_state = state
+
+    print(f"\n[INFO] Regridding {len(height_levels)} layers with {workers} worker processes...")
+    sys.stdout.flush()
+    try:
+        # 非 fork 平台的子进程拿不到继承的状态：传一份不含三角化的副本，由子进程各自重建
+        done = worker_pool.run_pool(_regrid_layer_task, enumerate(height_levels), workers,
+                                    initializer=_init_layer_worker,
+                                    initargs=(path, shape, dict(state, regridder=None)),
+                                    crashed=lambda i, height_val: False, label="layers")
+    finally:
+        _worker_state = _worker_out = None
+
+    print(f"[INFO] Wrote {path}: {sum(done)}/{len(height_levels)} layers regridded in parallel.")
+
+
+def sample_layers(cube, stride):
+    """逐层抽取步长为 stride 的有限值样本（用于估计色标范围），避免一次性读入整个数据体。"""
+    parts = []
+    for layer in cube:
+        part = np.asarray(layer[::stride, ::stride]).reshape(-1)
+        parts.append(part[np.isfinite(part)])
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
+
+
+def process_data(workers=None):
     """主处理函数，读取numh和dh来生成高度，并包含详细的错误处理。"""
     try:
         print("[INFO] Loading configuration from ../info.json...")
@@ -41,96 +338,50 @@ def process_data():
 
         # 初始化输出数组
         size = [width, height, numh]
-        out = np.zeros([numh, height, width], dtype=np.float32)
-
-        # 定义网格化的目标坐标
-        x_range = np.linspace(-lt/2, lt/2, size[0])  # 这里保持不变
-        y_range = np.linspace(-lt/2, lt/2, size[1])
 
         # ---- ① 打印网格整体范围 ----
-        print(f"[DEBUG] Grid extent  : x [{x_range[0]:.2f}, {x_range[-1]:.2f}], "
-              f"y [{y_range[0]:.2f}, {y_range[-1]:.2f}]  (total {width}×{height})")
-        X, Y = np.meshgrid(x_range, y_range)
+        print(f"[DEBUG] Grid extent  : x [{-lt/2:.2f}, {lt/2:.2f}], "
+              f"y [{-lt/2:.2f}, {lt/2:.2f}]  (total {width}×{height})")
+
+        # 三角化在各层间复用；POST_INTERP=linear 时直接使用预计算的重心坐标
+        state = {
+            'grid': (lt, width, height),
+            'scale': mesh_info['scale'],
+            'method': os.environ.get('POST_INTERP', 'cubic'),
+            'regridder': None,
+            'tiles': prepare_tiles(os.path.join('..', 'speed_tiles')),
+        }
+        # 并行进程数：命令行 --workers 优先，其次环境变量 POST_WORKERS，默认 1（串行）
+        workers = (worker_pool.resolve_workers(workers, numh, env='POST_WORKERS', default=1)
+                   if worker_pool else 1)
 
         # --- 主循环 ---
-        for i, height_val in enumerate(height_levels):
-            filepath = os.path.join('Output/plt', str(int(height_val))) # 使用int()确保文件名是整数
-            print(f"\n[INFO] Processing height {height_val}m (index {i}) from file: {filepath}")
-
-            if not os.path.exists(filepath):
-                print(f"[WARNING] File not found: {filepath}. Skipping this height.")
-                out[i,:,:] = np.nan
-                continue
-            
-            if os.path.getsize(filepath) == 0:
-                print(f"[WARNING] File is empty: {filepath}. Skipping this height.")
-                out[i,:,:] = np.nan
-                continue
-
-            try:
-                data = np.loadtxt(filepath)
-                if data.ndim == 1: data = data.reshape(1, -1)
-                if data.shape[1] < 6:
-                    print(f"[WARNING] Not enough columns in {filepath}. Skipping.")
-                    out[i,:,:] = np.nan
-                    continue
-            except ValueError as e:
-                print(f"[ERROR] Failed to load {filepath}. Error: {e}. Skipping.")
-                out[i,:,:] = np.nan
-                continue
-
-            print(f"[INFO] Loaded {data.shape[0]} data points.")
-            scale = info['mesh']['scale']
-            x = data[:, 0] /scale    
-            y = data[:, 1]  /scale   
-
-            # ---- ② 打印当前层散点范围 ----
-            print(f"[DEBUG] Points range: x [{x.min():.2f}, {x.max():.2f}], "
-                  f"y [{y.min():.2f}, {y.max():.2f}] "
-                  f"({data.shape[0]} pts)")
-            U = np.sqrt(np.sum(data[:, 3:6]**2, axis=1))
-
-            U_interp = None
-            try:
-                print("[INFO] Attempting 'cubic' interpolation...")
-                U_interp = griddata((x, y), U, (X, Y), method="cubic", fill_value=np.nan)
-            except QhullError:
-                print("[WARNING] 'cubic' interpolation failed. Falling back to 'linear'.")
-                try:
-                    U_interp = griddata((x, y), U, (X, Y), method="linear", fill_value=np.nan)
-                except QhullError:
-                    print("[WARNING] 'linear' interpolation also failed. Falling back to 'nearest'.")
-                    U_interp = griddata((x, y), U, (X, Y), method="nearest")
-            
-            isnan_mask = np.isnan(U_interp)
-            if np.any(isnan_mask):
-                print(f"[INFO] Filling {np.sum(isnan_mask)} NaN values using 'nearest' neighbor.")
-                U_interp_nn = griddata((x, y), U, (X, Y), method="nearest")
-                U_interp[isnan_mask] = U_interp_nn[isnan_mask]
-
-            # 之前我们猜测这里可能需要转置，这取决于X,Y的顺序和numpy数组索引的对应关系
-            # 通常 griddata 的输出形状与 X, Y 相同，而 numpy 数组索引是 (row, col) 即 (y, x)
-            # 所以 out[i, :, :] 对应 (height, width)，而 U_interp 是 (height, width) 形状，不需要转置
-            out[i,:,:] = U_interp
-
-            # ---- ③ 统计 NaN 比例 ----
-            nan_ratio = np.isnan(U_interp).sum() / U_interp.size
-            print(f"[DEBUG] NaN ratio after fill: {nan_ratio:.3%}")
-
-        # 保存结果
-        print("\n[INFO] Saving binary data to ../speed.bin")
-        out.tofile("../speed.bin")
+        # speed.bin 直接以内存映射创建并逐层写入，常驻内存只有当前层
+        shape = (numh, height, width)
+        print("\n[INFO] Writing binary data to ../speed.bin layer by layer")
+        out = np.memmap("../speed.bin", dtype=np.float32, mode='w+', shape=shape)
+        out.flush()
+        if workers > 1:
+            regrid_layers_parallel(height_levels, state, workers, "../speed.bin", shape)
+        else:
+            for i, height_val in enumerate(height_levels):
+                regrid_layer(i, height_val, out, state)
+                out.flush()
 
         print("[INFO] Saving metadata to ../output.json")
         # Compute a robust visualization range (for colorbar) based on the data itself.
         # Using wind_speed * 1.5 is often too small in complex terrain (speed-up can exceed 1.5x),
         # which causes the plots to saturate at vmax and look "all red".
         #
-        # To keep runtime/memory reasonable, estimate percentiles using a strided sample.
+        # To keep runtime/memory reasonable, estimate percentiles using a strided sample,
+        # gathered one layer at a time from the memory-mapped file.
         wind_speed = float(wind_info.get('speed', 1) or 1)
         stride = max(1, int(min(width, height) / 200))  # ~200x200 samples per layer
-        sample = out[:, ::stride, ::stride].reshape(-1)
-        sample = sample[np.isfinite(sample)]
+        sample = sample_layers(out, stride)
+        del out
+        if state['tiles']:
+            index_path = speed_cube.write_tile_index(state['tiles'], shape, height_levels)
+            print(f"[INFO] Wrote tiled multi-resolution store: {index_path}")
 
         vmin = 0.0
         vmax = wind_speed * 1.5
@@ -140,11 +391,15 @@ def process_data():
 
         output_meta = {
             "file": "speed.bin",
+            "format": "raw",
             "size": size,
             "range": [float(vmin), float(vmax)],
             "dh": dh,
             "heights": height_levels # 把具体的高度列表也存起来，这在后续可视化时很有用
         }
+        if speed_cube is not None:
+            # 列出可用的存储格式：raw = speed.bin，tiles = speed_tiles/ 分块金字塔
+            output_meta["formats"] = speed_cube.format_entry(tiles=bool(state['tiles']))
         with open("../output.json", 'w') as f:
             json.dump(output_meta, f, indent=4)
         
@@ -163,4 +418,9 @@ def process_data():
         sys.exit(1)
 
 if __name__ == "__main__":
-    process_data()
+    import argparse
+    parser = argparse.ArgumentParser(description="将 postFoam 高度层插值到规则网格并写出 speed.bin / output.json")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="并行插值的进程数（默认读取环境变量 POST_WORKERS，未设置时串行；0 表示 CPU 核数）")
+    args = parser.parse_args()
+    process_data(workers=args.workers)
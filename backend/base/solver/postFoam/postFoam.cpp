@@ -2,6 +2,9 @@
   postFoam.cpp
   插值后处理：在指定高度处输出 (x y z Ux Uy Uz p)
   - 支持 "dh" 为标量或数组
+  - 环境变量 POSTFOAM_FORMAT=text|binary|both（默认 text）：
+    binary 额外写出 Output/plt/<高度>.bin，小端 float32 行存储，
+    16 字节头 = "PLT1" + int32 列数 + int64 行数
   - 兼容 OpenFOAM-v2212 + C++11
 \*---------------------------------------------------------------------------*/
 
@@ -10,6 +13,8 @@
 #include <iostream>
 #include <fstream>
 #include <iomanip>
+#include <cstdint>
+#include <cstdlib>
 #include <sstream>
 #include <vector>
 #include <string>
@@ -208,6 +213,13 @@ int main(int argc, char* argv[])
     std::vector< std::vector<long double> > resP (num_udh, std::vector<long double>(base));
     std::vector< std::vector<long double> > resZ (num_udh, std::vector<long double>(base));
 
+    // ======================== 输出格式 =========================
+    const char* fmtEnv = std::getenv("POSTFOAM_FORMAT");
+    const std::string outFormat = fmtEnv ? fmtEnv : "text";
+    const bool writeText   = outFormat != "binary";
+    const bool writeBinary = outFormat == "binary" || outFormat == "both";
+    std::cout << "[DEBUG]        Output format: " << outFormat << '\n';
+
     // ======================== 主循环 =========================
     // 修改: 使用新的变量名 num_udh 计算总进度
     const int totalProg = num_udh * (nLayers - 1);
@@ -216,11 +228,34 @@ int main(int argc, char* argv[])
     // 修改: 使用新的变量名 num_udh 作为循环上界
     for (int i = 0; i < num_udh; ++i)
     {
-        std::ofstream fout("./Output/plt/" + doubleToString(udh[i]));
-        if (!fout.is_open())
+        const std::string pltPath = "./Output/plt/" + doubleToString(udh[i]);
+        std::ofstream fout;
+        std::ofstream fbin;
+        if (writeText)
         {
-            std::cerr << "[WARNING] Cannot open output file for z=" << udh[i] << '\n';
-            continue;
+            fout.open(pltPath);
+            if (!fout.is_open())
+            {
+                std::cerr << "[WARNING] Cannot open output file for z=" << udh[i] << '\n';
+                continue;
+            }
+        }
+        if (writeBinary)
+        {
+            fbin.open(pltPath + ".bin", std::ios::binary);
+            if (!fbin.is_open())
+            {
+                std::cerr << "[WARNING] Cannot open binary output file for z=" << udh[i] << '\n';
+                if (!writeText) continue;
+            }
+        }
+        const int32_t nCols = 7;
+        int64_t nRows = 0;
+        if (fbin.is_open())
+        {
+            fbin.write("PLT1", 4);
+            fbin.write(reinterpret_cast<const char*>(&nCols), sizeof(nCols));
+            fbin.write(reinterpret_cast<const char*>(&nRows), sizeof(nRows));
         }
 
         const double zPlane = udh[i] * scale;
@@ -242,13 +277,32 @@ int main(int argc, char* argv[])
                     resP [i][k] = (1 - w) * pp[lower] + w * pp[upper];
                     resZ [i][k] = zPlane + (2.0 * z0[k] - hh * scale) * h / (2.0 * h - hh);
 
-                    fout << px[k] << '\t' << py[k] << '\t' << resZ[i][k] << '\t'
-                         << resUx[i][k] << '\t' << resUy[i][k] << '\t'
-                         << resUz[i][k] << '\t' << resP[i][k]  << '\n';
+                    if (fout.is_open())
+                        fout << px[k] << '\t' << py[k] << '\t' << resZ[i][k] << '\t'
+                             << resUx[i][k] << '\t' << resUy[i][k] << '\t'
+                             << resUz[i][k] << '\t' << resP[i][k]  << '\n';
+                    if (fbin.is_open())
+                    {
+                        const float row[nCols] = {
+                            static_cast<float>(px[k]), static_cast<float>(py[k]),
+                            static_cast<float>(resZ[i][k]), static_cast<float>(resUx[i][k]),
+                            static_cast<float>(resUy[i][k]), static_cast<float>(resUz[i][k]),
+                            static_cast<float>(resP[i][k])
+                        };
+                        fbin.write(reinterpret_cast<const char*>(row), sizeof(row));
+                        ++nRows;
+                    }
                 }
             }
         }
-        fout.close();
+        if (fout.is_open()) fout.close();
+        if (fbin.is_open())
+        {
+            // 回写行数，post.py 以此校验文件完整性
+            fbin.seekp(8);
+            fbin.write(reinterpret_cast<const char*>(&nRows), sizeof(nRows));
+            fbin.close();
+        }
     }
     std::cout << "\n[DEBUG] Step 7: Interpolation finished. Program exit.\n";
     return 0;
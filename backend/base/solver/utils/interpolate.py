@@ -1,3 +1,4 @@
+import itertools
 import numpy as np
 
 '''
@@ -10,5 +11,64 @@ def linearInterpolate(pos: [float], data) -> np.ndarray:
     else linearInterpolate(pos[1:], lambda *values: data(x, *values))
   return p(index) * (1 - frac) + p(index + 1) * frac
 
+'''
+batched N-D linear interpolation on a regular grid
+  grid: N 维数组；pos: N 个分数索引数组（第 k 个对应 grid 的第 k 维，可广播）
+  fill: 越界角点取值；为 None 时将索引截断到网格边缘
+  dtype: 计算类型，默认与 linearInterpolate 中 grid 值乘 Python 浮点数的结果类型一致
+与 linearInterpolate(pos, lambda *i: grid[i] if 在界内 else fill) 逐点结果一致：
+权重在 float64 下求得后转换为 dtype，并按相同顺序（最后一维最内层）逐维合并。
+非有限的索引返回 fill（截断模式下为 NaN）。
+'''
+def interpolateGrid(grid, pos, fill=None, dtype=None) -> np.ndarray:
+  grid = np.asarray(grid)
+  if len(pos) != grid.ndim:
+    raise ValueError('interpolateGrid: %d 个索引数组与 %d 维网格不匹配' % (len(pos), grid.ndim))
+  pos = np.broadcast_arrays(*[np.asarray(p, dtype=np.float64) for p in pos])
+  dtype = np.dtype(dtype) if dtype is not None else np.result_type(grid.dtype, 1.0)
+  shape = pos[0].shape
+
+  bad = np.zeros(shape, dtype=bool)
+  lower, weights, valid = [], [], []
+  for p, n in zip(pos, grid.shape):
+    bad |= ~np.isfinite(p)
+    p = np.where(np.isfinite(p), p, 0.0)
+    if fill is None:
+      p = np.clip(p, 0.0, float(n - 1))
+    index = np.floor(p).astype(np.intp)
+    frac = p % 1
+    lower.append(index)
+    weights.append(((1 - frac).astype(dtype), frac.astype(dtype)))
+    valid.append(((index >= 0) & (index < n), (index + 1 >= 0) & (index + 1 < n)))
+
+  # 2^N 个角点，bit 顺序与维度顺序一致（第 0 维为最高位）
+  corners = []
+  for bits in itertools.product((0, 1), repeat=grid.ndim):
+    index = []
+    inside = np.ones(shape, dtype=bool)
+    for k, b in enumerate(bits):
+      i = lower[k] + b
+      if fill is None:
+        i = np.minimum(i, grid.shape[k] - 1)
+      else:
+        inside &= valid[k][b]
+      index.append(i)
+    if fill is None:
+      corners.append(grid[tuple(index)].astype(dtype))
+    else:
+      v = np.full(shape, fill, dtype=dtype)
+      v[inside] = grid[tuple(i[inside] for i in index)]
+      corners.append(v)
+
+  # 从最后一维开始逐维合并：p(i) * (1 - frac) + p(i + 1) * frac
+  for k in reversed(range(grid.ndim)):
+    w0, w1 = weights[k]
+    corners = [corners[j] * w0 + corners[j + 1] * w1 for j in range(0, len(corners), 2)]
+  out = corners[0]
+  if bad.any():
+    out[bad] = np.nan if fill is None else fill
+  return out
+
 if __name__=='__main__':
+  print(interpolateGrid(np.outer(np.arange(2), np.arange(2)), [np.array([0.5]), np.array([0.5])]))
   print(linearInterpolate([0.5, 0.5], lambda x, y: [x * y]))
\ No newline at end of file
@@ -0,0 +1,325 @@
+import os
+import re
+import numpy as np
+
+'''
+OpenFOAM polyMesh 直接读写（三棱柱网格），用于绕过 output.neu + gambitToFoam 的文本往返
+'''
+
+BANNER = r'''/*--------------------------------*- C++ -*----------------------------------*\
+  =========                 |
+  \\      /  F ield         | OpenFOAM: The Open Source CFD Toolbox
+   \\    /   O peration     | Version:  v2212
+    \\  /    A nd           | Website:  www.openfoam.com
+     \\/     M anipulation  |
+\*---------------------------------------------------------------------------*/
+'''
+SEPARATOR = '// * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * //\n'
+FOOTER = '\n\n// ************************************************************************* //\n'
+
+# Gambit 楔形单元（NTYPE=5）的面定义：面 1~3 为四边形侧面，面 4/5 为三角形端面
+# 对于正体积单元（(p1-p0)x(p2-p0) 指向 p3），以下顶点顺序均为外法向，与 OpenFOAM prism 模型一致
+GAMBIT_QUADS = np.array([[0, 1, 4, 3], [1, 2, 5, 4], [2, 0, 3, 5]])
+GAMBIT_TRIS = np.array([[0, 2, 1], [3, 4, 5]])
+
+CHUNK = 200000
+
+
+def header(cls, obj, binary=False, note=None):
+  lines = [
+    'FoamFile\n{\n',
+    '    version     2.0;\n',
+    '    format      %s;\n' % ('binary' if binary else 'ascii'),
+    '    arch        "LSB;label=32;scalar=64";\n',
+    '    class       %s;\n' % cls,
+  ]
+  if note:
+    lines.append('    note        "%s";\n' % note)
+  lines += ['    location    "constant/polyMesh";\n', '    object      %s;\n' % obj, '}\n']
+  return BANNER + ''.join(lines) + SEPARATOR
+
+
+def pairRows(keys):
+  '''对逐行排序后的顶点键配对：返回 (first, second, single)，每个内部面恰出现两次'''
+  if len(keys) == 0:
+    empty = np.empty(0, dtype=np.int64)
+    return empty, empty, empty
+  order = np.lexsort(keys.T[::-1])
+  sk = keys[order]
+  same = (sk[1:] == sk[:-1]).all(axis=1)
+  if (same[1:] & same[:-1]).any():
+    raise RuntimeError('网格存在被三个及以上单元共享的面（非流形网格）')
+  first, second = order[:-1][same], order[1:][same]
+  matched = np.zeros(len(keys), dtype=bool)
+  matched[first] = matched[second] = True
+  return first, second, np.flatnonzero(~matched)
+
+
+def buildPolyMesh(points, cells, patches):
+  '''
+  由三棱柱单元构造 polyMesh 拓扑
+  points: (nPoints, 3)；cells: (nCells, 6)，Gambit 楔形节点顺序的 0 基点编号
+  patches: [(name, type, cellIds, faceNos)]，cellIds 为 0 基单元编号，faceNos 为 Gambit 面号 1~5
+  返回 dict：faces (nFaces, 4，三角形第 4 列为 -1)、owner、neighbour、patches [(name, type, nFaces, startFace)]
+  '''
+  cells = np.asarray(cells, dtype=np.int64)
+  nCells = len(cells)
+
+  # 单元朝向：(p1-p0)x(p2-p0)·(p3-p0) < 0 的单元需要翻转全部面
+  p0, p1, p2, p3 = (points[cells[:, i]] for i in range(4))
+  flip = np.einsum('ij,ij->i', np.cross(p1 - p0, p2 - p0), p3 - p0) < 0
+  del p0, p1, p2, p3
+
+  # 各单元的局部面：四边形条目 c*3+q，三角形条目 c*2+t
+  quads = cells[:, GAMBIT_QUADS].reshape(-1, 4)
+  tris = cells[:, GAMBIT_TRIS].reshape(-1, 3)
+  quads[np.repeat(flip, 3)] = quads[np.repeat(flip, 3)][:, ::-1]
+  tris[np.repeat(flip, 2)] = tris[np.repeat(flip, 2)][:, ::-1]
+  faces = np.vstack([quads, np.column_stack([tris, np.full(len(tris), -1)])])
+  cellOf = np.concatenate([np.repeat(np.arange(nCells), 3), np.repeat(np.arange(nCells), 2)])
+  nQuad = len(quads)
+  del quads, tris
+
+  # 内部面：同一顶点集合出现两次；保留编号较小单元（owner）一侧的顶点顺序
+  first, second, singleQ = pairRows(np.sort(faces[:nQuad], axis=1))
+  firstT, secondT, singleT = pairRows(np.sort(faces[nQuad:, :3], axis=1))
+  first = np.concatenate([first, firstT + nQuad])
+  second = np.concatenate([second, secondT + nQuad])
+  single = np.concatenate([singleQ, singleT + nQuad])
+  swap = cellOf[first] > cellOf[second]
+  first[swap], second[swap] = second[swap], first[swap]
+  order = np.lexsort((cellOf[second], cellOf[first]))
+  internal, neighbour = first[order], cellOf[second[order]]
+
+  # 边界面按补丁归类，顺序与补丁列表一致
+  patchOf = np.full(len(faces), -1, dtype=np.int64)
+  patchOf[single] = -2
+  boundary, patchInfo = [], []
+  start = len(internal)
+  for k, (name, ptype, cellIds, faceNos) in enumerate(patches):
+    cellIds, faceNos = np.asarray(cellIds, dtype=np.int64), np.asarray(faceNos, dtype=np.int64)
+    entry = np.where(faceNos <= 3, cellIds * 3 + faceNos - 1, nQuad + cellIds * 2 + faceNos - 4)
+    if (patchOf[entry] != -2).any():
+      raise RuntimeError('补丁 %s 中包含内部面或重复的边界面' % name)
+    patchOf[entry] = k
+    boundary.append(entry)
+    patchInfo.append((name, ptype, len(entry), start))
+    start += len(entry)
+  rest = np.flatnonzero(patchOf == -2)
+  if len(rest):
+    # 与 gambitToFoam 一致，未归入任何补丁的边界面放入 defaultFaces
+    boundary.append(rest)
+    patchInfo.append(('defaultFaces', 'empty', len(rest), start))
+
+  allFaces = np.concatenate([internal] + boundary)
+  return {
+    'nPoints': len(points),
+    'nCells': nCells,
+    'faces': faces[allFaces],
+    'owner': cellOf[allFaces],
+    'neighbour': neighbour,
+    'patches': patchInfo,
+  }
+
+
+def writeList(f, values, binary, fmt, dtype):
+  '''写出 OpenFOAM List：binary 为 N\\n(<raw>)，ascii 为逐行格式化'''
+  values = np.asarray(values)
+  f.write(('\n%d\n(' % len(values)).encode())
+  if binary:
+    f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+    f.write(b')')
+    return
+  f.write(b'\n')
+  for start in range(0, len(values), CHUNK):
+    block = values[start:start + CHUNK]
+    f.write(((fmt * len(block)) % tuple(block.ravel().tolist())).encode())
+  f.write(b')')
+
+
+def writeFaces(f, faces, binary):
+  isTri = faces[:, 3] < 0
+  if binary:
+    # faceCompactList：偏移表 + 扁平顶点表
+    sizes = np.where(isTri, 3, 4)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    writeList(f, offsets, True, None, '<i4')
+    writeList(f, faces[faces >= 0], True, None, '<i4')
+    return
+  f.write(('\n%d\n(\n' % len(faces)).encode())
+  for start in range(0, len(faces), CHUNK):
+    block, tri = faces[start:start + CHUNK], isTri[start:start + CHUNK]
+    fmt = ''.join('3(%d %d %d)\n' if t else '4(%d %d %d %d)\n' for t in tri.tolist())
+    f.write((fmt % tuple(block[block >= 0].tolist())).encode())
+  f.write(b')')
+
+
+def writePolyMesh(meshDir, points, mesh, binary=False, precision=12):
+  '''写出 points/faces/owner/neighbour/boundary 到 meshDir（通常为 constant/polyMesh）'''
+  os.makedirs(meshDir, exist_ok=True)
+  note = 'nPoints:%d  nCells:%d  nFaces:%d  nInternalFaces:%d' % (
+    mesh['nPoints'], mesh['nCells'], len(mesh['faces']), len(mesh['neighbour']))
+  pointFmt = '(%%.%dg %%.%dg %%.%dg)\n' % (precision, precision, precision)
+
+  with open(os.path.join(meshDir, 'points'), 'wb') as f:
+    f.write(header('vectorField', 'points', binary).encode())
+    writeList(f, points, binary, pointFmt, '<f8')
+    f.write(FOOTER.encode())
+  with open(os.path.join(meshDir, 'faces'), 'wb') as f:
+    f.write(header('faceCompactList' if binary else 'faceList', 'faces', binary).encode())
+    writeFaces(f, mesh['faces'], binary)
+    f.write(FOOTER.encode())
+  for name in ('owner', 'neighbour'):
+    with open(os.path.join(meshDir, name), 'wb') as f:
+      f.write(header('labelList', name, binary, note).encode())
+      writeList(f, mesh[name], binary, '%d\n', '<i4')
+      f.write(FOOTER.encode())
+  with open(os.path.join(meshDir, 'boundary'), 'w') as f:
+    f.write(header('polyBoundaryMesh', 'boundary'))
+    f.write('\n%d\n(\n' % len(mesh['patches']))
+    for name, ptype, nFaces, startFace in mesh['patches']:
+      f.write('    %s\n    {\n        type            %s;\n' % (name, ptype))
+      if ptype == 'wall':
+        f.write('        inGroups        1(wall);\n')
+      f.write('        nFaces          %d;\n        startFace       %d;\n    }\n' % (nFaces, startFace))
+    f.write(')\n' + FOOTER)
+
+
+def readList(buf, pos, binary, dtype, width):
+  '''从 pos 处读取一个 OpenFOAM List，返回 (array, newPos)；支持 N{v} 均匀写法'''
+  m = re.compile(rb'\s*(\d+)\s*([({])').match(buf, pos)
+  n = int(m.group(1))
+  pos = m.end()
+  if m.group(2) == b'{':
+    end = buf.index(b'}', pos)
+    return np.full(n * width, float(buf[pos:end]), dtype=dtype).reshape(n, width), end + 1
+  if binary:
+    size = n * width * np.dtype(dtype).itemsize
+    data = np.frombuffer(buf, dtype=dtype, count=n * width, offset=pos)
+    return data.reshape(n, width), buf.index(b')', pos + size) + 1
+  # ascii：每个文件仅含一个列表，取到最后一个右括号为止
+  end = buf.rindex(b')')
+  return buf[pos:end], end + 1
+
+
+def readFoamFile(path):
+  with open(path, 'rb') as f:
+    buf = f.read()
+  head = buf.index(b'}', buf.index(b'FoamFile'))
+  binary = b'binary' in re.search(rb'format\s+(\w+)', buf[:head]).group(1)
+  body = re.sub(rb'//[^\n]*', b'', buf[head + 1:], count=1)
+  return body, binary
+
+
+def readPolyMesh(meshDir):
+  '''读取 polyMesh（ascii/binary），返回与 buildPolyMesh 相同结构的 dict 及 points'''
+  body, binary = readFoamFile(os.path.join(meshDir, 'points'))
+  pts, _ = readList(body, 0, binary, '<f8', 3)
+  if not binary:
+    pts = np.array(pts.replace(b'(', b' ').replace(b')', b' ').split(), dtype=np.float64).reshape(-1, 3)
+
+  body, binary = readFoamFile(os.path.join(meshDir, 'faces'))
+  if binary:
+    offsets, pos = readList(body, 0, True, '<i4', 1)
+    labels, _ = readList(body, pos, True, '<i4', 1)
+    offsets, labels = offsets.ravel(), labels.ravel()
+    sizes = np.diff(offsets)
+  else:
+    raw, _ = readList(body, 0, False, None, 1)
+    tokens = np.array(raw.replace(b'(', b' ').replace(b')', b' ').split(), dtype=np.int64)
+    sizes, labels, pos = [], [], 0
+    while pos < len(tokens):
+      k = int(tokens[pos])
+      sizes.append(k)
+      labels.append(tokens[pos + 1:pos + 1 + k])
+      pos += 1 + k
+    sizes = np.array(sizes)
+    labels = np.concatenate(labels) if labels else np.empty(0, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+  if (sizes > 4).any() or (sizes < 3).any():
+    raise RuntimeError('仅支持三角形/四边形面')
+  faces = np.full((len(sizes), 4), -1, dtype=np.int64)
+  for k in (3, 4):
+    sel = np.flatnonzero(sizes == k)
+    faces[sel, :k] = labels[offsets[sel][:, None] + np.arange(k)]
+
+  lists = {}
+  for name in ('owner', 'neighbour'):
+    body, binary = readFoamFile(os.path.join(meshDir, name))
+    data, _ = readList(body, 0, binary, '<i4', 1)
+    if isinstance(data, bytes):
+      data = np.array(data.split(), dtype=np.int64)
+    lists[name] = np.asarray(data).ravel().astype(np.int64)
+
+  body, _ = readFoamFile(os.path.join(meshDir, 'boundary'))
+  patches = []
+  for name, block in re.findall(rb'(\w+)\s*\{([^}]*)\}', body):
+    field = lambda key: re.search(rb'\b' + key + rb'\s+([^;]+);', block).group(1).decode().strip()
+    patches.append((name.decode(), field(b'type'), int(field(b'nFaces')), int(field(b'startFace'))))
+
+  owner, neighbour = lists['owner'], lists['neighbour']
+  mesh = {
+    'nPoints': len(pts),
+    'nCells': int(max(owner.max(initial=-1), neighbour.max(initial=-1))) + 1,
+    'faces': faces,
+    'owner': owner,
+    'neighbour': neighbour,
+    'patches': patches,
+  }
+  return pts, mesh
+
+
+def canonicalFaces(faces):
+  '''将每个面旋转为最小顶点在首位（保持环向），便于比较顶点集合与朝向'''
+  out = faces.copy()
+  for k in (3, 4):
+    sel = np.flatnonzero((faces >= 0).sum(axis=1) == k)
+    ring = faces[sel, :k]
+    shift = np.argmin(ring, axis=1)
+    out[sel, :k] = ring[np.arange(len(sel))[:, None], (shift[:, None] + np.arange(k)) % k]
+  return out
+
+
+def comparePolyMesh(pointsA, meshA, pointsB, meshB, rtol=1e-5):
+  '''比较两个 polyMesh 的点、单元、内部面与补丁，返回差异描述列表（空列表表示一致）'''
+  problems = []
+  for key in ('nPoints', 'nCells'):
+    if meshA[key] != meshB[key]:
+      problems.append('%s 不一致: %d vs %d' % (key, meshA[key], meshB[key]))
+  if problems:
+    return problems
+
+  extent = np.ptp(pointsA, axis=0).max() or 1.0
+  err = np.abs(pointsA - pointsB).max() if len(pointsA) else 0.0
+  if err > rtol * extent:
+    problems.append('点坐标最大偏差 %.3e 超出容差 %.3e' % (err, rtol * extent))
+
+  nInt = len(meshA['neighbour'])
+  if nInt != len(meshB['neighbour']):
+    problems.append('内部面数不一致: %d vs %d' % (nInt, len(meshB['neighbour'])))
+  else:
+    if not (np.array_equal(meshA['owner'][:nInt], meshB['owner'][:nInt])
+            and np.array_equal(meshA['neighbour'], meshB['neighbour'])):
+      problems.append('内部面 owner/neighbour 不一致')
+    fa, fb = canonicalFaces(meshA['faces'][:nInt]), canonicalFaces(meshB['faces'][:nInt])
+    bad = (fa != fb).any(axis=1)
+    if bad.any():
+      problems.append('%d 个内部面的顶点或朝向不一致' % bad.sum())
+
+  patchesB = {p[0]: p for p in meshB['patches']}
+  for name, ptype, nFaces, start in meshA['patches']:
+    if name not in patchesB:
+      problems.append('补丁 %s 缺失' % name)
+      continue
+    _, _, nFacesB, startB = patchesB[name]
+    if nFaces != nFacesB:
+      problems.append('补丁 %s 面数不一致: %d vs %d' % (name, nFaces, nFacesB))
+      continue
+    key = lambda mesh, s, n: sorted(zip(map(tuple, canonicalFaces(mesh['faces'][s:s + n]).tolist()),
+                                        mesh['owner'][s:s + n].tolist()))
+    if key(meshA, start, nFaces) != key(meshB, startB, nFacesB):
+      problems.append('补丁 %s 的面集合或 owner 不一致' % name)
+  extra = set(patchesB) - {p[0] for p in meshA['patches']}
+  if extra:
+    problems.append('多余的补丁: %s' % ', '.join(sorted(extra)))
+  return problems
@@ -0,0 +1,149 @@
+import math
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from utils.interpolate import interpolateGrid
+
+'''
+terrain.tif 高程采样：与 buildTerrain 相同的经纬度 -> 米坐标换算及风向旋转，
+只读取覆盖查询范围的栅格窗口，避免整幅 DEM 载入内存
+'''
+
+EARTH_RADIUS = 6371
+RAD_PER_DEG = math.pi / 180
+METER_PER_DEG_LAT = 1000 * EARTH_RADIUS * RAD_PER_DEG
+# mean() 一次读入的最大像素数
+MEAN_CHUNK = 1 << 22
+
+
+class TerrainSampler:
+  def __init__(self, path, windAngle):
+    '''windAngle 为旋转角（弧度），即 buildTerrain 中的 (wind.angle + 90) * RAD_PER_DEG'''
+    self.ds = rasterio.open(path)
+    bounds = self.ds.bounds
+    self.lon = (bounds.left + bounds.right) / 2.0
+    self.lat = (bounds.bottom + bounds.top) / 2.0
+    LONG_LAT_RATIO = math.cos(self.lat * RAD_PER_DEG)
+    self.xmin, self.xmax = [(v - self.lon) * METER_PER_DEG_LAT * LONG_LAT_RATIO
+                            for v in [bounds.left, bounds.right]]
+    self.ymin, self.ymax = [(v - self.lat) * METER_PER_DEG_LAT
+                            for v in [bounds.bottom, bounds.top]]
+    self.xnum, self.ynum = self.ds.width, self.ds.height
+    self.dtype = np.dtype(self.ds.dtypes[0])
+    self.nodata = self.ds.nodata
+    self.windAngle = windAngle
+    self.data, self.col0, self.row0 = None, 0, 0
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def close(self):
+    self.ds.close()
+
+  def mean(self):
+    '''
+    全幅平均高程，与 numpy.average(全幅数组) 逐位一致（zeroElevation 决定 output.neu 的每个节点），
+    但不整幅读入：浮点 DEM 按 numpy 成对求和的拆分方式分段读取求和；
+    整型 DEM 以 int64 精确累加（numpy 的 float64 累加对整数同样精确）
+    '''
+    n = self.xnum * self.ynum
+    if self.dtype.kind in 'iu':
+      total = sum(int(self.ds.read(1, window=window).sum(dtype=np.int64))
+                  for _, window in self.ds.block_windows(1))
+      return np.float64(total) / n
+    if self.dtype not in (np.float32, np.float64):
+      return np.average(self.ds.read(1))
+    total = self.pairwiseSum(0, n)
+    return total.dtype.type(total / n)
+
+  def pairwiseSum(self, lo, n):
+    '''
+    展平像素 [lo, lo + n) 之和：按 numpy 成对求和（pairwise summation）的规则对半拆分
+    （前半取 8 的倍数），区间不超过 MEAN_CHUNK 时读入对应行，交给 numpy.add.reduce
+    '''
+    if n <= MEAN_CHUNK:
+      row0, row1 = lo // self.xnum, (lo + n - 1) // self.xnum + 1
+      rows = self.ds.read(1, window=Window(0, row0, self.xnum, row1 - row0)).ravel()
+      start = lo - row0 * self.xnum
+      return np.add.reduce(rows[start:start + n])
+    half = n // 2
+    half -= half % 8
+    return self.pairwiseSum(lo, half) + self.pairwiseSum(lo + half, n - half)
+
+  def pixel(self, x, y):
+    '''域坐标（米）-> 旋转后的栅格分数索引 (fx, fy)'''
+    px = x * math.cos(self.windAngle) + y * math.sin(self.windAngle)
+    py = y * math.cos(self.windAngle) - x * math.sin(self.windAngle)
+    fx = ((px - self.xmin) / (self.xmax - self.xmin)) * (self.xnum - 1)
+    fy = ((self.ymax - py) / (self.ymax - self.ymin)) * (self.ynum - 1)
+    return fx, fy
+
+  def load(self, radius=None, bbox=None):
+    '''
+    读取覆盖查询范围的栅格窗口（外扩 1 像素供双线性插值使用）
+    radius: 以原点为圆心的圆（旋转不变）；bbox: 域坐标矩形 (xlo, xhi, ylo, yhi)；均为 None 时读取全幅
+    '''
+    if radius is None and bbox is None:
+      col0, row0, col1, row1 = 0, 0, self.xnum, self.ynum
+    else:
+      if radius is not None:
+        # 圆心在原点的圆旋转后不变，旋转坐标 px, py 均落在 [-radius, radius] 内
+        p = np.array([-radius, radius], dtype=np.float64)
+        fx = ((p - self.xmin) / (self.xmax - self.xmin)) * (self.xnum - 1)
+        fy = ((self.ymax - p) / (self.ymax - self.ymin)) * (self.ynum - 1)
+      else:
+        xlo, xhi, ylo, yhi = bbox
+        fx, fy = self.pixel(np.array([xlo, xhi, xhi, xlo], dtype=np.float64),
+                            np.array([ylo, ylo, yhi, yhi], dtype=np.float64))
+      col0 = max(0, int(math.floor(fx.min())) - 1)
+      row0 = max(0, int(math.floor(fy.min())) - 1)
+      col1 = min(self.xnum, int(math.floor(fx.max())) + 3)
+      row1 = min(self.ynum, int(math.floor(fy.max())) + 3)
+    self.col0, self.row0 = col0, row0
+    if col1 <= col0 or row1 <= row0:
+      self.data = np.empty((0, 0), dtype=self.dtype)
+    else:
+      self.data = self.ds.read(1, window=Window(col0, row0, col1 - col0, row1 - row0))
+    return self.data
+
+  def covered(self, fx, fy):
+    '''检查双线性插值用到的栅格内像素是否都落在已读取的窗口中'''
+    h, w = self.data.shape
+    for f, n, lo0, size in ((fx, self.xnum, self.col0, w), (fy, self.ynum, self.row0, h)):
+      index = np.floor(f[np.isfinite(f)])
+      lo, hi = np.maximum(index, 0), np.minimum(index + 1, n - 1)
+      need = lo <= hi
+      if ((lo[need] < lo0) | (hi[need] >= lo0 + size)).any():
+        return False
+    return True
+
+  def sample(self, x, y, fill=None, dtype=np.float64, maskNodata=False):
+    '''
+    双线性采样域坐标 (x, y) 处的高程
+    fill: 栅格外取值；为 None 时将索引截断到栅格边缘
+    dtype: 计算类型（见 interpolateGrid）
+    maskNodata: 将 nodata 视为 NaN，插值结果非有限时退化为最近像素值
+    '''
+    if self.data is None:
+      self.load()
+    fx, fy = self.pixel(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    if fill is None:
+      fx = np.clip(fx, 0.0, float(self.xnum - 1))
+      fy = np.clip(fy, 0.0, float(self.ynum - 1))
+    if not self.covered(fx, fy):
+      raise RuntimeError('查询点超出已读取的 DEM 窗口，请扩大 load() 的范围')
+    grid = self.data
+    if maskNodata and self.nodata is not None:
+      grid = np.where(grid == self.nodata, np.nan, grid.astype(dtype))
+    # 窗口内的索引 = 全幅索引 - 窗口偏移；窗口外（即栅格外）的角点取 fill
+    pos = (fx - self.col0, fy - self.row0)
+    out = interpolateGrid(grid.T, pos, fill=fill, dtype=dtype)
+    if maskNodata:
+      bad = ~np.isfinite(out)
+      if bad.any():
+        nearest = grid[np.floor(pos[1][bad]).astype(np.intp), np.floor(pos[0][bad]).astype(np.intp)]
+        out[bad] = nearest
+    return out
@@ -23,6 +23,7 @@ const { knownTasks } = require('../utils/tasks');
 const windTurbinesRouter = require('./windTurbinesRouter');
 const archiver = require('archiver');
 const pdfDataService = require('../services/pdfDataService'); // 引入 PDF 数据服务
+const querySpeedDaemon = require('../services/querySpeedDaemon'); // 常驻单点风速查询进程
 const gdal = require('gdal-async');
 
 // --- In-memory running calculation registry (per backend instance) ---
@@ -853,9 +854,9 @@ router.post("/:caseId/calculate", checkCalculationStatus, async (req, res) => {
     console.log(`准备启动工况 ${caseId} 的计算...`);
     try {
         if (!fs.existsSync(runDir)) await fsPromises.mkdir(runDir, { recursive: true });
-        // 清理旧的可视化缓存
-        const cacheDir = path.join(casePath, 'visualization_cache');
-        if (fs.existsSync(cacheDir)) await fsPromises.rm(cacheDir, { recursive: true, force: true });
+        // 旧的可视化结果在新计算完成前不再提供：只删除 metadata.json（就绪标记），
+        // 保留 manifest.json 与各产物，预计算按输入哈希增量重建并清理过期文件
+        await fsPromises.rm(path.join(casePath, 'visualization_cache', 'metadata.json'), { force: true });
     } catch (err) {
         console.error(`准备运行环境 (${caseId}) 失败:`, err);
         return res.status(500).json({ success: false, message: '无法准备运行环境' });
@@ -1397,6 +1398,26 @@ router.get('/:caseId/visualization-slice', async (req, res) => {
     }
 });
 
+// 预计算脚本将全部风机的风廓线 / 尾流打包为 visualization_cache/{profiles,wakes}.json：
+// { ids: [...], <逐风机数组>: [[...], ...], <公共数组>: [...] }
+// 返回与旧版 turbine_<id>.json 相同结构的单台风机对象；打包文件不存在时返回 undefined
+const packedTurbineFieldsShared = { 'profiles.json': ['heights'], 'wakes.json': [] };
+const readPackedTurbineEntry = async (caseId, fileName, turbineId) => {
+    const packedPath = path.join(__dirname, '../uploads', caseId, 'visualization_cache', fileName);
+    if (!fs.existsSync(packedPath)) return undefined;
+    const packed = JSON.parse(await fsPromises.readFile(packedPath, 'utf-8'));
+    const ids = Array.isArray(packed.ids) ? packed.ids.map(String) : [];
+    const index = ids.indexOf(String(turbineId));
+    if (index < 0) return null;
+    const entry = { id: packed.ids[index] };
+    const shared = packedTurbineFieldsShared[fileName] || [];
+    for (const [key, value] of Object.entries(packed)) {
+        if (key === 'ids') continue;
+        entry[key] = shared.includes(key) ? value : value[index];
+    }
+    return entry;
+};
+
 // backend/routes/cases.js
 
 // 3. Get Wind Profile Data
@@ -1412,14 +1433,20 @@ router.get('/:caseId/visualization-profile/:turbineId', async (req, res) => {
     const profilePath = path.join(__dirname, '../uploads', caseId, 'visualization_cache', 'profiles', `turbine_${turbineId}.json`);
 
     try {
-        if (!fs.existsSync(profilePath)) {
-            console.warn(`Profile file not found: ${profilePath}`);
+        let profileData = await readPackedTurbineEntry(caseId, 'profiles.json', turbineId);
+        if (profileData === undefined) {
+            // 旧缓存：每台风机一个文件
+            if (!fs.existsSync(profilePath)) {
+                console.warn(`Profile file not found: ${profilePath}`);
+                return res.status(404).json({ success: false, message: `未找到风机 ${turbineId} 的风廓线数据。` });
+            }
+            const data = await fsPromises.readFile(profilePath, 'utf-8');
+            profileData = JSON.parse(data); // Parse the root object
+        }
+        if (profileData === null) {
             return res.status(404).json({ success: false, message: `未找到风机 ${turbineId} 的风廓线数据。` });
         }
 
-        const data = await fsPromises.readFile(profilePath, 'utf-8');
-        const profileData = JSON.parse(data); // Parse the root object
-
         // --- VALIDATION for {heights, speeds} structure ---
         // Check if it's an object and has the required arrays of the same length
         if (!profileData || typeof profileData !== 'object' || !Array.isArray(profileData.heights) || !Array.isArray(profileData.speeds) || profileData.heights.length !== profileData.speeds.length) {
@@ -1465,12 +1492,19 @@ router.get('/:caseId/visualization-wake/:turbineId', async (req, res) => {
 
      const wakePath = path.join(__dirname, '../uploads', caseId, 'visualization_cache', 'wakes', `turbine_${turbineId}.json`);
      try {
-         if (!fs.existsSync(wakePath)) {
+         let wake = await readPackedTurbineEntry(caseId, 'wakes.json', turbineId);
+         if (wake === undefined) {
+             // 旧缓存：每台风机一个文件
+             if (!fs.existsSync(wakePath)) {
+                 return res.status(404).json({ success: false, message: `未找到风机 ${turbineId} 的尾流数据。` });
+             }
+             const data = await fsPromises.readFile(wakePath, 'utf-8');
+             // Optional: Validate JSON structure
+             wake = JSON.parse(data);
+         }
+         if (wake === null) {
              return res.status(404).json({ success: false, message: `未找到风机 ${turbineId} 的尾流数据。` });
          }
-         const data = await fsPromises.readFile(wakePath, 'utf-8');
-         // Optional: Validate JSON structure
-         const wake = JSON.parse(data);
          // Example validation: Check for expected keys like 'centerline', 'deficit', etc.
          // if (!wake || typeof wake.centerline === 'undefined' || typeof wake.deficit === 'undefined') {
          //     console.error(`Wake data format invalid (${caseId}, Turbine ${turbineId})`);
@@ -1488,6 +1522,30 @@ router.get('/:caseId/visualization-wake/:turbineId', async (req, res) => {
      }
 });
 
+const getFriendlyQuerySpeedErrorMessage = (rawError) => {
+    const errText = String(rawError || '').trim();
+    const lower = errText.toLowerCase();
+    if (!errText) return '单点风速查询失败：后端未返回错误信息。';
+
+    if (errText.includes('Missing required Python package')) {
+        return '单点风速查询依赖 Python 包 numpy/scipy；请确认后端环境已安装依赖并重启服务。';
+    }
+
+    if (errText.includes('Data files (output.json/speed.bin) not found')) {
+        return '未找到速度场数据文件（output.json/speed.bin）。请先完成计算，并确认结果文件未被清理。';
+    }
+
+    if (lower.includes('data size mismatch')) {
+        return '速度场数据文件损坏或与元数据不匹配（output.json/speed.bin）。请重新计算或重新生成结果文件。';
+    }
+
+    if (lower.includes('python3') && (lower.includes('not found') || lower.includes('no such file'))) {
+        return '后端未找到 python3，无法执行单点风速查询。';
+    }
+
+    return '单点风速查询失败：后端脚本运行异常，请查看后端日志。';
+};
+
 // 新增：查询特定坐标点的风速
 router.get('/:caseId/query-wind-speed', async (req, res) => {
     const { caseId } = req.params;
@@ -1505,6 +1563,22 @@ router.get('/:caseId/query-wind-speed', async (req, res) => {
         return res.status(400).json({ success: false, message: '无效的坐标输入', errors: error.details.map(d => d.message) });
     }
 
+    // 优先使用常驻查询进程；进程本身不可用时回退到逐次启动脚本
+    if (querySpeedDaemon.enabled) {
+        try {
+            const [result] = await querySpeedDaemon.query(caseId, [[Number(x), Number(y), Number(z)]]);
+            return res.json({ success: true, speed: result.speed, message: result.message });
+        } catch (daemonError) {
+            if (daemonError.queryError) {
+                console.error(`单点风速查询失败 (case: ${caseId}, point: ${x},${y},${z}):`, daemonError.message);
+                const payload = { success: false, message: getFriendlyQuerySpeedErrorMessage(daemonError.message) };
+                if (process.env.DEBUG_QUERY_SPEED === '1') payload.debug = { error: daemonError.message };
+                return res.status(500).json(payload);
+            }
+            console.warn(`常驻查询进程不可用，回退到 run_query.sh (case: ${caseId}):`, daemonError.message);
+        }
+    }
+
     const scriptPath = path.join(__dirname, '../utils/run_query.sh');
     if (!fs.existsSync(scriptPath)) {
         return res.status(500).json({ success: false, message: '查询脚本不存在' });
@@ -1553,30 +1627,6 @@ router.get('/:caseId/query-wind-speed', async (req, res) => {
 	                }
 	            };
 
-	            const getFriendlyQuerySpeedErrorMessage = (rawError) => {
-	                const errText = String(rawError || '').trim();
-	                const lower = errText.toLowerCase();
-	                if (!errText) return '单点风速查询失败：后端未返回错误信息。';
-
-	                if (errText.includes('Missing required Python package')) {
-	                    return '单点风速查询依赖 Python 包 numpy/scipy；请确认后端环境已安装依赖并重启服务。';
-	                }
-
-	                if (errText.includes('Data files (output.json/speed.bin) not found')) {
-	                    return '未找到速度场数据文件（output.json/speed.bin）。请先完成计算，并确认结果文件未被清理。';
-	                }
-
-	                if (errText.includes('Binary data size mismatch')) {
-	                    return '速度场数据文件损坏或与元数据不匹配（output.json/speed.bin）。请重新计算或重新生成结果文件。';
-	                }
-
-	                if (lower.includes('python3') && (lower.includes('not found') || lower.includes('no such file'))) {
-	                    return '后端未找到 python3，无法执行单点风速查询。';
-	                }
-
-	                return '单点风速查询失败：后端脚本运行异常，请查看后端日志。';
-	            };
-
 	            const stdoutTrimmed = String(stdoutData || '').trim();
 	            const stderrTrimmed = String(stderrData || '').trim();
 	            const parsedStdout = tryParseJson(stdoutTrimmed);
@@ -1628,6 +1678,71 @@ router.get('/:caseId/query-wind-speed', async (req, res) => {
     }
 });
 
+// 逐次启动 query_speed.py --request -（请求 JSON 经 stdin 传入），返回与常驻进程相同的结果结构
+const runBatchQueryScript = (caseId, spec) => new Promise((resolve, reject) => {
+    const scriptPath = path.join(__dirname, '../utils/run_query.sh');
+    if (!fs.existsSync(scriptPath)) {
+        return reject(new Error('query script not found'));
+    }
+    const child = spawn('bash', [scriptPath, '--caseId', caseId, '--request', '-']);
+    let stdoutData = '';
+    let stderrData = '';
+    child.stdout.on('data', (data) => { stdoutData += data.toString(); });
+    child.stderr.on('data', (data) => { stderrData += data.toString(); });
+    child.on('error', reject);
+    child.on('close', (code) => {
+        let parsed = null;
+        try {
+            parsed = JSON.parse(stdoutData.trim());
+        } catch { /* handled below */ }
+        if (code === 0 && parsed && parsed.success) {
+            return resolve(parsed);
+        }
+        const error = new Error(parsed?.error || stderrData.trim() || stdoutData.trim() || `exit code ${code}`);
+        error.queryError = true;
+        reject(error);
+    });
+    child.stdin.on('error', () => { /* 脚本提前退出时由 close 处理 */ });
+    child.stdin.end(JSON.stringify(spec));
+});
+
+// 批量查询：多点、折线（按间距采样）或竖直廓线，z 为离地高度
+router.post('/:caseId/query-wind-speed/batch', async (req, res) => {
+    const { caseId } = req.params;
+    const point = Joi.array().items(Joi.number()).min(2).max(3);
+    const batchSchema = Joi.object({
+        points: Joi.array().items(Joi.array().items(Joi.number()).length(3)).max(1000000),
+        polyline: Joi.array().items(point).min(2),
+        spacing: Joi.number().positive(),
+        height: Joi.number(),
+        column: Joi.array().items(Joi.number()).length(2),
+        heights: Joi.array().items(Joi.number()),
+    }).xor('points', 'polyline', 'column');
+
+    const { error, value } = batchSchema.validate(req.body || {});
+    if (error) {
+        return res.status(400).json({ success: false, message: '无效的批量查询参数', errors: error.details.map(d => d.message) });
+    }
+
+    try {
+        // 与单点查询相同：优先常驻进程，QUERY_DAEMON=0 或进程不可用时逐次启动脚本
+        if (querySpeedDaemon.enabled) {
+            try {
+                return res.json(await querySpeedDaemon.batch(caseId, value));
+            } catch (daemonError) {
+                if (daemonError.queryError) throw daemonError;
+                console.warn(`常驻查询进程不可用，回退到 run_query.sh (case: ${caseId}):`, daemonError.message);
+            }
+        }
+        return res.json(await runBatchQueryScript(caseId, value));
+    } catch (queryError) {
+        console.error(`批量风速查询失败 (case: ${caseId}):`, queryError.message);
+        const payload = { success: false, message: getFriendlyQuerySpeedErrorMessage(queryError.message) };
+        if (process.env.DEBUG_QUERY_SPEED === '1') payload.debug = { error: queryError.message };
+        return res.status(500).json(payload);
+    }
+});
+
 // --- 5. 手动触发预计算 API ---
 router.post('/:caseId/precompute-visualization', async (req, res) => {
     const { caseId } = req.params;
@@ -1658,12 +1773,13 @@ router.post('/:caseId/precompute-visualization', async (req, res) => {
           return res.status(400).json({ success: false, message: message, calculationStatus: calcStatus });
      }
 
-    // 3. Clear old cache
+    // 3. Invalidate the old results. Only metadata.json (the "ready" marker) is removed:
+    //    manifest.json and the artifacts stay so the script rebuilds incrementally
+    //    (stale artifacts are rebuilt or pruned); body.force = true rebuilds everything.
+    const forceRebuild = req.body?.force === true;
     try {
-        if (fs.existsSync(cacheDir)) {
-            console.log(`手动触发：清理工况 ${caseId} 的可视化缓存...`);
-            await fsPromises.rm(cacheDir, { recursive: true, force: true });
-        }
+        console.log(`手动触发：使工况 ${caseId} 的可视化缓存失效${forceRebuild ? '（全部重建）' : '（增量重建）'}...`);
+        await fsPromises.rm(path.join(cacheDir, 'metadata.json'), { force: true });
     } catch(err) {
         console.error(`手动触发：清理缓存 (${caseId}) 失败:`, err);
         // Decide if this is fatal. Probably should continue.
@@ -1696,7 +1812,8 @@ router.post('/:caseId/precompute-visualization', async (req, res) => {
     // Use an async function wrapper to handle the spawn and updates without blocking.
     (async () => {
         try {
-            const pythonProcess = spawn('python3', [scriptPath, '--caseId', caseId], {
+            const scriptArgs = [scriptPath, '--caseId', caseId, ...(forceRebuild ? ['--force'] : [])];
+            const pythonProcess = spawn('python3', scriptArgs, {
                 stdio: ['ignore', 'pipe', 'pipe'] // Ignore stdin, capture stdout/stderr
             });
 
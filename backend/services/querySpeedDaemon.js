@@ -0,0 +1,114 @@
+const path = require('path');
+const readline = require('readline');
+const { spawn } = require('child_process');
+
+// 常驻的 utils/query_daemon.py 进程：JSON lines 协议，按 id 匹配请求与响应。
+// 进程退出后下一次查询会自动重启；QUERY_DAEMON=0 时调用方应回退到逐次 spawn。
+class QuerySpeedDaemon {
+    constructor(scriptPath, options = {}) {
+        this.scriptPath = scriptPath;
+        this.timeoutMs = options.timeoutMs || 10000;
+        this.child = null;
+        this.pending = new Map();
+        this.nextId = 1;
+    }
+
+    get enabled() {
+        return process.env.QUERY_DAEMON !== '0';
+    }
+
+    start() {
+        if (this.child) return this.child;
+        const child = spawn(process.env.PYTHON || 'python3', [this.scriptPath], {
+            cwd: path.dirname(this.scriptPath),
+            stdio: ['pipe', 'pipe', 'pipe'],
+        });
+        this.child = child;
+
+        readline.createInterface({ input: child.stdout }).on('line', (line) => {
+            let response;
+            try {
+                response = JSON.parse(line);
+            } catch {
+                console.error(`[query-daemon] 无法解析输出: ${line.slice(0, 200)}`);
+                return;
+            }
+            const entry = this.pending.get(response.id);
+            if (!entry) return;
+            this.pending.delete(response.id);
+            clearTimeout(entry.timer);
+            entry.resolve(response);
+        });
+        child.stderr.on('data', (data) => {
+            console.error(`[query-daemon] ${data.toString().trim()}`);
+        });
+
+        const fail = (error) => {
+            if (this.child !== child) return;
+            this.child = null;
+            this.rejectPending(error);
+        };
+        child.on('error', fail);
+        child.on('exit', (code, signal) => fail(new Error(`query daemon exited (code ${code}, signal ${signal})`)));
+        child.stdin.on('error', fail);
+        return child;
+    }
+
+    request(payload) {
+        const child = this.start();
+        const id = this.nextId++;
+        return new Promise((resolve, reject) => {
+            const timer = setTimeout(() => {
+                this.pending.delete(id);
+                reject(new Error(`query daemon timed out after ${this.timeoutMs} ms`));
+                // 守护进程逐个处理请求，卡住时后面的请求都会等到超时：结束它，下一次查询重新启动
+                if (this.child === child) this.stop(new Error('query daemon restarted after a timed-out request'));
+            }, this.timeoutMs);
+            this.pending.set(id, { resolve, reject, timer });
+            child.stdin.write(`${JSON.stringify({ ...payload, id })}\n`);
+        });
+    }
+
+    // points: [[x, y, z], ...]；返回与 query_speed.py 单点输出相同结构的结果数组
+    async query(caseId, points) {
+        const response = await this.request({ caseId, points });
+        if (!response.success) {
+            const error = new Error(response.error || 'query failed');
+            error.queryError = true;
+            throw error;
+        }
+        return response.results;
+    }
+
+    // 多点 / 折线 / 竖直廓线请求（见 query_speed.build_query），返回 json_payload 结构
+    async batch(caseId, spec) {
+        const response = await this.request({ ...spec, caseId });
+        if (!response.success) {
+            const error = new Error(response.error || 'query failed');
+            error.queryError = true;
+            throw error;
+        }
+        delete response.id;
+        return response;
+    }
+
+    rejectPending(error) {
+        for (const [id, entry] of this.pending) {
+            clearTimeout(entry.timer);
+            entry.reject(error);
+            this.pending.delete(id);
+        }
+    }
+
+    // 结束子进程，尚未返回的请求以 error 拒绝
+    stop(error = new Error('query daemon stopped')) {
+        const child = this.child;
+        this.child = null;
+        this.rejectPending(error);
+        if (child) child.kill();
+    }
+}
+
+module.exports = new QuerySpeedDaemon(path.join(__dirname, '../utils/query_daemon.py'), {
+    timeoutMs: Number(process.env.QUERY_DAEMON_TIMEOUT_MS) || 10000,
+});
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# backend/utils/bench_grid_sampler.py
+"""
+插值基准：scipy RegularGridInterpolator vs grid_sampler.GridSampler。
+
+在 --nz x --ny x --nx 的合成 float32 风速立方体（含一整层 NaN 与局部 NaN 块，
+模拟地形遮挡）上，分别测量构建耗时与 1 / 100 / 1e4 / --points 个随机点的
+采样耗时，并校验两者在有效点上的差异不超过 float32 精度、NaN 分布一致
+（GridSampler 在恰好落在有效层上的点不受相邻 NaN 层影响，这类点单独统计）。
+另对比 overlay_wake_on_slices 旧的逐行 np.interp 重采样与 resample_grid。
+
+用法：python3 bench_grid_sampler.py --nx 1000 --ny 1000 --nz 40 --points 1000000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from grid_sampler import GridSampler, resample_grid  # noqa: E402
+
+
+def timed(func, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = func(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def legacy_resample(ratio_src, x_src, y_src, x_dst, y_dst):
+    """overlay_wake_on_slices 旧实现：逐行、逐列 np.interp"""
+    tmp = np.empty((len(y_src), len(x_dst)), dtype=np.float32)
+    for iy in range(len(y_src)):
+        tmp[iy] = np.interp(x_dst, x_src, ratio_src[iy]).astype(np.float32)
+    out = np.empty((len(y_dst), len(x_dst)), dtype=np.float32)
+    for ix in range(len(x_dst)):
+        out[:, ix] = np.interp(y_dst, y_src, tmp[:, ix]).astype(np.float32)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RegularGridInterpolator vs GridSampler.")
+    parser.add_argument("--nx", type=int, default=600)
+    parser.add_argument("--ny", type=int, default=600)
+    parser.add_argument("--nz", type=int, default=30)
+    parser.add_argument("--dh", type=float, default=10.0)
+    parser.add_argument("--lt", type=float, default=10000.0, help="Domain size (m)")
+    parser.add_argument("--points", type=int, default=1000000, help="Largest batch size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    from scipy.interpolate import RegularGridInterpolator
+    scipy_import = time.perf_counter() - t0
+
+    rng = np.random.default_rng(args.seed)
+    half = args.lt / 2
+    x = np.linspace(-half, half, args.nx)
+    y = np.linspace(-half, half, args.ny)
+    heights = np.arange(1, args.nz + 1) * args.dh
+    cube = (6 + 4 * rng.random((args.nz, args.ny, args.nx))).astype(np.float32)
+    cube[-1] = np.nan
+    cube[: args.nz // 3, : args.ny // 5, : args.nx // 5] = np.nan
+
+    build_rgi, rgi = timed(lambda: RegularGridInterpolator((heights, y, x), cube, method="linear",
+                                                           bounds_error=False, fill_value=np.nan))
+    build_gs, sampler = timed(lambda: GridSampler(cube, x, y, heights, fill_value=np.nan))
+    print(f"导入 scipy.interpolate: {scipy_import * 1e3:8.1f} ms（GridSampler 仅依赖 numpy）")
+    print(f"构建: RegularGridInterpolator {build_rgi * 1e3:8.2f} ms | GridSampler {build_gs * 1e3:8.2f} ms")
+
+    ok = True
+    sizes = sorted({1, 100, 10000, args.points})
+    for n in sizes:
+        pts = np.column_stack([
+            rng.uniform(0, heights[-1] + args.dh, n),
+            rng.uniform(-half * 1.02, half * 1.02, n),
+            rng.uniform(-half * 1.02, half * 1.02, n),
+        ])
+        # 一部分点恰好落在层高上（含紧邻 NaN 层的那一层）
+        on_layer = rng.random(n) < 0.1
+        pts[on_layer, 0] = rng.choice(heights, on_layer.sum())
+        repeat = 20 if n <= 100 else 3
+        t_rgi, ref = timed(rgi, pts, repeat=repeat)
+        t_gs, out = timed(sampler, pts, repeat=repeat)
+
+        exact_node = np.isin(pts[:, 0], heights)
+        both = np.isfinite(ref) & np.isfinite(out)
+        err = float(np.abs(ref[both] - out[both]).max()) if both.any() else 0.0
+        nan_mismatch = (np.isnan(ref) != np.isnan(out)) & ~exact_node
+        recovered = int((np.isnan(ref) & np.isfinite(out) & exact_node).sum())
+        print(f"{n:>9} 点: RGI {t_rgi * 1e3:9.3f} ms | GridSampler {t_gs * 1e3:9.3f} ms | "
+              f"{t_rgi / t_gs:5.1f}x | 最大误差 {err:.1e} | 层上恢复 {recovered} 点")
+        ok &= out.dtype == np.float32 and err <= 1e-5 * float(np.nanmax(cube)) and not nan_mismatch.any()
+
+    src_shape = (200, 240)
+    ratio = rng.random(src_shape).astype(np.float32)
+    xs = np.linspace(-half, half, src_shape[1], dtype=np.float32)
+    ys = np.linspace(-half, half, src_shape[0], dtype=np.float32)
+    xd, yd = x.astype(np.float32), y.astype(np.float32)
+    t_old, ref = timed(legacy_resample, ratio, xs, ys, xd, yd, repeat=1)
+    t_new, out = timed(resample_grid, ratio, xs, ys, xd, yd)
+    err = float(np.abs(ref - out).max())
+    print(f"重采样 {src_shape} -> {cube.shape[1:]}: 逐行 np.interp {t_old * 1e3:8.1f} ms | "
+          f"resample_grid {t_new * 1e3:8.1f} ms | {t_old / t_new:5.1f}x | 最大误差 {err:.1e}")
+    ok &= err <= 1e-5
+
+    print("校验通过" if ok else "校验失败!")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# backend/utils/bench_slice_payload.py
+"""
+切片负载基准：逐元素 JSON（旧实现）vs slice_to_lists JSON vs 二进制编码。
+
+对 --n x --n 的合成切片分别测量序列化耗时与负载大小，并解码二进制负载，
+校验 float32 逐位一致、float16 / uint16 误差在编码精度内。
+
+用法：python3 bench_slice_payload.py --n 1000
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from process_speed_data import (NumpyEncoder, SLICE_MAGIC, UINT16_NODATA, encode_slice,  # noqa: E402
+                                slice_to_lists, write_binary_payload)
+
+
+def legacy_json(slice_data):
+    values = [[float(v) if not np.isnan(v) else None for v in row] for row in slice_data]
+    return json.dumps({"sliceData": {"values": values}}, cls=NumpyEncoder).encode("utf-8")
+
+
+def new_json(slice_data):
+    return json.dumps({"sliceData": {"values": slice_to_lists(slice_data)}}, cls=NumpyEncoder).encode("utf-8")
+
+
+def binary(slice_data, encoding):
+    header, values = encode_slice(slice_data, encoding)
+    stream = io.BytesIO()
+    write_binary_payload(stream, {"success": True, "sliceData": dict(header, values=values)})
+    return stream.getvalue()
+
+
+def decode(payload):
+    """按浏览器端的方式解析二进制负载，返回 (头, float64 切片)"""
+    assert payload[:4] == SLICE_MAGIC
+    size = int(np.frombuffer(payload[4:8], dtype="<u4")[0])
+    header = json.loads(payload[8:8 + size])
+    info = header["sliceData"]
+    values = np.frombuffer(payload, dtype=info["dtype"], offset=8 + size).reshape(info["shape"])
+    if info["encoding"] == "uint16":
+        out = info["offset"] + values.astype(np.float64) * info["scale"]
+        out[values == UINT16_NODATA] = np.nan
+        return header, out
+    return header, values.astype(np.float64)
+
+
+def timed(func, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = func(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs binary slice payloads.")
+    parser.add_argument("--n", type=int, default=1000, help="Slice size (n x n)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    yy, xx = np.mgrid[0:args.n, 0:args.n] / args.n
+    slice_data = (8 + 3 * np.sin(8 * xx) * np.cos(5 * yy) + 0.2 * rng.standard_normal((args.n, args.n))).astype(np.float32)
+    slice_data[rng.random(slice_data.shape) < 0.02] = np.nan
+
+    base_time, base = timed(legacy_json, slice_data, repeat=1)
+    print(f"{'legacy json':>12}: {base_time * 1e3:9.1f} ms {len(base) / 2**20:8.2f} MB")
+    json_time, payload = timed(new_json, slice_data)
+    print(f"{'json':>12}: {json_time * 1e3:9.1f} ms {len(payload) / 2**20:8.2f} MB  (与旧实现{'一致' if payload == base else '不一致!'})")
+    ok = payload == base
+
+    finite = np.isfinite(slice_data)
+    for encoding in ("float32", "float16", "uint16"):
+        t, payload = timed(binary, slice_data, encoding)
+        _, decoded = decode(payload)
+        same_nan = np.array_equal(np.isnan(decoded), ~finite)
+        err = float(np.abs(decoded[finite] - slice_data[finite]).max())
+        print(f"{encoding:>12}: {t * 1e3:9.1f} ms {len(payload) / 2**20:8.2f} MB | "
+              f"{base_time / t:6.0f}x 更快, {len(base) / len(payload):5.1f}x 更小 | 最大误差 {err:.2e}")
+        limit = {"float32": 0.0, "float16": 1e-2, "uint16": float(np.nanmax(slice_data)) / 65534 * 2}[encoding]
+        ok &= same_nan and err <= limit
+    print("解码校验通过" if ok else "解码校验失败!")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
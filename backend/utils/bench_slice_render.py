@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# backend/utils/bench_slice_render.py
+"""
+切片 PNG 渲染基准：每层新建 figure（旧实现）vs 复用 figure + savefig vs 色表直出 PNG。
+
+在 --n x --n 的合成风速层（含 NaN 块与超出色标范围的值）上测量
+precompute_visualization.SliceRenderer 两种 renderer 的单层耗时与文件大小，
+并校验色表直出的配色与 matplotlib 的 Colormap(Normalize(...)) 逐像素一致、
+风机像素坐标与 transData 换算结果一致。
+
+用法：python3 bench_slice_render.py --n 1000 --layers 10
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import precompute_visualization as pv  # noqa: E402
+from precompute_visualization import plt, mcolors  # noqa: E402
+
+
+def fresh_figure_render(renderer, k, z, layer):
+    """旧实现：每层重新建 figure"""
+    renderer.close()
+    renderer.painter = None
+    return renderer.render(k, z, layer)
+
+
+def per_layer(func, renderer, layers, heights):
+    t0 = time.perf_counter()
+    for k, (z, layer) in enumerate(zip(heights, layers)):
+        func(renderer, k, z, layer)
+    return (time.perf_counter() - t0) / len(layers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark slice PNG rendering paths.")
+    parser.add_argument("--n", type=int, default=1000, help="Layer size (n x n)")
+    parser.add_argument("--layers", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    yy, xx = np.mgrid[0:args.n, 0:args.n] / args.n
+    layers = []
+    for k in range(args.layers):
+        layer = (8 + 3 * np.sin(8 * xx + k) * np.cos(5 * yy) + 0.1 * rng.standard_normal(xx.shape)).astype(np.float32)
+        layer[: args.n // 8, : args.n // 8] = np.nan
+        layer[-args.n // 20:] = 14.0  # 超出 vmax
+        layers.append(layer)
+    heights = [10.0 * (k + 1) for k in range(args.layers)]
+    turbines = [{"id": f"T{i}", "x": float(x), "y": float(y)}
+                for i, (x, y) in enumerate(rng.uniform(-4500, 4500, (20, 2)))]
+    cmap = plt.get_cmap("viridis")
+
+    out_dir = tempfile.mkdtemp(prefix="bench_slice_")
+    results = {}
+    for label, renderer_name, func in (("新建 figure", "matplotlib", fresh_figure_render),
+                                       ("复用 figure", "matplotlib", None),
+                                       ("色表直出", "pillow", None)):
+        renderer = pv.SliceRenderer(figsize=(8, 8), dpi=100, extent_m=[-5000, 5000, -5000, 5000], cmap=cmap,
+                                    vmin=0.0, vmax=12.0, turbines=turbines, slices_img_dir=out_dir,
+                                    slices_info_dir=out_dir, renderer=renderer_name)
+        renderer.render(0, heights[0], layers[0])  # 预热：建 figure / 静态底图
+        t = per_layer(func or (lambda r, k, z, layer: r.render(k, z, layer)), renderer, layers, heights)
+        size = os.path.getsize(os.path.join(out_dir, f"slice_height_{heights[-1]:.1f}.png"))
+        results[label] = (t, renderer)
+        print(f"{label:>8}: {t * 1e3:8.1f} ms/层 | PNG {size / 1024:7.1f} KB")
+    base = results["新建 figure"][0]
+    print(f"色表直出相对旧实现 {base / results['色表直出'][0]:.0f}x，相对复用 figure "
+          f"{results['复用 figure'][0] / results['色表直出'][0]:.0f}x")
+
+    painter = results["色表直出"][1].painter
+    sub = layers[0][painter._cell_index(layers[0].shape)]
+    ref_cmap = cmap.with_extremes(bad="white")  # NaN 透出白色坐标轴底色
+    ref = np.round(ref_cmap(mcolors.Normalize(0.0, 12.0)(sub))[..., :3] * 255).astype(np.uint8)
+    color_ok = np.array_equal(painter.colorize(sub), ref)
+    px_fast = results["色表直出"][1].turbines_px
+    px_mpl = results["复用 figure"][1].turbines_px
+    px_err = max(max(abs(a["x"] - b["x"]), abs(a["y"] - b["y"])) for a, b in zip(px_fast, px_mpl))
+    print(f"配色与 matplotlib 一致: {color_ok} | 风机像素坐标最大偏差 {px_err:.2f} px")
+    for _, renderer in results.values():
+        renderer.close()
+    ok = color_ok and px_err <= 0.01
+    print("校验通过" if ok else "校验失败!")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
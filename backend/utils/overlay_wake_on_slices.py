@@ -37,6 +37,9 @@ import matplotlib.colors as mcolors
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 
+from grid_sampler import resample_grid
+from speed_cube import load_speed_data
+
 
 ModelKind = Literal["simple", "floris"]
 
@@ -283,14 +286,21 @@ def _load_terrain_on_domain_grid(
     if not terrain_path.exists():
         raise FileNotFoundError(terrain_path)
 
+    # Reuse the solver's DEM sampler so the lon/lat -> meter mapping and the
+    # bilinear kernel live in one place (backend/base/solver/utils/terrain.py).
+    solver_dir = Path(__file__).resolve().parents[1] / "base" / "solver"
+    if str(solver_dir) not in sys.path:
+        sys.path.insert(0, str(solver_dir))
     try:
-        import rasterio  # type: ignore
-    except Exception as e:
+        from utils.terrain import RAD_PER_DEG, TerrainSampler  # type: ignore
+    except ImportError as e:
         raise RuntimeError(
             "rasterio is required for --terrain-contours. Install it in your python environment."
         ) from e
 
-    with rasterio.open(terrain_path) as ds:
+    theta = (float(wind_from_deg_for_alignment) + 90.0) * RAD_PER_DEG
+    with TerrainSampler(str(terrain_path), theta) as sampler:
+        ds = sampler.ds
         if ds.crs is None:
             print(
                 f"Warning: DEM has no CRS. Contour overlay assumes WGS84 lon/lat: {terrain_path}",
@@ -303,78 +313,19 @@ def _load_terrain_on_domain_grid(
 
         if ds.count < 1:
             raise RuntimeError(f"Invalid DEM: {terrain_path} has no bands")
-        arr = ds.read(1).astype(np.float32)
-        nodata = ds.nodata
-        if nodata is not None:
-            arr = np.where(arr == float(nodata), np.nan, arr)
-
-        # bounds in degrees
-        left, bottom, right, top = ds.bounds.left, ds.bounds.bottom, ds.bounds.right, ds.bounds.top
-        lon0 = (left + right) / 2.0
-        lat0 = (bottom + top) / 2.0
-
-        # match buildTerrain.py conversion
-        EARTH_RADIUS_KM = 6371.0
-        RAD_PER_DEG = math.pi / 180.0
-        METER_PER_DEG_LAT = 1000.0 * EARTH_RADIUS_KM * RAD_PER_DEG
-        LONG_LAT_RATIO = math.cos(lat0 * RAD_PER_DEG)
-
-        xmin, xmax = [(v - lon0) * METER_PER_DEG_LAT * LONG_LAT_RATIO for v in (left, right)]
-        ymin, ymax = [(v - lat0) * METER_PER_DEG_LAT for v in (bottom, top)]
-
-        h, w = arr.shape
-        if not (w > 1 and h > 1):
-            raise RuntimeError(f"Invalid DEM size: {w}x{h}")
-
-        # Query grid (domain coords) -> rotated coords for DEM sampling.
-        # Use the same rotation used in buildTerrain.py (windAngle = (wind_from + 90) degrees).
-        theta = (float(wind_from_deg_for_alignment) + 90.0) * RAD_PER_DEG
-        cos_t = math.cos(theta)
-        sin_t = math.sin(theta)
-
-        # Broadcast to (ny,nx)
-        xx = x_coords_m.astype(np.float32)[None, :]
-        yy = y_coords_m.astype(np.float32)[:, None]
-
-        px = xx * cos_t + yy * sin_t
-        py = yy * cos_t - xx * sin_t
-
-        # Convert meters to fractional pixel indices.
-        # X: left->right increases; Y: top->bottom increases in raster row index.
-        ix = (px - float(xmin)) / float(xmax - xmin) * (w - 1)
-        iy = (float(ymax) - py) / float(ymax - ymin) * (h - 1)
-
-        # Clamp indices; outside DEM will be clipped to edge.
-        ix = np.clip(ix, 0.0, float(w - 1))
-        iy = np.clip(iy, 0.0, float(h - 1))
-
-        x0 = np.floor(ix).astype(np.int32)
-        y0 = np.floor(iy).astype(np.int32)
-        x1 = np.clip(x0 + 1, 0, w - 1)
-        y1 = np.clip(y0 + 1, 0, h - 1)
-
-        wx = (ix - x0).astype(np.float32)
-        wy = (iy - y0).astype(np.float32)
-
-        v00 = arr[y0, x0]
-        v10 = arr[y0, x1]
-        v01 = arr[y1, x0]
-        v11 = arr[y1, x1]
-
-        # Bilinear interpolation; handle NaNs by falling back to nearest where possible.
-        out = (
-            (1 - wx) * (1 - wy) * v00
-            + wx * (1 - wy) * v10
-            + (1 - wx) * wy * v01
-            + wx * wy * v11
-        ).astype(np.float32)
-
-        # If NaNs remain, fill with nearest neighbor sample.
-        nan_mask = ~np.isfinite(out)
-        if np.any(nan_mask):
-            out[nan_mask] = v00[nan_mask]
-
-        return out
+        if not (sampler.xnum > 1 and sampler.ynum > 1):
+            raise RuntimeError(f"Invalid DEM size: {sampler.xnum}x{sampler.ynum}")
+
+        # Only read the raster window covering the (rotated) slice extent.
+        x = np.asarray(x_coords_m, dtype=np.float64)
+        y = np.asarray(y_coords_m, dtype=np.float64)
+        sampler.load(bbox=(float(x.min()), float(x.max()), float(y.min()), float(y.max())))
+
+        # Outside the DEM is clamped to the edge; nodata falls back to the
+        # nearest corner sample.
+        xx, yy = np.meshgrid(x, y)
+        out = sampler.sample(xx, yy, fill=None, dtype=np.float32, maskNodata=True)
+        return out.astype(np.float32, copy=False)
 
 
 def _load_speed_cube(case_dir: Path) -> tuple[np.ndarray, dict]:
@@ -383,24 +334,13 @@ def _load_speed_cube(case_dir: Path) -> tuple[np.ndarray, dict]:
         raise FileNotFoundError(meta_path)
     meta = _read_json(meta_path)
 
-    size = meta.get("size")
-    if not size or len(size) != 3:
-        raise ValueError("output.json missing size=[Nx,Ny,Nz]")
-    nx, ny, nz = map(int, size)
-
     bin_name = meta.get("file", "speed.bin")
     bin_path = Path(bin_name)
     if not bin_path.is_absolute():
         bin_path = case_dir / bin_name
-    if not bin_path.exists():
-        raise FileNotFoundError(bin_path)
-
-    expected = nx * ny * nz
-    data = np.fromfile(bin_path, dtype=np.float32)
-    if data.size != expected:
-        raise ValueError(f"speed.bin size mismatch: expected {expected} float32, got {data.size}")
-    cube = data.reshape((nz, ny, nx)).astype(np.float32)
-    cube[np.isinf(cube)] = np.nan
+
+    # Read-only memmap shared with the other scripts; NaN/Inf are masked by callers.
+    cube, _, _, _ = load_speed_data(str(bin_path), meta)
     return cube, meta
 
 
@@ -624,23 +564,14 @@ def _interp_ratio_to_base_grid(
 ) -> np.ndarray:
     """
     Resample a (len(y_src),len(x_src)) field onto (len(y_dst),len(x_dst)) via
-    separable 1D linear interpolation (x then y). This is fast and has no SciPy dependency.
+    separable 1D linear interpolation (x then y), clamped at the edges like
+    np.interp. Vectorized in grid_sampler.resample_grid; no SciPy dependency.
     """
 
     if ratio_src.shape != (len(y_src), len(x_src)):
         raise ValueError("ratio_src shape must match y_src/x_src lengths")
 
-    # Interpolate along x for each y row.
-    tmp = np.empty((len(y_src), len(x_dst)), dtype=np.float32)
-    for iy in range(len(y_src)):
-        tmp[iy] = np.interp(x_dst, x_src, ratio_src[iy]).astype(np.float32)
-
-    # Interpolate along y for each x column.
-    out = np.empty((len(y_dst), len(x_dst)), dtype=np.float32)
-    for ix in range(len(x_dst)):
-        out[:, ix] = np.interp(y_dst, y_src, tmp[:, ix]).astype(np.float32)
-
-    return out
+    return resample_grid(ratio_src, x_src, y_src, x_dst, y_dst)
 
 
 def _build_default_floris_config(
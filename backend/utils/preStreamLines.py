@@ -18,17 +18,24 @@ complete_streamline_processor.py  --  完整的流线处理：生成 → 裁剪
 
 import pyvista as pv
 import numpy as np
+import os
 import sys
+import shutil
 import pathlib
 import argparse
+import tempfile
 from scipy.spatial import cKDTree
 
+from worker_pool import pool_context, resolve_workers, run_pool
+
 # =======================================================
 #               ↓↓↓ 在这里修改测试级别 ↓↓↓
 # =======================================================
 TEST_LEVEL = 3  # 可选值: 1 (保守), 2 (中等), 3 (精细)
 # =======================================================
 
+PARTITIONS_PER_WORKER = 4  # 每个进程分到的种子块数：流线长短不一，多切几块以均衡负载
+
 
 def terrain_seeds(bounds, ground_kd, ground_z, z_rel, nx=60, ny=60):
     """
@@ -107,24 +114,38 @@ def clip_following_terrain(stream, ground_kd, ground_z, z_rel, delta):
     return final_clipped
 
 
+def streamline_stats(stream):
+    """
+    逐条折线的点数、长度和首尾位移，直接由 lines 的 offsets/connectivity 数组向量化计算
+    （流线追踪输出只含折线单元）。只返回点数 > 1 的流线，顺序与单元顺序一致。
+    """
+    cells = stream.GetLines()
+    offsets = pv.convert_array(cells.GetOffsetsArray()).astype(np.int64)
+    conn = pv.convert_array(cells.GetConnectivityArray()).astype(np.int64)
+    counts = np.diff(offsets)
+    valid = counts > 1
+    starts, ends = offsets[:-1][valid], offsets[1:][valid] - 1
+    if not valid.any():
+        empty = np.empty(0)
+        return counts[valid], empty, empty
+    pts = np.asarray(stream.points, dtype=np.float64)[conn]
+    seg = np.linalg.norm(np.diff(pts, axis=0), axis=1)
+    # 相邻两条流线首尾之间的“伪线段”；空流线造成的首尾边界（0 或 len(conn)）没有对应线段
+    b = offsets[1:-1]
+    seg[b[(b > 0) & (b < len(conn))] - 1] = 0.0
+    lengths = np.add.reduceat(seg, starts)
+    displacement = np.linalg.norm(pts[ends] - pts[starts], axis=1)
+    return counts[valid], lengths, displacement
+
+
 def analyze_streamlines_enhanced(stream):
     """增强版流线分析，包含更详细的诊断"""
     print("=== 增强流线轨迹分析 ===")
     if not stream or stream.n_cells == 0:
         print("警告: 没有生成流线!")
         return
-    line_lengths, max_displacement, line_points_count = [], [], []
-    for i in range(stream.n_cells):
-        line = stream.get_cell(i)
-        if line.n_points > 1:
-            line_points = line.points
-            line_points_count.append(line.n_points)
-            segments = np.diff(line_points, axis=0)
-            length = np.sum(np.linalg.norm(segments, axis=1))
-            line_lengths.append(length)
-            displacement = np.linalg.norm(line_points[-1] - line_points[0])
-            max_displacement.append(displacement)
-    if not line_lengths:
+    line_points_count, line_lengths, max_displacement = streamline_stats(stream)
+    if not len(line_lengths):
         print("没有有效的流线长度数据。")
         return
     print(f"分析流线数量: {len(line_lengths)} / {stream.n_cells}")
@@ -136,8 +157,9 @@ def analyze_streamlines_enhanced(stream):
     y_range = all_points[:, 1].max() - all_points[:, 1].min()
     z_range = all_points[:, 2].max() - all_points[:, 2].min()
     print(f"流线覆盖范围: X={x_range:.3f}, Y={y_range:.3f}, Z={z_range:.3f}")
-    curvature_ratios = [disp/length for disp, length in zip(max_displacement, line_lengths) if length > 1e-3]
-    if not curvature_ratios:
+    keep = line_lengths > 1e-3
+    curvature_ratios = max_displacement[keep] / line_lengths[keep]
+    if not len(curvature_ratios):
         print("无法计算流线直线度。")
         return
     avg_curvature = np.mean(curvature_ratios)
@@ -146,6 +168,94 @@ def analyze_streamlines_enhanced(stream):
         print("⚠️  警告: 流线过度直线化，建议减小步长或检查湍流模型。")
 
 
+# 工作进程共享的 (网格, 种子坐标, 积分参数)
+_trace_state = None
+
+
+def _init_trace_worker(mesh, seed_points, tracer_kwargs):
+    global _trace_state
+    if isinstance(mesh, str):         # 非 fork 平台：从父进程写出的临时 VTU 读入
+        mesh = pv.read(mesh)
+    _trace_state = (mesh, seed_points, tracer_kwargs)
+
+
+def _trace_partition(lo, hi):
+    """积分种子 [lo, hi)，以 numpy 数组返回（整个 PolyData 走 pickle 很慢）"""
+    mesh, seed_points, tracer_kwargs = _trace_state
+    part = mesh.streamlines_from_source(pv.PolyData(seed_points[lo:hi]), **tracer_kwargs)
+    cells = part.GetLines()
+    return {
+        "seed_offset": lo,
+        "points": np.asarray(part.points),
+        "offsets": pv.convert_array(cells.GetOffsetsArray()).astype(np.int64),
+        "connectivity": pv.convert_array(cells.GetConnectivityArray()).astype(np.int64),
+        "point_data": {k: np.asarray(part.point_data[k]) for k in part.point_data.keys()},
+        "cell_data": {k: np.asarray(part.cell_data[k]) for k in part.cell_data.keys()},
+    }
+
+
+def merge_streamline_parts(parts):
+    """按种子顺序拼接各块流线；SeedIds 换回全局种子编号，只保留各块共有的数组"""
+    parts = [p for p in parts if len(p["offsets"]) > 1]
+    if not parts:
+        return pv.PolyData()
+    points, lines, base = [], [], 0
+    for p in parts:
+        counts = np.diff(p["offsets"])
+        lines.append(np.insert(p["connectivity"] + base, p["offsets"][:-1], counts))
+        points.append(p["points"])
+        base += len(p["points"])
+    stream = pv.PolyData(np.concatenate(points), lines=np.concatenate(lines))
+    for attr, data in (("point_data", stream.point_data), ("cell_data", stream.cell_data)):
+        for key in parts[0][attr]:
+            if all(key in p[attr] for p in parts):
+                data[key] = np.concatenate([p[attr][key] + p["seed_offset"] if key == "SeedIds" else p[attr][key]
+                                            for p in parts])
+    if "Normals" in stream.point_data:
+        stream.point_data.active_normals_name = "Normals"
+    return stream
+
+
+def integrate_streamlines(mesh, seeds, tracer_kwargs, workers=None):
+    """
+    从 seeds 积分流线。workers > 1 时把种子按顺序切成连续的若干块，在进程池里分别积分
+    （fork 共享已加载的网格），再按原顺序拼接：点、线、数组与一次性积分的结果一致。
+    进程数：workers 参数，其次环境变量 PRECOMPUTE_WORKERS，否则全部 CPU（worker_pool）；无法建进程池时串行。
+    """
+    global _trace_state
+    seed_points = np.asarray(seeds.points)
+    workers = resolve_workers(workers, len(seed_points))
+    if workers <= 1:
+        return mesh.streamlines_from_source(seeds, **tracer_kwargs)
+
+    n_parts = min(len(seed_points), workers * PARTITIONS_PER_WORKER)
+    bounds = np.linspace(0, len(seed_points), n_parts + 1).astype(int)
+    # 单元定位器缓存在网格上：在父进程建好，各进程直接继承，不必各建一份
+    if hasattr(mesh, "BuildCellLocator"):
+        mesh.BuildCellLocator()
+    use_fork = pool_context().get_start_method() == "fork"
+    tmp_dir = None
+    try:
+        if use_fork:
+            shared = mesh
+        else:
+            tmp_dir = tempfile.mkdtemp(prefix="streamlines_")
+            shared = os.path.join(tmp_dir, "mesh.vtu")
+            grid = mesh if isinstance(mesh, pv.UnstructuredGrid) else mesh.cast_to_unstructured_grid()
+            grid.save(shared)
+        print(f"并行积分: {len(seed_points)} 个种子 → {n_parts} 块, {workers} 个进程")
+        sys.stdout.flush()
+        # 进程池不可用时各块在本进程依次积分，拼接结果与并行相同
+        parts = run_pool(_trace_partition, zip(bounds[:-1], bounds[1:]), workers,
+                         initializer=_init_trace_worker, initargs=(shared, seed_points, tracer_kwargs),
+                         label="seed partitions")
+    finally:
+        _trace_state = None
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return merge_streamline_parts(parts)
+
+
 def generate_streamlines_enhanced(mesh, ground_kd, ground_z, z_rel, args):
     """
     增强版流线生成，使用随地形或表面顶点的种子和RK45积分器
@@ -205,16 +315,18 @@ def generate_streamlines_enhanced(mesh, ground_kd, ground_z, z_rel, args):
     
     stream = None
     try:
-        stream = mesh.streamlines_from_source(
+        stream = integrate_streamlines(
+            mesh,
             seeds,
-            vectors=args.vec,
-            integrator_type=4,
-            integration_direction='forward',
-            initial_step_length=step_length,
-            step_unit='l',
-            max_steps=max_steps,
-            max_time=max_time,
-            terminal_speed=1e-12 
+            dict(vectors=args.vec,
+                 integrator_type=4,
+                 integration_direction='forward',
+                 initial_step_length=step_length,
+                 step_unit='l',
+                 max_steps=max_steps,
+                 max_time=max_time,
+                 terminal_speed=1e-12),
+            workers=args.workers
         )
         print(f'✓ RK45积分成功: {stream.n_cells} 条流线')
         
@@ -246,6 +358,8 @@ def main():
     ap.add_argument('--seed-surface', help='路径: 用该 VTP/STL 表面顶点作种子')
     ap.add_argument('--seed-sample',  type=int,
                     help='若提供，则从表面随机抽取 N 个顶点作种子')
+    ap.add_argument('--workers', type=int, default=None,
+                    help='积分进程数 (默认: $PRECOMPUTE_WORKERS, 否则全部 CPU; 1 = 单进程)')
     
     args = ap.parse_args()
     
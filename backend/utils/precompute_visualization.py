@@ -13,17 +13,26 @@
 # 预计算风场可视化所需的所有中间数据（风廓线 / 轴向尾流 /
 # 各高度切片 PNG + 像素坐标），并缓存到
 #   uploads/<caseId>/visualization_cache/
+# 增量：manifest.json 记录每个产物依赖的输入哈希，重跑时只重建
+# 输入变化或缺失的产物；--force 全部重建
 # ---------------------------------------------------------------
 
 import os, sys, json, math, time, argparse, traceback
 import numpy as np
-from scipy.interpolate import RegularGridInterpolator
 import matplotlib
 matplotlib.use("Agg")           # 服务器无显示环境
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 import matplotlib.ticker as mticker
 
+from speed_cube import load_speed_data   # 只读内存映射 (layers, Ny, Nx)
+from grid_sampler import GridSampler     # 均匀网格三线性采样 (float32)
+from turbine_samples import (PROFILES_FILE, WAKES_FILE, packed_list, sample_profiles,
+                             sample_wakes, turbine_xy, write_packed)
+from slice_render import SliceJob, render_slices   # 多进程切片渲染
+from slice_png import PIL_AVAILABLE, SlicePainter  # 色表查找 + Pillow 直接编码 PNG
+from cache_manifest import BuildManifest, digest   # 产物依赖清单（增量重建）
+
 # ------------------------------------------------------------------
 # 辅助：把 numpy 类型安全地序列化为 json
 # ------------------------------------------------------------------
@@ -39,30 +48,105 @@ def numpy_to_python(obj):
     return obj  # Python 原生类型
 
 # ------------------------------------------------------------------
-# 读取 speed.bin 并 reshape 成 (layers, Ny, Nx)
+# 切片渲染：每个进程只建一次 figure，逐层仅替换图像数据与标题
+#   renderer="matplotlib"  逐层 im.set_data + savefig（默认，PNG 与串行逐层绘制逐字节一致）
+#   renderer="pillow"      figure 只用来画一次静态边框/色标，逐层由 SlicePainter
+#                          查色表、Pillow 写标题并直接编码 PNG（每层约 10-20 ms）；
+#                          图像按最近邻取样，像素与 matplotlib 的重采样结果不同，需显式选用
 # ------------------------------------------------------------------
-def load_speed_data(binfile, meta):
-    size = meta.get("size")
-    if not size or len(size) != 3:
-        raise ValueError("'size' must be [width,height,layers]")
-
-    post_width, post_height, num_layers = map(int, size)
-    expected = post_width * post_height * num_layers
+RENDERERS = ("matplotlib", "pillow")
+
+def slice_files(z):
+    """高度 z 的 PNG / slice_info 文件名，即 metadata heightLevelsInfo 的条目"""
+    h_str = f"{z:.1f}"
+    return {"height": float(z),
+            "imageFile": f"slice_height_{h_str}.png",
+            "infoFile": f"slice_info_{h_str}.json"}
+
+class SliceRenderer:
+    # png_layers: 需要重绘 PNG 的层号集合（None = 全部），其余层只写 slice_info
+    def __init__(self, *, figsize, dpi, extent_m, cmap, vmin, vmax, turbines,
+                 slices_img_dir, slices_info_dir, renderer="matplotlib", png_layers=None):
+        self.figsize, self.dpi = figsize, dpi
+        self.extent_m = extent_m
+        self.cmap = cmap
+        self.vmin, self.vmax = vmin, vmax
+        self.turbines = turbines
+        self.slices_img_dir = slices_img_dir
+        self.slices_info_dir = slices_info_dir
+        self.renderer = renderer if PIL_AVAILABLE else "matplotlib"
+        self.png_layers = png_layers
+        self.painter = None
+        self.fig = None
+
+    def _build(self, slice_np, title):
+        norm = mcolors.Normalize(vmin=self.vmin, vmax=self.vmax)
+        fig, ax = plt.subplots(figsize=self.figsize, dpi=self.dpi)
+        fig.subplots_adjust(left=0.12, right=0.88, bottom=0.12, top=0.90)
+
+        self.im = ax.imshow(slice_np, cmap=self.cmap, norm=norm, origin="lower",
+                            extent=self.extent_m, aspect="auto")
+        ax.set_xlabel("X (m)")
+        ax.set_ylabel("Y (m)")
+        ax.set_title(title)
+        cbar = plt.colorbar(self.im, ax=ax, pad=0.02, shrink=0.85, extend="max")
+        cbar.set_label("Wind speed (m/s)")
+        cbar.set_ticks(np.linspace(self.vmin, self.vmax, 6))
+        cbar.ax.yaxis.set_major_formatter(mticker.FormatStrFormatter("%.1f"))
+        cbar.ax.tick_params(labelsize=8)
+
+        # 计算风机像素位置（布局固定，各层相同）
+        fig.canvas.draw()
+        self.fw, self.fh = fig.get_size_inches()*self.dpi
+        self.turbines_px = []
+        if self.renderer == "pillow":
+            # 由 extent 与坐标轴像素框直接换算
+            self.painter = SlicePainter(fig, ax, self.im)
+            pxs, pys = self.painter.pixel_coords([t["x"] for t in self.turbines],
+                                                 [t["y"] for t in self.turbines])
+        else:
+            disp = ax.transData.transform(np.array([(t["x"], t["y"]) for t in self.turbines], dtype=float).reshape(-1, 2))
+            pxs, pys = disp[:, 0], self.fh - disp[:, 1]
+        for t, px, py in zip(self.turbines, pxs, pys):
+            self.turbines_px.append({"id": t["id"], "x": round(float(px),2), "y": round(float(py),2)})
+        self.fig, self.ax = fig, ax
+
+    def render(self, k, z, layer):
+        title = f"Wind speed @ {z:.1f} m"
+        if self.fig is None:
+            self._build(layer.astype(float), title)
+
+        # 保存单 slice json
+        entry = slice_files(z)
+        info_obj = {"actualHeight": float(z),
+                    "imageDimensions": {"width": int(self.fw), "height": int(self.fh), "dpi": self.dpi},
+                    "turbinesPixels": self.turbines_px}
+        with open(os.path.join(self.slices_info_dir, entry["infoFile"]),
+                  "w", encoding="utf-8") as f:
+            json.dump(info_obj, f, default=numpy_to_python, indent=2)
+
+        # 保存 PNG
+        png_path = os.path.join(self.slices_img_dir, entry["imageFile"])
+        if self.png_layers is not None and k not in self.png_layers:
+            pass  # PNG 仍是最新的
+        elif self.painter is not None:
+            self.painter.save(png_path, layer, title, dpi=self.dpi)
+        else:
+            self.im.set_data(layer.astype(float))
+            self.ax.set_title(title)
+            self.fig.savefig(png_path, dpi=self.dpi)
 
-    data = np.fromfile(binfile, dtype=np.float32)
-    if data.size != expected:
-        raise ValueError(
-            f"binary size mismatch: expect {expected}, got {data.size}"
-        )
+        return entry
 
-    data = data.reshape((num_layers, post_height, post_width)).astype(np.float32)
-    data[np.isinf(data)] = np.nan
-    return data, post_width, post_height, num_layers
+    def close(self):
+        if self.fig is not None:
+            plt.close(self.fig)
+            self.fig = None
 
 # ------------------------------------------------------------------
 # 主函数
 # ------------------------------------------------------------------
-def precompute_all_data(case_id: str) -> bool:
+def precompute_all_data(case_id: str, workers=None, renderer="matplotlib", force=False) -> bool:
     t0 = time.time()
     print(f"Starting precomputation for case: {case_id}")
 
@@ -71,14 +155,13 @@ def precompute_all_data(case_id: str) -> bool:
     meta_path        = os.path.join(base_dir, "output.json")
     info_path        = os.path.join(base_dir, "info.json")
     cache_dir        = os.path.join(base_dir, "visualization_cache")
-    profiles_dir     = os.path.join(cache_dir, "profiles")
-    wakes_dir        = os.path.join(cache_dir, "wakes")
     slices_img_dir   = os.path.join(cache_dir, "slices_img")
     slices_info_dir  = os.path.join(cache_dir, "slices_info")
 
-    for p in (profiles_dir, wakes_dir, slices_img_dir, slices_info_dir):
+    for p in (slices_img_dir, slices_info_dir):
         os.makedirs(p, exist_ok=True)
     print("Cache directories ready:", cache_dir)
+    manifest = BuildManifest(cache_dir, force=force)
 
     try:
         # --------- 1. 读取 metadata & info -------------------------
@@ -111,6 +194,7 @@ def precompute_all_data(case_id: str) -> bool:
         # --------- 2. 读 speed.bin 并构造坐标 -----------------------
         data, Nx, Ny, Nz = load_speed_data(binfile, meta)
         print(f"Speed data loaded. Shape: ({Nz},{Ny},{Nx})")
+        layer_keys = manifest.layer_digests(binfile, data)   # 每层内容哈希，speed.bin 未变时直接复用
 
         # 网格范围 (米)
         # --- FIX 1 START: Use `lt` directly. ---
@@ -130,13 +214,7 @@ def precompute_all_data(case_id: str) -> bool:
         H_levels = np.arange(1, Nz+1) * dh
 
         # --------- 3. 构造插值器 -----------------------------------
-        f_interp = RegularGridInterpolator(
-            (H_levels, y_coords, x_coords),
-            data,
-            method="linear",
-            bounds_error=False,
-            fill_value=np.nan
-        )
+        f_interp = GridSampler(data, x_coords, y_coords, H_levels, fill_value=np.nan)
         print("Interpolator ready. extent (m):", extent_m)
 
         # --------- 4. 处理风机坐标 ---------------------------------
@@ -175,67 +253,52 @@ def precompute_all_data(case_id: str) -> bool:
         if frontend_turbines:
             print("First turbine xy (m):", frontend_turbines[0]["x"], frontend_turbines[0]["y"])
 
-        # --------- 5. 风廓线 ---------------------------------------
-        print(f"Computing wind profiles for {len(frontend_turbines)} turbines …")
+        # 各产物依赖的输入
+        grid_key = {"shape": [Nz, Ny, Nx], "domain_m": domain_size_m, "dh": dh}
+        turbine_pos = [[t["id"], t["x"], t["y"]] for t in frontend_turbines]
+        turbine_geom = [[t["id"], t["x"], t["y"], t["hubHeight"], t["rotorDiameter"]] for t in frontend_turbines]
+        profiles_key = digest("profiles", layer_keys, grid_key, turbine_pos)
+        wakes_key = digest("wakes", layer_keys, grid_key, turbine_geom, float(wind_angle))
+
+        # --------- 5. 风廓线（全部风机一次插值，合并为 profiles.json）---
         h_eval = np.linspace(H_levels[0], H_levels[-1], 50)
-        for t in frontend_turbines:
-            # With the corrected interpolator and turbine coordinates, this calculation is now correct.
-            pts = np.column_stack((h_eval,
-                                   np.full_like(h_eval, t["y"]),
-                                   np.full_like(h_eval, t["x"])))
-            speeds = f_interp(pts)
-            out = {"id": t["id"], "heights": h_eval.tolist(), "speeds": speeds.tolist()}
-            with open(os.path.join(profiles_dir, f"turbine_{t['id']}.json"),
-                      "w", encoding="utf-8") as f:
-                json.dump(out, f, default=numpy_to_python, indent=2)
-        print("Profiles done.")
-
-        # --------- 6. 尾流 -----------------------------------------
-        print("Computing wakes …")
-        xmin, xmax = extent_m[0], extent_m[1]
-        ymin, ymax = extent_m[2], extent_m[3]
-
-        for t in frontend_turbines:
-            R = t["rotorDiameter"]
-            s_vals = np.linspace(-2*R, 10*R, 100)           # upstream & downstream (m)
-            
-            # This calculation now correctly adds meters (s_vals) to meters (t["x"], t["y"]).
-            xp = t["x"] + s_vals * wind_vec[0]
-            yp = t["y"] + s_vals * wind_vec[1]
-
-            # ---- ① 仅保留在网格内的点 ----
-            inside = (xp >= xmin) & (xp <= xmax) & (yp >= ymin) & (yp <= ymax)
-            if not inside.any():
-                print(f"  - turbine {t['id']} wake completely outside domain, skipped.")
-                continue
-
-            xp_in = xp[inside]
-            yp_in = yp[inside]
-            s_in  = s_vals[inside]
-
-            hub_z = np.clip(t["hubHeight"], H_levels[0], H_levels[-1])
-            pts   = np.column_stack((np.full_like(s_in, hub_z), yp_in, xp_in))
-            speeds_in = f_interp(pts)
-
-            # ---- ② 把“域外”点填 null，保证前端长度一致 ----
-            speeds_full = [None]*len(s_vals)
-            j = 0
-            for i, ok in enumerate(inside):
-                if ok:
-                    val = float(speeds_in[j])
-                    speeds_full[i] = None if (np.isnan(val) or np.isinf(val)) else val
-                    j += 1
-
-            out = {
-                "id": t["id"],
-                "hubHeightUsed": float(hub_z),
-                "distances": s_vals.tolist(),
-                "speeds": speeds_full
-            }
-            with open(os.path.join(wakes_dir, f"turbine_{t['id']}.json"),
-                      "w", encoding="utf-8") as f:
-                json.dump(out, f, default=numpy_to_python, indent=2)
-        print("Wakes done.")
+        turbine_ids = [t["id"] for t in frontend_turbines]
+        tx, ty = turbine_xy(frontend_turbines)
+        if manifest.stale(PROFILES_FILE, profiles_key):
+            print(f"Computing wind profiles for {len(frontend_turbines)} turbines …")
+            profile_speeds = sample_profiles(f_interp, tx, ty, h_eval)
+            write_packed(os.path.join(cache_dir, PROFILES_FILE), {
+                "ids": turbine_ids,
+                "heights": h_eval.tolist(),
+                "speeds": packed_list(profile_speeds),
+            })
+            manifest.record(PROFILES_FILE, profiles_key)
+            print("Profiles done.")
+        else:
+            print("Profiles up to date.")
+
+        # --------- 6. 尾流（全部风机一次插值，合并为 wakes.json）-----
+        R = np.array([t["rotorDiameter"] for t in frontend_turbines])
+        s_vals = np.linspace(-2*R, 10*R, 100, axis=1)   # upstream & downstream (m)，每台风机一行
+        hub_z = np.clip([t["hubHeight"] for t in frontend_turbines], H_levels[0], H_levels[-1])
+
+        # 仅插值网格内的点，域外点记为 null，保证前端长度一致
+        if manifest.stale(WAKES_FILE, wakes_key):
+            print("Computing wakes …")
+            wake_speeds, inside = sample_wakes(f_interp, tx, ty, hub_z, s_vals, wind_vec, extent=extent_m)
+            keep = inside.any(axis=1)
+            for i in np.flatnonzero(~keep):
+                print(f"  - turbine {turbine_ids[i]} wake completely outside domain, skipped.")
+            write_packed(os.path.join(cache_dir, WAKES_FILE), {
+                "ids": [turbine_ids[i] for i in np.flatnonzero(keep)],
+                "hubHeightUsed": hub_z[keep].tolist(),
+                "distances": s_vals[keep].tolist(),
+                "speeds": packed_list(wake_speeds[keep]),
+            })
+            manifest.record(WAKES_FILE, wakes_key)
+            print("Wakes done.")
+        else:
+            print("Wakes up to date.")
 
         # --------- 7. 高度切片 PNG + 像素坐标 -----------------------
         # Color range: prefer output.json's range, but auto-expand using data percentiles
@@ -253,7 +316,6 @@ def precompute_all_data(case_id: str) -> bool:
         except ValueError:
             print(f"Warning: unknown colormap '{cmap_name}', fallback to 'viridis'.", file=sys.stderr)
             cmap = plt.get_cmap("viridis")
-        norm = mcolors.Normalize(vmin=vmin, vmax=vmax)
 
         img_w, dpi = 800, 100
         domain_w = extent_m[1]-extent_m[0]
@@ -262,53 +324,34 @@ def precompute_all_data(case_id: str) -> bool:
         img_h = max(1, int(img_w * aspect))
         figsize = (img_w/dpi, img_h/dpi)
 
-        heights_info = []
-
-        print("Generating slice images …")
-        for k, z in enumerate(H_levels):
-            slice_np = data[k].astype(float)
-
-            fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
-            fig.subplots_adjust(left=0.12, right=0.88, bottom=0.12, top=0.90)
-
-            im = ax.imshow(slice_np, cmap=cmap, norm=norm, origin="lower",
-                           extent=extent_m, aspect="auto")
-            ax.set_xlabel("X (m)")
-            ax.set_ylabel("Y (m)")
-            ax.set_title(f"Wind speed @ {z:.1f} m")
-            cbar = plt.colorbar(im, ax=ax, pad=0.02, shrink=0.85, extend="max")
-            cbar.set_label("Wind speed (m/s)")
-            cbar.set_ticks(np.linspace(vmin, vmax, 6))
-            cbar.ax.yaxis.set_major_formatter(mticker.FormatStrFormatter("%.1f"))
-            cbar.ax.tick_params(labelsize=8)
-
-            # 计算风机像素位置
-            fig.canvas.draw()
-            fw, fh = fig.get_size_inches()*dpi
-            turbines_px = []
-            for t in frontend_turbines:
-                disp = ax.transData.transform((t["x"], t["y"]))
-                px, py = disp[0], fh - disp[1]
-                turbines_px.append({"id": t["id"], "x": round(float(px),2), "y": round(float(py),2)})
-
-            # 保存单 slice json
-            h_str = f"{z:.1f}"
-            info_obj = {"actualHeight": float(z),
-                        "imageDimensions": {"width": int(fw), "height": int(fh), "dpi": dpi},
-                        "turbinesPixels": turbines_px}
-            with open(os.path.join(slices_info_dir, f"slice_info_{h_str}.json"),
-                      "w", encoding="utf-8") as f:
-                json.dump(info_obj, f, default=numpy_to_python, indent=2)
-
-            # 保存 PNG
-            png_name = f"slice_height_{h_str}.png"
-            fig.savefig(os.path.join(slices_img_dir, png_name), dpi=dpi)
-            plt.close(fig)
-
-            heights_info.append({"height": float(z),
-                                 "imageFile": png_name,
-                                 "infoFile": f"slice_info_{h_str}.json"})
-
+        # PNG 依赖该层数据与配色/尺寸；slice_info 只依赖图幅与风机位置
+        png_style = [cmap.name, vmin, vmax, list(figsize), dpi, extent_m, renderer]
+        info_style = [list(figsize), dpi, extent_m, turbine_pos]
+        heights_info = [slice_files(z) for z in H_levels]
+        png_keys, info_keys, png_layers, info_layers = [], [], set(), set()
+        for k, (z, entry) in enumerate(zip(H_levels, heights_info)):
+            png_keys.append(digest("png", layer_keys[k], float(z), png_style))
+            info_keys.append(digest("info", float(z), info_style))
+            if manifest.stale(f"slices_img/{entry['imageFile']}", png_keys[k]):
+                png_layers.add(k)
+            if manifest.stale(f"slices_info/{entry['infoFile']}", info_keys[k]):
+                info_layers.add(k)
+
+        todo = png_layers | info_layers
+        print(f"Generating slice images: {len(png_layers)} PNG / {len(info_layers)} info of {Nz} layers stale …")
+        job = SliceJob(binfile, meta, SliceRenderer, dict(
+            figsize=figsize, dpi=dpi, extent_m=extent_m, cmap=cmap, vmin=vmin, vmax=vmax,
+            turbines=frontend_turbines, slices_img_dir=slices_img_dir, slices_info_dir=slices_info_dir,
+            renderer=renderer, png_layers=frozenset(png_layers)))
+        render_slices(job, H_levels, workers, layers=todo)
+        for k in sorted(todo):
+            entry = heights_info[k]
+            manifest.record(f"slices_info/{entry['infoFile']}", info_keys[k])
+            if k in png_layers:
+                manifest.record(f"slices_img/{entry['imageFile']}", png_keys[k])
+
+        for name in manifest.prune():
+            print(f"  - removed stale {name}")
         print("Slices done.")
 
         # --------- 8. 汇总 metadata ---------------------------------
@@ -334,6 +377,8 @@ def precompute_all_data(case_id: str) -> bool:
         print("Error:", e, file=sys.stderr)
         traceback.print_exc()
         return False
+    finally:
+        manifest.save()   # 保留已完成部分，下次只补未完成的产物
 
 # ------------------------------------------------------------------
 # CLI
@@ -341,7 +386,14 @@ def precompute_all_data(case_id: str) -> bool:
 if __name__ == "__main__":
     p = argparse.ArgumentParser(description="Precompute visualization data.")
     p.add_argument("--caseId", required=True, help="case id under uploads/")
+    p.add_argument("--workers", type=int, default=None,
+                   help="slice rendering processes (default: $PRECOMPUTE_WORKERS, else all CPUs; 1 = serial)")
+    p.add_argument("--renderer", choices=RENDERERS, default=os.getenv("PRECOMPUTE_RENDERER", "matplotlib"),
+                   help="slice PNG renderer (default: $PRECOMPUTE_RENDERER, else matplotlib; "
+                        "pillow is faster but its nearest-neighbour pixels differ)")
+    p.add_argument("--force", action="store_true",
+                   help="rebuild every artifact, ignoring visualization_cache/manifest.json")
     args = p.parse_args()
 
-    ok = precompute_all_data(args.caseId)
+    ok = precompute_all_data(args.caseId, args.workers, args.renderer, args.force)
     sys.exit(0 if ok else 1)
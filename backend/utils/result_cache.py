@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk cache for per-request results (process_speed_data).
+
+Entries live in <root>/<case_id>/<sha256>.<ext>. The key hashes everything the
+result depends on: speed.bin (mtime_ns, size), the bytes of output.json and
+info.json, and the request parameters (height, turbine, output format). A
+regenerated speed.bin or an edited info.json therefore simply stops matching
+old entries, which age out through LRU eviction.
+
+Recency is the file mtime (bumped on every hit, so it works on noatime
+mounts). After each write the whole cache is trimmed to the disk budget,
+oldest entries first. Writes go through a temp file + os.replace, so a
+reader never sees a partial entry. Hit/miss/eviction counters are kept in
+<root>/stats.json.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from speed_cube import atomic_write, atomic_write_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: counters are best-effort
+    fcntl = None
+
+CACHE_VERSION = 1
+STATS_FILE = "stats.json"
+DEFAULT_BUDGET_MB = float(os.environ.get("RESULT_CACHE_MB", "512"))
+
+
+def _file_digest(path: str) -> str | None:
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def case_fingerprint(case_dir: str, binfile: str = "speed.bin") -> dict:
+    """Everything in the case directory that a cached result depends on."""
+    bin_path = binfile if os.path.isabs(binfile) else os.path.join(case_dir, binfile)
+    st = os.stat(bin_path) if os.path.exists(bin_path) else None
+    return {
+        "speed.bin": [st.st_mtime_ns, st.st_size] if st else None,
+        "output.json": _file_digest(os.path.join(case_dir, "output.json")),
+        "info.json": _file_digest(os.path.join(case_dir, "info.json")),
+    }
+
+
+def cache_key(fingerprint: dict, **params) -> str:
+    payload = json.dumps({"v": CACHE_VERSION, "case": fingerprint, "params": params},
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, root: str, budget_mb: float = DEFAULT_BUDGET_MB):
+        self.root = root
+        self.budget = int(budget_mb * 2**20)
+
+    def path(self, case_id: str, key: str, ext: str) -> str:
+        return os.path.join(self.root, case_id, f"{key}.{ext}")
+
+    def get(self, case_id: str, key: str, ext: str) -> bytes | None:
+        path = self.path(case_id, key, ext)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            self._count(misses=1)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count(hits=1)
+        return data
+
+    def put(self, case_id: str, key: str, ext: str, data: bytes) -> str:
+        path = self.path(case_id, key, ext)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        atomic_write(path, lambda f: f.write(data))
+        self._count(writes=1, evictions=self.evict())
+        return path
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        """(mtime, size, path) of every cached entry, oldest first."""
+        out = []
+        if not os.path.isdir(self.root):
+            return out
+        for case_id in os.listdir(self.root):
+            case_dir = os.path.join(self.root, case_id)
+            if not os.path.isdir(case_dir):
+                continue
+            for name in os.listdir(case_dir):
+                if name.startswith("."):
+                    continue
+                path = os.path.join(case_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                out.append((st.st_mtime, st.st_size, path))
+        out.sort()
+        return out
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits the budget."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.budget:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    @contextmanager
+    def _locked_stats(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".stats.lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield os.path.join(self.root, STATS_FILE)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _count(self, **deltas) -> None:
+        try:
+            with self._locked_stats() as path:
+                stats = self.stats()
+                for name, delta in deltas.items():
+                    stats[name] = stats.get(name, 0) + delta
+                stats["updated"] = time.time()
+                atomic_write_json(path, stats)
+        except OSError:
+            pass  # counters must never fail a request
+
+    def stats(self) -> dict:
+        try:
+            with open(os.path.join(self.root, STATS_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Parallel rendering of the per-height slice PNGs written by precompute_visualization.
+
+Drawing a layer from scratch (subplots, imshow, colorbar, canvas.draw, savefig)
+costs far more than the pixels themselves, so each worker process builds ONE
+figure through the caller's renderer factory and then only swaps the image
+data and title per layer. Layers are spread over a process pool; results come
+back in layer order, so metadata built from them is identical to a serial run.
+
+A renderer factory is a picklable callable (a module-level class or function)
+taking the keyword arguments in SliceJob.params and returning an object with
+
+    render(k: int, height: float, layer: np.ndarray) -> dict
+
+which writes the PNG / slice_info files for layer k and returns the entry for
+metadata "heightLevelsInfo", and close() to release the figure. `layers`
+restricts rendering to a subset of layer indices (incremental rebuilds).
+
+Worker count and pool handling come from worker_pool (the `workers` argument,
+else env PRECOMPUTE_WORKERS, else every CPU; 1 renders in-process, and so does
+a pool that cannot be started).
+"""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+
+from speed_cube import load_speed_data
+from worker_pool import resolve_workers, run_pool
+
+
+@dataclass(frozen=True)
+class SliceJob:
+    """Everything a worker needs to render layers: the cube on disk and the renderer."""
+    binfile: str
+    meta: dict
+    factory: Callable
+    params: dict = field(default_factory=dict)
+
+
+# Per-process state: the memory-mapped cube and this worker's reusable renderer.
+_worker_data = None
+_worker_renderer = None
+
+
+def _init_worker(job: SliceJob) -> None:
+    global _worker_data, _worker_renderer
+    _worker_data = load_speed_data(job.binfile, job.meta)[0]
+    _worker_renderer = job.factory(**job.params)
+
+
+def _render_task(k: int, height: float) -> dict:
+    return _worker_renderer.render(k, height, np.asarray(_worker_data[k]))
+
+
+def _release_worker() -> None:
+    """Close the renderer that a serial run built in this process."""
+    global _worker_data, _worker_renderer
+    if _worker_renderer is not None:
+        _worker_renderer.close()
+    _worker_data = _worker_renderer = None
+
+
+def render_slices(job: SliceJob, heights, workers: int | None = None, layers=None) -> list[dict]:
+    """Render every layer (or only the indices in `layers`); returns the entries in layer order."""
+    heights = [float(z) for z in heights]
+    layers = range(len(heights)) if layers is None else sorted(set(layers))
+    if not layers:
+        return []
+    workers = resolve_workers(workers, len(layers))
+    if workers > 1:
+        print(f"Rendering {len(layers)} slices with {workers} worker processes …")
+        sys.stdout.flush()
+    try:
+        return run_pool(_render_task, [(k, heights[k]) for k in layers], workers,
+                        initializer=_init_worker, initargs=(job,), label="slices")
+    finally:
+        _release_worker()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Shared reader/writer for the per-case wind speed cube produced by post.py.
+
+Two on-disk layouts are supported (both optional, advertised in output.json):
+
+  raw    speed.bin — float32, C order, shape (Nz, Ny, Nx)
+  tiles  speed_tiles/index.json + speed_tiles/L<f>/<k>.npz
+         one compressed npz per (pyramid level f, layer k); each member
+         "y<ty>_x<tx>" is a TILE_SIZE x TILE_SIZE float32 tile (edge tiles are
+         smaller). Level f holds the layer downsampled f x f with a NaN-aware
+         block mean, so f = 1 is full resolution.
+
+np.load on an npz only decompresses the members that are accessed, so a
+reader can fetch a single tile of a single layer at a coarse level without
+touching the rest of the cube.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+RAW_FILE = "speed.bin"
+TILE_DIR = "speed_tiles"
+TILE_INDEX = "index.json"
+TILE_FORMAT = "npz-tiles"
+TILE_SIZE = 256
+PYRAMID_FACTORS = (1, 2, 4, 8)
+CACHE_SIZE = 16
+
+# Process umask (read once; os.umask can only be read by setting it).
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+def downsample_layer(layer: np.ndarray, factor: int) -> np.ndarray:
+    """NaN-aware f x f block mean; partial edge blocks average what they cover."""
+    layer = np.asarray(layer, dtype=np.float32)
+    if factor == 1:
+        return layer
+    ny, nx = layer.shape
+    py, px = -ny % factor, -nx % factor
+    padded = np.pad(layer, ((0, py), (0, px)), constant_values=np.nan)
+    blocks = padded.reshape(padded.shape[0] // factor, factor, padded.shape[1] // factor, factor)
+    finite = np.isfinite(blocks)
+    total = np.where(finite, blocks, 0.0).sum(axis=(1, 3), dtype=np.float64)
+    count = finite.sum(axis=(1, 3))
+    out = np.full(total.shape, np.nan, dtype=np.float32)
+    np.divide(total, count, out=out, where=count > 0, casting="unsafe")
+    return out
+
+
+def atomic_write(path: str, write, mode: str = "wb") -> None:
+    """
+    Write `path` through a unique temp file in the same directory and os.replace
+    it into place: readers never see a partial file and concurrent writers never
+    share a temp file. `write(f)` receives the open temp file (utf-8 in text mode).
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=os.path.splitext(path)[1])
+    try:
+        os.chmod(tmp, 0o666 & ~_UMASK)  # mkstemp creates 0600; give the file the usual permissions
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def atomic_write_json(path: str, obj, **dump_kwargs) -> None:
+    """json.dump `obj` to `path` through atomic_write."""
+    atomic_write(path, lambda f: json.dump(obj, f, **dump_kwargs), mode="w")
+
+
+def tile_grid(shape: tuple[int, int], tile: int = TILE_SIZE) -> tuple[int, int]:
+    """Number of (rows, cols) of tiles covering a (ny, nx) layer."""
+    return -(-shape[0] // tile), -(-shape[1] // tile)
+
+
+def write_tile_layer(
+    tile_dir: str,
+    k: int,
+    layer: np.ndarray,
+    *,
+    tile: int = TILE_SIZE,
+    factors: Iterable[int] = PYRAMID_FACTORS,
+) -> None:
+    """Write every pyramid level of layer k. Safe to call concurrently for different k."""
+    for factor in factors:
+        level = downsample_layer(layer, factor)
+        rows, cols = tile_grid(level.shape, tile)
+        members = {
+            f"y{ty}_x{tx}": np.ascontiguousarray(level[ty * tile:(ty + 1) * tile, tx * tile:(tx + 1) * tile])
+            for ty in range(rows)
+            for tx in range(cols)
+        }
+        level_dir = os.path.join(tile_dir, f"L{factor}")
+        os.makedirs(level_dir, exist_ok=True)
+        atomic_write(os.path.join(level_dir, f"{k}.npz"), lambda f: np.savez_compressed(f, **members))
+
+
+def write_tile_index(
+    tile_dir: str,
+    shape: tuple[int, int, int],
+    heights: list[float],
+    *,
+    tile: int = TILE_SIZE,
+    factors: Iterable[int] = PYRAMID_FACTORS,
+) -> str:
+    """Write index.json last, once every layer file exists."""
+    nz, ny, nx = map(int, shape)
+    levels = []
+    for factor in factors:
+        level_shape = (-(-ny // factor), -(-nx // factor))
+        levels.append({
+            "factor": int(factor),
+            "shape": [nz, *level_shape],
+            "tiles": list(tile_grid(level_shape, tile)),
+            "path": f"L{factor}/{{k}}.npz",
+        })
+    index = {
+        "format": TILE_FORMAT,
+        "version": 1,
+        "dtype": "float32",
+        "shape": [nz, ny, nx],
+        "tile": int(tile),
+        "member": "y{ty}_x{tx}",
+        "heights": [float(h) for h in heights],
+        "levels": levels,
+    }
+    path = os.path.join(tile_dir, TILE_INDEX)
+    atomic_write_json(path, index, indent=2)
+    return path
+
+
+def format_entry(tile_dir_name: str = TILE_DIR, *, raw: bool = True, tiles: bool = True) -> dict:
+    """The "formats" block post.py puts into output.json."""
+    formats: dict = {}
+    if raw:
+        formats["raw"] = {"file": RAW_FILE, "dtype": "float32", "order": "z,y,x"}
+    if tiles:
+        formats["tiles"] = {
+            "format": TILE_FORMAT,
+            "index": f"{tile_dir_name}/{TILE_INDEX}",
+            "tile": TILE_SIZE,
+            "levels": list(PYRAMID_FACTORS),
+        }
+    return formats
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def read_output_meta(case_dir: str) -> dict:
+    with open(os.path.join(case_dir, "output.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cube_shape(meta: dict) -> tuple[int, int, int]:
+    """(Nz, Ny, Nx) from output.json's size = [width, height, num_layers]."""
+    size = meta.get("size")
+    if not size or len(size) != 3:
+        raise ValueError("output.json 'size' must be an array of [width, height, num_layers]")
+    try:
+        nx, ny, nz = map(int, size)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid dimensions in output.json: {size}. {e}") from e
+    if not all(d > 0 for d in (nx, ny, nz)):
+        raise ValueError(f"Invalid dimensions in output.json: {size}. Dimensions must be positive integers.")
+    return nz, ny, nx
+
+
+def file_key(path: str) -> tuple[str, int, int]:
+    """(realpath, mtime_ns, size): changes whenever post.py rewrites the file."""
+    st = os.stat(path)
+    return os.path.realpath(path), st.st_mtime_ns, st.st_size
+
+
+# Process-level caches; long-lived processes (query daemon, batch drivers) reuse
+# the same memmap and axes until speed.bin is rewritten.
+_cube_cache: "OrderedDict[tuple, np.memmap]" = OrderedDict()
+_axes_cache: "OrderedDict[tuple, CubeAxes]" = OrderedDict()
+
+
+def _cache_get(cache: OrderedDict, key, build):
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache[key] = value
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(key)
+    return value
+
+
+def load_speed_data(binfile: str, meta: dict) -> tuple[np.memmap, int, int, int]:
+    """
+    Open speed.bin as a read-only np.memmap shaped (Nz, Ny, Nx).
+
+    Returns (data, width, height, num_layers) like the per-script loaders it
+    replaces, but nothing is read or copied up front. post.py never writes
+    Inf, so the old Inf -> NaN pass (and its copies) is dropped; callers that
+    need finite values should mask with np.isfinite.
+    """
+    if not meta or not isinstance(meta, dict):
+        raise ValueError("Invalid metadata: metadata must be a dictionary")
+    nz, ny, nx = cube_shape(meta)
+    if not os.path.exists(binfile):
+        raise FileNotFoundError(f"Speed data file not found: {binfile}")
+    key = file_key(binfile) + ((nz, ny, nx),)
+    expected = nx * ny * nz
+
+    def build() -> np.memmap:
+        found = key[2] // 4
+        if key[2] != expected * 4:
+            raise ValueError(
+                f"Data size mismatch in '{os.path.relpath(binfile)}'. "
+                f"Expected {expected} values ({nx}x{ny}x{nz}), "
+                f"but found {found}. Check 'size' in output.json or the binary file itself."
+            )
+        return np.memmap(binfile, dtype=np.float32, mode="r", shape=(nz, ny, nx))
+
+    return _cache_get(_cube_cache, key, build), nx, ny, nz
+
+
+@dataclass(frozen=True)
+class CubeAxes:
+    """Cell-centre coordinates of the cube in the caller's length unit, heights in metres."""
+    x: np.ndarray
+    y: np.ndarray
+    heights: np.ndarray
+
+    @property
+    def extent(self) -> list[float]:
+        return [float(self.x[0]), float(self.x[-1]), float(self.y[0]), float(self.y[-1])]
+
+
+def speed_axes(binfile: str, meta: dict, domain_size: float) -> CubeAxes:
+    """
+    x/y axes spanning [-domain_size/2, domain_size/2] and layer heights
+    (output.json "heights", else (k + 1) * dh), cached by speed.bin's mtime/size.
+    """
+    nz, ny, nx = cube_shape(meta)
+    dh = float(meta.get("dh", 10))
+    heights = tuple(float(h) for h in meta.get("heights") or ()) if len(meta.get("heights") or ()) == nz else None
+    key = file_key(binfile) + ((nz, ny, nx), float(domain_size), dh, heights)
+
+    def build() -> CubeAxes:
+        half = float(domain_size) / 2
+        axes = CubeAxes(
+            x=np.linspace(-half, half, nx),
+            y=np.linspace(-half, half, ny),
+            heights=np.array(heights) if heights else np.arange(1, nz + 1) * dh,
+        )
+        for arr in (axes.x, axes.y, axes.heights):
+            arr.flags.writeable = False
+        return axes
+
+    return _cache_get(_axes_cache, key, build)
+
+
+class SpeedCube:
+    """
+    Read access to a case's speed cube in whichever layout is present.
+
+    The raw layout is preferred for full-resolution access (memory-mapped,
+    nothing is read up front); the tile layout serves coarse levels and is
+    the only source when speed.bin is absent. A tile index older than
+    speed.bin is ignored.
+    """
+
+    def __init__(self, case_dir: str, meta: dict | None = None):
+        self.case_dir = case_dir
+        self.meta = meta if meta is not None else read_output_meta(case_dir)
+        self.shape = cube_shape(self.meta)
+
+        formats = self.meta.get("formats") or {}
+        raw_name = (formats.get("raw") or {}).get("file") or self.meta.get("file", RAW_FILE)
+        self.raw_path = raw_name if os.path.isabs(raw_name) else os.path.join(case_dir, raw_name)
+        if not os.path.exists(self.raw_path):
+            self.raw_path = None
+
+        index_name = (formats.get("tiles") or {}).get("index", f"{TILE_DIR}/{TILE_INDEX}")
+        index_path = os.path.join(case_dir, index_name)
+        self.tile_index = None
+        self.tile_dir = None
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            # post.py writes index.json after speed.bin; an older index belongs to an earlier run
+            stale = self.raw_path is not None and \
+                os.stat(index_path).st_mtime_ns < os.stat(self.raw_path).st_mtime_ns
+            if index.get("format") == TILE_FORMAT and tuple(index.get("shape", ())) == self.shape and not stale:
+                self.tile_index = index
+                self.tile_dir = os.path.dirname(index_path)
+
+        if self.raw_path is None and self.tile_index is None:
+            raise FileNotFoundError(f"No speed data (speed.bin or {TILE_DIR}) found in {case_dir}")
+        self._raw = None
+
+    @property
+    def layout(self) -> str:
+        return "raw" if self.raw_path else "tiles"
+
+    @property
+    def levels(self) -> list[int]:
+        if self.tile_index:
+            return [lvl["factor"] for lvl in self.tile_index["levels"]]
+        return [1]
+
+    def raw(self) -> np.memmap:
+        """Memory-mapped (Nz, Ny, Nx) view of speed.bin."""
+        if self.raw_path is None:
+            raise FileNotFoundError("speed.bin is not available for this case")
+        if self._raw is None:
+            self._raw = load_speed_data(self.raw_path, self.meta)[0]
+        return self._raw
+
+    def _level(self, factor: int) -> dict:
+        for lvl in (self.tile_index or {}).get("levels", []):
+            if lvl["factor"] == factor:
+                return lvl
+        raise ValueError(f"Pyramid level {factor} not available (levels: {self.levels})")
+
+    def _npz(self, factor: int, k: int):
+        if not 0 <= k < self.shape[0]:
+            raise IndexError(f"Layer {k} out of range [0, {self.shape[0]})")
+        path = os.path.join(self.tile_dir, self._level(factor)["path"].format(k=k))
+        return np.load(path)
+
+    def tile(self, k: int, ty: int, tx: int, level: int = 1) -> np.ndarray:
+        """One tile of layer k at pyramid level `level`."""
+        if self.tile_index is None:
+            tile = TILE_SIZE
+            layer = self.layer(k, level)
+            return np.array(layer[ty * tile:(ty + 1) * tile, tx * tile:(tx + 1) * tile])
+        with self._npz(level, k) as npz:
+            return npz[f"y{ty}_x{tx}"]
+
+    def layer(self, k: int, level: int = 1) -> np.ndarray:
+        """Layer k as (ny, nx) float32 at pyramid level `level` (1 = full resolution)."""
+        if level == 1 and self.raw_path:
+            return self.raw()[k]
+        if self.tile_index is None:
+            return downsample_layer(self.raw()[k], level)
+        lvl = self._level(level)
+        rows, cols = lvl["tiles"]
+        tile = self.tile_index["tile"]
+        out = np.empty(lvl["shape"][1:], dtype=np.float32)
+        with self._npz(level, k) as npz:
+            for ty in range(rows):
+                for tx in range(cols):
+                    out[ty * tile:(ty + 1) * tile, tx * tile:(tx + 1) * tile] = npz[f"y{ty}_x{tx}"]
+        return out
+
+    def array(self, level: int = 1) -> np.ndarray:
+        """Whole cube at `level`; a read-only memmap for the raw layout at level 1."""
+        if level == 1 and self.raw_path:
+            return self.raw()
+        return np.stack([self.layer(k, level) for k in range(self.shape[0])])
+
+
+def open_cube(case_dir: str, meta: dict | None = None) -> SpeedCube:
+    return SpeedCube(case_dir, meta)
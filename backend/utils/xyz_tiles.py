@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+XYZ (slippy-map) tile pyramid of the speed.bin height layers, for web maps.
+
+Layout under the tile directory (visualization_cache/tiles):
+
+  tiles.json                   index: zoom range, tile size, layer heights, URL templates
+  png/<k>/<z>/<x>/<y>.png      colormapped RGBA tiles, NaN transparent
+  f16/<k>/<z>/<x>/<y>.bin      raw little-endian float16, TILE_SIZE x TILE_SIZE,
+                               row-major, NaN where there is no data
+  manifest.json                cache_manifest state for incremental rebuilds
+
+Pixel space: at maxzoom one pixel is one grid cell, maxzoom being the smallest
+z with TILE_SIZE * 2**z >= max(Ny, Nx). At zoom z a pixel covers
+f = 2**(maxzoom - z) cells and holds their NaN-aware block mean
+(speed_cube.downsample_layer). Levels whose factor the case's npz pyramid
+holds (post.py's speed_tiles: 2x, 4x, 8x) are read from it through
+speed_cube.open_cube instead of downsampling the full layer. Layers are
+north-up (tile row 0 holds the largest y) with the data anchored at the
+top-left corner, so a map in pixel coordinates (e.g. Leaflet CRS.Simple) shows
+it as is. Edge tiles are padded with NaN / transparent; tiles that would be
+entirely NaN are not written and a missing tile means "no data".
+
+A work unit is one (layer k, zoom z): it downsamples the layer once and writes
+every tile of each requested format. Units are independent and run in a
+process pool (worker_pool; each worker opens the cube once). Each
+(format, k, z) tile set is an artifact of the tile directory's BuildManifest,
+keyed on the layer's content hash, the zoom geometry and (for PNG) the
+colormap and range, so a re-run only redoes the tile sets whose inputs changed.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+from speed_cube import atomic_write_json, downsample_layer, open_cube, tile_grid
+from slice_png import colormap_rgba_lut, encode_png, lut_index
+from worker_pool import resolve_workers, run_pool
+
+TILE_SIZE = 256
+TILES_INDEX = "tiles.json"
+TILE_FORMATS = {"png": ".png", "f16": ".bin"}
+
+
+def max_zoom(shape: tuple[int, int], tile: int = TILE_SIZE) -> int:
+    """Smallest zoom at which the (ny, nx) layer fits at one pixel per cell."""
+    size = max(int(shape[0]), int(shape[1]))
+    z = 0
+    while tile << z < size:
+        z += 1
+    return z
+
+
+def zoom_layer(cube, k: int, z: int, zmax: int) -> np.ndarray:
+    """Layer k of a speed_cube.SpeedCube at zoom z, north-up, float32."""
+    factor = 1 << (zmax - z)
+    if factor in cube.levels:
+        return np.asarray(cube.layer(k, factor), dtype=np.float32)[::-1]
+    return downsample_layer(cube.layer(k), factor)[::-1]
+
+
+def iter_tiles(level: np.ndarray, tile: int = TILE_SIZE):
+    """(x, y, block) for every tile holding data; blocks are tile x tile, NaN-padded."""
+    rows, cols = tile_grid(level.shape, tile)
+    for ty in range(rows):
+        for tx in range(cols):
+            part = level[ty * tile:(ty + 1) * tile, tx * tile:(tx + 1) * tile]
+            if not np.isfinite(part).any():
+                continue
+            if part.shape != (tile, tile):
+                block = np.full((tile, tile), np.nan, dtype=np.float32)
+                block[:part.shape[0], :part.shape[1]] = part
+                part = block
+            yield tx, ty, part
+
+
+def unit_dir(tile_dir: str, fmt: str, k: int, z: int) -> str:
+    return os.path.join(tile_dir, fmt, str(k), str(z))
+
+
+@dataclass(frozen=True)
+class TileJob:
+    """Everything a worker needs: the case directory, the pyramid geometry and the PNG style."""
+    case_dir: str
+    meta: dict
+    tile_dir: str
+    zmax: int
+    cmap: object
+    vmin: float
+    vmax: float
+
+
+class TileWriter:
+    def __init__(self, job: TileJob):
+        self.job = job
+        self.cube = open_cube(job.case_dir, job.meta)
+        self.lut = colormap_rgba_lut(job.cmap)
+
+    def encode(self, fmt: str, block: np.ndarray) -> bytes:
+        if fmt == "f16":
+            return block.astype("<f2").tobytes()
+        idx = lut_index(block, self.job.vmin, self.job.vmax, self.job.cmap.N)
+        return encode_png(np.take(self.lut, idx, axis=0))
+
+    def write(self, k: int, z: int, formats) -> int:
+        """Write tile sets (k, z) of the given formats from scratch; returns the number of tile files."""
+        level = zoom_layer(self.cube, k, z, self.job.zmax)
+        dirs = {}
+        for fmt in formats:
+            dirs[fmt] = unit_dir(self.job.tile_dir, fmt, k, z)
+            shutil.rmtree(dirs[fmt], ignore_errors=True)
+            os.makedirs(dirs[fmt])
+        count = 0
+        for tx, ty, block in iter_tiles(level):
+            for fmt in formats:
+                column = os.path.join(dirs[fmt], str(tx))
+                os.makedirs(column, exist_ok=True)
+                with open(os.path.join(column, f"{ty}{TILE_FORMATS[fmt]}"), "wb") as f:
+                    f.write(self.encode(fmt, block))
+                count += 1
+        return count
+
+
+# Per-process writer (open cube and LUT).
+_worker = None
+
+
+def _init_worker(job: TileJob) -> None:
+    global _worker
+    _worker = TileWriter(job)
+
+
+def _unit_task(k: int, z: int, formats) -> int:
+    return _worker.write(k, z, formats)
+
+
+def write_tiles(job: TileJob, units, workers: int | None = None) -> dict[tuple[int, int], int]:
+    """
+    Write the (k, z, formats) units, finest zoom first; returns {(k, z): tiles written}.
+    Worker count and serial fallback as in worker_pool.run_pool.
+    """
+    global _worker
+    units = sorted(units, key=lambda u: (-u[1], u[0]))
+    if not units:
+        return {}
+    workers = resolve_workers(workers, len(units))
+    if workers > 1:
+        print(f"Writing {len(units)} tile sets with {workers} worker processes …")
+        sys.stdout.flush()
+    try:
+        done = run_pool(_unit_task, units, workers, initializer=_init_worker, initargs=(job,), label="tile sets")
+    finally:
+        _worker = None
+    return {(k, z): n for (k, z, _), n in zip(units, done)}
+
+
+def write_index(tile_dir: str, *, shape, heights, zmax: int, formats, extent_m, cmap_name: str,
+                vmin: float, vmax: float, tile: int = TILE_SIZE) -> str:
+    """tiles.json, written after the tiles."""
+    nz, ny, nx = map(int, shape)
+    index = {
+        "format": "xyz",
+        "version": 1,
+        "tileSize": int(tile),
+        "minzoom": 0,
+        "maxzoom": int(zmax),
+        "shape": [nz, ny, nx],
+        "heights": [float(h) for h in heights],
+        # Data occupies [0, nx) x [0, ny) pixels at maxzoom, top-left anchored, north-up.
+        "pixelBounds": [0, 0, nx, ny],
+        "extent_m": [float(v) for v in extent_m],
+        "tiles": {fmt: f"{fmt}/{{k}}/{{z}}/{{x}}/{{y}}{TILE_FORMATS[fmt]}" for fmt in formats},
+        "dtype": "<f2",
+        "colormap": cmap_name,
+        "vmin": float(vmin),
+        "vmax": float(vmax),
+        "emptyTiles": "omitted",
+    }
+    path = os.path.join(tile_dir, TILES_INDEX)
+    atomic_write_json(path, index, indent=2)
+    return path
@@ -22,11 +22,14 @@
 import os
 import json
 import numpy as np
-from scipy.interpolate import RegularGridInterpolator, make_interp_spline
+from scipy.interpolate import make_interp_spline
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
 import traceback
 
+from speed_cube import load_speed_data
+from grid_sampler import GridSampler
+
 # ------------------------------------------------------------------
 # ======================== 用户配置区域 ===========================
 # ------------------------------------------------------------------
@@ -54,19 +57,6 @@ PLOT_CONFIG = {
 # ======================= 以下为脚本代码 ==========================
 # ------------------------------------------------------------------
 
-def load_speed_data(binfile, meta):
-    """读取 speed.bin 并 reshape 成 (layers, Ny, Nx)"""
-    size = meta.get("size")
-    if not size or len(size) != 3: raise ValueError("'size' must be [width,height,layers]")
-    post_width, post_height, num_layers = map(int, size)
-    expected = post_width * post_height * num_layers
-    data = np.fromfile(binfile, dtype=np.float32)
-    if data.size != expected: raise ValueError(f"binary size mismatch: expect {expected}, got {data.size}")
-    data = data.reshape((num_layers, post_height, post_width)).astype(np.float32)
-    data[np.isinf(data)] = np.nan
-    return data, post_width, post_height, num_layers
-
-
 def plot_single_case_profile(case_dir, config, output_dir):
     """(工作函数) 为单个案例绘制图表并保存到指定目录"""
     case_name = os.path.basename(case_dir)
@@ -88,7 +78,7 @@ def plot_single_case_profile(case_dir, config, output_dir):
     lt = info.get("domain", {}).get("lt", 10000); dh = float(meta.get("dh", 10))
     x_coords = np.linspace(-lt/2, lt/2, Nx); y_coords = np.linspace(-lt/2, lt/2, Ny)
     H_levels = np.arange(1, Nz + 1) * dh
-    f_interp = RegularGridInterpolator((H_levels, y_coords, x_coords), data, method="linear", bounds_error=False, fill_value=np.nan)
+    f_interp = GridSampler(data, x_coords, y_coords, H_levels, fill_value=np.nan)
     
     # --- 3. 准备绘图和计算 ---
     fig, ax = plt.subplots(figsize=(10, 7))
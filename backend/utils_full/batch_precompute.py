@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# utils_full/batch_precompute.py
+# ---------------------------------------------------------------
+# 多工况批量预计算：用一个进程池跑完所有工况的逐工况预计算阶段，
+# 替代 generate_data*.sh 中“每个工况、每个脚本各起一个解释器”的串行循环。
+#   visualization  precompute_visualization   切片 PNG / 风廓线 / 尾流
+#   tiles          precompute_tiles           XYZ 瓦片金字塔
+#   atmospheric    precompute_atmospheric_data 75m 边界层数据
+#   lidar          visualize_lidar_wake_view   激光雷达 PPI 图
+#   radar          visualize_atmospheric_radar 大气雷达扫描图
+# 各模块只在主进程导入一次，各阶段的字体配置也只计算一次，fork 出的
+# 工作进程直接继承；每个阶段在独立的 rc_context 中运行，互不影响。
+# 每个工况的输出写入 <工况目录>/batch_precompute.log，耗时与成败写入
+# 清单 JSON（每完成一个工况更新一次）。单个工况失败不会中断批处理。
+#
+# 用法：
+#   python3 batch_precompute.py "../post_processing/data/*" --workers 8
+#   python3 batch_precompute.py "data/*" --stages visualization,lidar \
+#       --lidar-args "--height 75 --lidar_turbine_id S3F12 --target_turbine_id S2F15 --dpi 150"
+# ---------------------------------------------------------------
+
+import os, sys, glob, time, shlex, argparse, warnings, traceback, contextlib
+
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+import precompute_visualization
+import precompute_tiles
+import precompute_atmospheric_data
+import visualize_lidar_wake_view
+import visualize_atmospheric_radar
+from speed_cube import atomic_write_json
+from worker_pool import resolve_workers, run_pool
+
+STAGES = ("visualization", "tiles", "atmospheric", "lidar", "radar")
+LOG_FILE = "batch_precompute.log"
+MANIFEST_FILE = "batch_manifest.json"
+
+# ------------------------------------------------------------------
+# 各阶段：输入工况目录，返回是否成功；工况内部一律串行 (workers=1)
+# ------------------------------------------------------------------
+def _stage_visualization(case_dir, cfg):
+    return precompute_visualization.precompute_all_data(
+        os.path.basename(case_dir), workers=1, renderer=cfg["renderer"], force=cfg["force"], case_dir=case_dir)
+
+def _stage_tiles(case_dir, cfg):
+    return precompute_tiles.precompute_tiles(
+        os.path.basename(case_dir), cfg["tile_formats"], workers=1, force=cfg["force"], case_dir=case_dir)
+
+def _stage_atmospheric(case_dir, cfg):
+    return precompute_atmospheric_data.precompute_75m_boundary_layer_data(case_dir)
+
+def _stage_lidar(case_dir, cfg):
+    visualize_lidar_wake_view.run_visualization_for_case(case_dir, cfg["lidar_args"], cfg["lidar_out"])
+    return True
+
+def _stage_radar(case_dir, cfg):
+    return visualize_atmospheric_radar.run_radar_for_case(case_dir, cfg["radar_args"], cfg["radar_out"])
+
+STAGE_FUNCS = {
+    "visualization": _stage_visualization,
+    "tiles": _stage_tiles,
+    "atmospheric": _stage_atmospheric,
+    "lidar": _stage_lidar,
+    "radar": _stage_radar,
+}
+
+def font_profiles():
+    """各绘图阶段的字体设置（需扫描已安装字体）只在主进程做一次，记录为 rcParams 差异"""
+    base = dict(plt.rcParams)
+    profiles = {}
+    for stage, setup in (("lidar", visualize_lidar_wake_view.set_academic_font),
+                         ("radar", visualize_atmospheric_radar.set_font)):
+        with plt.rc_context():
+            setup()
+            profiles[stage] = {k: v for k, v in plt.rcParams.items() if base.get(k) != v}
+    return profiles
+
+# ------------------------------------------------------------------
+# 工作进程
+# ------------------------------------------------------------------
+_config = None
+
+def _init_worker(config):
+    global _config
+    _config = config
+
+def run_case(case_dir):
+    """依次运行各阶段；任何异常都只记在该阶段上"""
+    cfg = _config
+    # fork 会复制父进程的随机状态：与独立解释器一样，每个工况重新取种子
+    np.random.seed()
+    record = {"case": os.path.basename(case_dir), "dir": case_dir,
+              "log": os.path.join(case_dir, LOG_FILE), "stages": {}}
+    t0 = time.perf_counter()
+    try:
+        log = open(record["log"], "w", encoding="utf-8")
+    except OSError as e:
+        return failed_record(case_dir, f"{type(e).__name__}: {e}")
+    with log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        for stage in cfg["stages"]:
+            t = time.perf_counter()
+            error = None
+            try:
+                with plt.rc_context(cfg["fonts"].get(stage)):
+                    ok = bool(STAGE_FUNCS[stage](case_dir, cfg))
+                if not ok:
+                    error = "stage reported failure"
+            except (Exception, SystemExit) as e:
+                traceback.print_exc()
+                ok, error = False, f"{type(e).__name__}: {e}"
+            finally:
+                plt.close("all")
+            entry = {"ok": ok, "seconds": round(time.perf_counter() - t, 3)}
+            if error:
+                entry["error"] = error
+            record["stages"][stage] = entry
+    record["seconds"] = round(time.perf_counter() - t0, 3)
+    record["ok"] = all(s["ok"] for s in record["stages"].values())
+    return record
+
+def failed_record(case_dir, error):
+    return {"case": os.path.basename(case_dir), "dir": case_dir, "log": os.path.join(case_dir, LOG_FILE),
+            "stages": {}, "seconds": None, "ok": False, "error": error}
+
+# ------------------------------------------------------------------
+# 主进程
+# ------------------------------------------------------------------
+def find_cases(patterns):
+    """glob 展开后只保留含 output.json 的目录；数字目录名按数值排序"""
+    dirs = {os.path.abspath(p) for pattern in patterns for p in glob.glob(pattern)
+            if os.path.isfile(os.path.join(p, "output.json"))}
+    return sorted(dirs, key=lambda d: (0, int(os.path.basename(d)), d) if os.path.basename(d).isdigit()
+                  else (1, 0, d))
+
+def write_manifest(path, summary, records):
+    summary = dict(summary, cases=[records[d] for d in sorted(records)],
+                   succeeded=sum(r["ok"] for r in records.values()),
+                   failed=sum(not r["ok"] for r in records.values()))
+    atomic_write_json(path, summary, indent=2, ensure_ascii=False)
+
+def report(record, done, total):
+    if record["ok"]:
+        print(f"✅ [{done}/{total}] {record['case']}  {record['seconds']:.1f} s")
+    else:
+        failed = [f"{name} ({s.get('error')})" for name, s in record["stages"].items() if not s["ok"]]
+        print(f"❌ [{done}/{total}] {record['case']}  {', '.join(failed) or record.get('error')}  日志: {record['log']}")
+    sys.stdout.flush()
+
+def run_batch(case_dirs, config, workers, manifest_path):
+    summary = {"started": time.strftime("%Y-%m-%d %H:%M:%S"), "workers": workers, "stages": config["stages"]}
+    records = {}
+    t0 = time.perf_counter()
+
+    def finish(case_dir, record):
+        records[case_dir] = record
+        report(record, len(records), len(case_dirs))
+        summary["wallSeconds"] = round(time.perf_counter() - t0, 3)
+        write_manifest(manifest_path, summary, records)
+
+    # 工作进程崩溃时只有当时正在运行的工况会被逐个复跑，单独崩溃才记失败（worker_pool.run_pool）
+    run_pool(run_case, [(d,) for d in case_dirs], workers, initializer=_init_worker, initargs=(config,),
+             crashed=lambda d: failed_record(d, "worker process died"),
+             on_result=lambda i, record: finish(case_dirs[i], record), label="cases")
+    summary["wallSeconds"] = round(time.perf_counter() - t0, 3)
+    write_manifest(manifest_path, summary, records)
+    return records
+
+def main():
+    p = argparse.ArgumentParser(description="Run the per-case precompute stages over many cases in a process pool.")
+    p.add_argument("cases", nargs="+", help="case directory glob(s), e.g. '../post_processing/data/*'")
+    p.add_argument("--workers", type=int, default=None,
+                   help="case processes (default: $PRECOMPUTE_WORKERS, else all CPUs; 1 = serial)")
+    p.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {','.join(STAGES)}")
+    p.add_argument("--manifest", default=None, help=f"timing/success manifest (default: <cases parent>/{MANIFEST_FILE})")
+    p.add_argument("--tile-format", choices=["png", "f16", "both"], default="both")
+    p.add_argument("--renderer", choices=precompute_visualization.RENDERERS,
+                   default=os.getenv("PRECOMPUTE_RENDERER", "matplotlib"),
+                   help="slice PNG renderer (default: $PRECOMPUTE_RENDERER, else matplotlib)")
+    p.add_argument("--lidar-args", default="", help="extra visualize_lidar_wake_view.py options, one quoted string")
+    p.add_argument("--radar-args", default="", help="extra visualize_atmospheric_radar.py options, one quoted string")
+    p.add_argument("--force", action="store_true", help="ignore incremental caches (visualization, tiles)")
+    args = p.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        p.error(f"unknown stages: {', '.join(unknown)}")
+    case_dirs = find_cases(args.cases)
+    if not case_dirs:
+        print("❌ 没有找到包含 output.json 的工况目录", file=sys.stderr)
+        sys.exit(1)
+    root = os.path.commonpath([os.path.dirname(d) for d in case_dirs])
+
+    warnings.filterwarnings("ignore", category=UserWarning, module='matplotlib')
+    warnings.filterwarnings("ignore", category=RuntimeWarning)
+    lidar_args = visualize_lidar_wake_view.parse_args([root, *shlex.split(args.lidar_args)])
+    radar_args = visualize_atmospheric_radar.parse_args([root, *shlex.split(args.radar_args)])
+    config = {
+        "stages": stages,
+        "force": args.force,
+        "renderer": args.renderer,
+        "tile_formats": ("png", "f16") if args.tile_format == "both" else (args.tile_format,),
+        "lidar_args": lidar_args,
+        "lidar_out": os.path.join(root, "wake_pic"),
+        "radar_args": radar_args,
+        "radar_out": os.path.join(root, "atmospheric_radar_pics"),
+        "fonts": font_profiles(),
+    }
+    for stage, key in (("lidar", "lidar_out"), ("radar", "radar_out")):
+        if stage in stages:
+            os.makedirs(config[key], exist_ok=True)
+
+    workers = resolve_workers(args.workers, len(case_dirs))
+    manifest_path = args.manifest or os.path.join(root, MANIFEST_FILE)
+    print(f"{len(case_dirs)} 个工况, 阶段: {', '.join(stages)}, 进程数: {workers}")
+    records = run_batch(case_dirs, config, workers, manifest_path)
+
+    failed = [r for r in records.values() if not r["ok"]]
+    print(f"完成: {len(records) - len(failed)} 成功, {len(failed)} 失败。清单: {manifest_path}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# backend/utils/bench_query_daemon.py
+"""
+单点风速查询负载基准：逐次 spawn run_query.sh（旧路径）vs 常驻 query_daemon.py。
+
+在 uploads/ 下生成临时合成算例，分别测量：
+  - spawn：每个查询启动一次 bash + python3 query_speed.py
+  - daemon 单点：每个请求一个点，逐个往返
+  - daemon 批量：一个请求携带 --batch 个点
+并校验两条路径返回的风速一致，结束后删除临时算例。
+
+用法：python3 bench_query_daemon.py --spawn 20 --queries 2000 --batch 10000
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+
+import numpy as np
+
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, UTILS_DIR)
+import query_speed  # noqa: E402
+
+
+def make_case(case_dir, nx, ny, nz, lt=10000.0, dh=10.0, seed=0):
+    """写出 speed.bin / output.json / info.json（与 post.py 输出布局一致）"""
+    os.makedirs(case_dir)
+    rng = np.random.default_rng(seed)
+    z = (np.arange(1, nz + 1) * dh)[:, None, None]
+    cube = 8.0 * (z / 100.0) ** 0.2 + rng.standard_normal((nz, ny, nx)) * 0.3
+    cube.astype(np.float32).tofile(os.path.join(case_dir, "speed.bin"))
+    with open(os.path.join(case_dir, "output.json"), "w", encoding="utf-8") as f:
+        json.dump({"size": [nx, ny, nz], "file": "speed.bin", "dh": dh,
+                   "heights": [(k + 1) * dh for k in range(nz)]}, f)
+    with open(os.path.join(case_dir, "info.json"), "w", encoding="utf-8") as f:
+        json.dump({"domain": {"lt": lt}}, f)
+
+
+def random_points(rng, n, lt, nz, dh):
+    half = lt / 2
+    return np.column_stack([rng.uniform(-half, half, n), rng.uniform(-half, half, n),
+                            rng.uniform(dh, nz * dh, n)])
+
+
+def bench_spawn(case_id, points):
+    script = os.path.join(UTILS_DIR, "run_query.sh")
+    speeds = []
+    t0 = time.perf_counter()
+    for x, y, z in points.tolist():
+        out = subprocess.run(["bash", script, "--caseId", case_id, "--x", repr(x), "--y", repr(y), "--z", repr(z)],
+                             capture_output=True, text=True, check=True).stdout
+        speeds.append(json.loads(out)["speed"])
+    return time.perf_counter() - t0, speeds
+
+
+class DaemonClient:
+    def __init__(self):
+        self.proc = subprocess.Popen([sys.executable, os.path.join(UTILS_DIR, "query_daemon.py")],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+        self.next_id = 0
+
+    def request(self, payload):
+        self.next_id += 1
+        payload["id"] = self.next_id
+        self.proc.stdin.write(json.dumps(payload) + "\n")
+        self.proc.stdin.flush()
+        response = json.loads(self.proc.stdout.readline())
+        if not response.get("success"):
+            raise RuntimeError(response.get("error"))
+        return response
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark spawn-per-request vs the persistent query daemon.")
+    parser.add_argument("--nx", type=int, default=500)
+    parser.add_argument("--nz", type=int, default=30)
+    parser.add_argument("--spawn", type=int, default=20, help="Number of spawn-per-request queries")
+    parser.add_argument("--queries", type=int, default=2000, help="Number of single-point daemon requests")
+    parser.add_argument("--batch", type=int, default=10000, help="Points in one batched daemon request")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    lt, dh = 10000.0, 10.0
+    case_id = f"_bench_query_{os.getpid()}"
+    case_dir = os.path.join(query_speed.UPLOADS_DIR, case_id)
+    make_case(case_dir, args.nx, args.nx, args.nz, lt, dh, args.seed)
+    size_mb = os.path.getsize(os.path.join(case_dir, "speed.bin")) / 2**20
+    print(f"合成算例: {args.nx}x{args.nx}x{args.nz} ({size_mb:.1f} MB)")
+
+    client = None
+    try:
+        points = random_points(rng, max(args.spawn, args.queries), lt, args.nz, dh)
+
+        spawn_time, spawn_speeds = bench_spawn(case_id, points[:args.spawn])
+        print(f"spawn 每请求:    {args.spawn:6d} 次 {spawn_time:8.2f} s | {spawn_time / args.spawn * 1e3:9.2f} ms/次")
+
+        t0 = time.perf_counter()
+        client = DaemonClient()
+        client.request({"op": "ping"})
+        first = client.request({"caseId": case_id, "points": points[:1].tolist()})
+        print(f"daemon 启动+首查: {time.perf_counter() - t0:8.3f} s")
+
+        t0 = time.perf_counter()
+        daemon_speeds = []
+        for p in points[:args.queries]:
+            daemon_speeds.append(client.request({"caseId": case_id, "points": [p.tolist()]})["results"][0]["speed"])
+        single = time.perf_counter() - t0
+        print(f"daemon 单点往返: {args.queries:6d} 次 {single:8.2f} s | {single / args.queries * 1e6:9.1f} µs/次")
+
+        batch = random_points(rng, args.batch, lt, args.nz, dh)
+        t0 = time.perf_counter()
+        results = client.request({"caseId": case_id, "points": batch.tolist()})["results"]
+        batched = time.perf_counter() - t0
+        print(f"daemon 批量:     {len(results):6d} 点 {batched:8.3f} s | {batched / len(results) * 1e6:9.2f} µs/点")
+        print(f"加速比 (spawn / daemon 单点): {(spawn_time / args.spawn) / (single / args.queries):.0f}x")
+
+        ok = first["results"][0]["speed"] == daemon_speeds[0] and all(
+            a == b for a, b in zip(spawn_speeds, daemon_speeds))
+        print("spawn 与 daemon 结果一致" if ok else "spawn 与 daemon 结果不一致!")
+        stats = client.request({"op": "stats"})
+        print(f"daemon 缓存: hits={stats['hits']} misses={stats['misses']}")
+        if not ok:
+            sys.exit(1)
+    finally:
+        if client is not None:
+            client.close()
+        shutil.rmtree(case_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
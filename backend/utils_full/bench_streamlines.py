@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# backend/utils/bench_streamlines.py
+"""
+流线积分基准：preStreamLines.integrate_streamlines 在 1 / 2 / 4 / 8 个进程下的耗时。
+
+在 --n^3 的合成非结构网格（ImageData 转 UnstructuredGrid）上构造带旋涡的
+矢量场 U，随机取 --seeds 个种子，以 TEST_LEVEL 3 的步长参数（初始步长 =
+最大尺寸 × 0.0005，RK45）积分。每个进程数报告墙钟时间与加速比，并校验并行
+结果的点、线、点/单元数组（含 SeedIds）与单进程一次积分逐一相同；另校验
+streamline_stats 与逐条计算一致（含首尾为空流线、单点流线的构造用例）。
+机器核数少于进程数时加速比自然封顶。
+
+用法：python3 bench_streamlines.py --n 60 --seeds 2000 --workers 1,2,4,8
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import preStreamLines as psl  # noqa: E402
+from preStreamLines import pv  # noqa: E402
+
+
+def synthetic_mesh(n):
+    """单位立方体上的旋涡场：主流沿 x，叠加 y/z 方向的正弦扰动"""
+    grid = pv.ImageData(dimensions=(n, n, n), spacing=(1.0 / (n - 1),) * 3).cast_to_unstructured_grid()
+    x, y, z = grid.points.T
+    grid["U"] = np.column_stack([1.0 + 0.5 * np.sin(6 * y) * np.cos(3 * z),
+                                 0.6 * np.cos(5 * x) + 0.2 * np.sin(4 * z),
+                                 0.2 * np.sin(4 * x + 3 * y)]).astype(np.float32)
+    return grid
+
+
+def same_streamlines(a, b):
+    if a.n_points != b.n_points or a.n_lines != b.n_lines:
+        return False
+    if not (np.array_equal(a.points, b.points) and np.array_equal(a.lines, b.lines)):
+        return False
+    for attr in ("point_data", "cell_data"):
+        da, db = getattr(a, attr), getattr(b, attr)
+        if sorted(da.keys()) != sorted(db.keys()):
+            return False
+        if not all(np.array_equal(da[k], db[k]) for k in da.keys()):
+            return False
+    return True
+
+
+def stats_reference(stream):
+    """逐条循环计算点数 > 1 的流线的点数、长度与首尾位移"""
+    counts, lengths, displacement = [], [], []
+    for i in range(stream.n_cells):
+        pts = np.asarray(stream.get_cell(i).points, dtype=np.float64)
+        if len(pts) > 1:
+            counts.append(len(pts))
+            lengths.append(np.linalg.norm(np.diff(pts, axis=0), axis=1).sum())
+            displacement.append(np.linalg.norm(pts[-1] - pts[0]))
+    return counts, lengths, displacement
+
+
+def stats_match(stream):
+    counts, lengths, displacement = psl.streamline_stats(stream)
+    ref = stats_reference(stream)
+    return (counts.tolist() == ref[0] and np.allclose(lengths, ref[1])
+            and np.allclose(displacement, ref[2]))
+
+
+def stats_edge_cases():
+    """空流线在首 / 尾 / 中间、单点流线：边界处不能越界或误清零"""
+    pts = np.array([[0, 0, 0], [1, 0, 0], [2, 0, 0], [10, 0, 0], [10, 2, 0]], dtype=float)
+    cases = ([0, 3, 0, 1, 2, 2, 3, 4], [3, 0, 1, 2, 2, 3, 4, 0], [3, 0, 1, 2, 1, 2, 2, 3, 4],
+             [0, 3, 0, 1, 2, 0, 2, 3, 4, 0])
+    return all(stats_match(pv.PolyData(pts, lines=np.array(lines))) for lines in cases)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark seed-partitioned parallel streamline integration.")
+    parser.add_argument("--n", type=int, default=60, help="Grid points per axis")
+    parser.add_argument("--seeds", type=int, default=2000)
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker counts")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mesh = synthetic_mesh(args.n)
+    rng = np.random.default_rng(args.seed)
+    seeds = pv.PolyData(rng.uniform([0.01, 0.01, 0.05], [0.3, 0.99, 0.95], (args.seeds, 3)))
+    step_length = 1.0 * 0.0005
+    tracer_kwargs = dict(vectors="U", integrator_type=4, integration_direction="forward",
+                         initial_step_length=step_length, step_unit="l",
+                         max_steps=int(1.5 / step_length), terminal_speed=1e-12)
+    print(f"网格 {mesh.n_cells} 单元, {args.seeds} 个种子, CPU {os.cpu_count()} 核")
+
+    reference, base = None, None
+    ok = True
+    for workers in (int(w) for w in args.workers.split(",")):
+        t0 = time.perf_counter()
+        stream = psl.integrate_streamlines(mesh, seeds, tracer_kwargs, workers=workers)
+        elapsed = time.perf_counter() - t0
+        if reference is None:
+            reference, base = stream, elapsed
+            same = True
+        else:
+            same = same_streamlines(reference, stream)
+            ok &= same
+        print(f"{workers:>3} 进程: {elapsed:7.2f} s | 加速 {base / elapsed:4.2f}x | "
+              f"{stream.n_lines} 条线 / {stream.n_points} 点 | 与单进程一致: {same}")
+    stats_ok = stats_match(reference) and stats_edge_cases()
+    print(f"streamline_stats 与逐条计算一致: {stats_ok}")
+    ok &= stats_ok
+    print("校验通过" if ok else "校验失败!")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
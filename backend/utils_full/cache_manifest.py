@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Dependency manifest for the incremental rebuild of visualization_cache.
+
+visualization_cache/manifest.json records, for every artifact (profiles.json,
+wakes.json, each slice PNG and slice_info file, keyed by its path relative to
+the cache directory), a hash of the inputs it was derived from: the speed.bin
+layers it reads, the turbine fields it uses, the colormap, vmin/vmax, image
+size, ... A re-run rebuilds an artifact only when that hash changed or the
+file is missing, so editing a turbine in info.json rewrites the profiles,
+wakes and slice_info files but none of the PNGs, and a regenerated speed.bin
+re-renders only the layers whose values differ.
+
+speed.bin is hashed per layer (blake2b over the float32 bytes). The layer
+hashes are kept in the manifest next to the file's (mtime_ns, size, shape),
+so an untouched speed.bin is never read again. Artifacts of the previous run
+that are no longer produced (heights removed) are deleted by prune(); an
+artifact may also be a directory (a tile set), which is removed as a whole.
+
+force=True treats every artifact as stale; the manifest is still rewritten.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from speed_cube import atomic_write_json
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def digest(*parts) -> str:
+    """sha256 of the canonical JSON of parts (dicts, lists, numbers, strings)."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def layer_digest(layer: np.ndarray) -> str:
+    return hashlib.blake2b(np.ascontiguousarray(layer).data, digest_size=16).hexdigest()
+
+
+class BuildManifest:
+    def __init__(self, cache_dir: str, force: bool = False):
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, MANIFEST_FILE)
+        self.force = force
+        self.artifacts: dict[str, str] = {}
+        self.speed: dict = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("version") == MANIFEST_VERSION:
+                self.artifacts = dict(saved.get("artifacts", {}))
+                self.speed = dict(saved.get("speed", {}))
+        except (OSError, ValueError):
+            pass  # no or unreadable manifest: everything is stale
+        self._seen: set[str] = set()
+
+    def layer_digests(self, binfile: str, data: np.ndarray) -> list[str]:
+        """Hash of every layer of the (layers, Ny, Nx) cube, reused while speed.bin is unchanged."""
+        st = os.stat(binfile)
+        stamp = [st.st_mtime_ns, st.st_size, *map(int, data.shape)]
+        layers = self.speed.get("layers")
+        if self.speed.get("stat") != stamp or not isinstance(layers, list) or len(layers) != len(data):
+            layers = [layer_digest(data[k]) for k in range(len(data))]
+            self.speed = {"stat": stamp, "layers": layers}
+        return list(layers)
+
+    def stale(self, name: str, key: str) -> bool:
+        """True if artifact `name` (relative to the cache dir) must be rebuilt for inputs hash `key`."""
+        self._seen.add(name)
+        if self.force or self.artifacts.get(name) != key:
+            return True
+        return not os.path.exists(os.path.join(self.cache_dir, name))
+
+    def record(self, name: str, key: str) -> None:
+        """Mark `name` as built from `key`; a file that was not written stays stale."""
+        self._seen.add(name)
+        if os.path.exists(os.path.join(self.cache_dir, name)):
+            self.artifacts[name] = key
+        else:
+            self.artifacts.pop(name, None)
+
+    def prune(self, prefixes: tuple[str, ...] | None = None) -> list[str]:
+        """
+        Delete artifacts (files or directories) of earlier runs that this run did
+        not ask about, only those whose name starts with one of `prefixes` if given.
+        """
+        removed = []
+        for name in sorted(set(self.artifacts) - self._seen):
+            if prefixes is not None and not name.startswith(prefixes):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            del self.artifacts[name]
+            removed.append(name)
+        return removed
+
+    def save(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        atomic_write_json(self.path, {"version": MANIFEST_VERSION, "speed": self.speed,
+                                      "artifacts": dict(sorted(self.artifacts.items()))}, indent=1)
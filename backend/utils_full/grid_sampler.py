@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Trilinear sampling of a speed cube on uniform horizontal axes.
+
+Drop-in replacement for scipy's RegularGridInterpolator(method="linear",
+bounds_error=False) over the (heights, y, x) cubes read from speed.bin:
+
+  * cell indices are computed as (coord - origin) / step instead of a
+    searchsorted per axis; a non-uniform height axis (output.json "heights")
+    falls back to np.interp over its few levels;
+  * the eight corners are gathered with one np.take on the (memory-mapped)
+    float32 cube and blended separably in float32 (x, then y, then z), and
+    float32 is returned, so the cube is never promoted to float64;
+  * a corner whose weight is zero never contributes, so a point lying exactly
+    on a valid layer next to a NaN layer stays finite;
+  * nan_policy="renormalize" re-weights the finite corners instead of
+    returning NaN when some of them are missing (cells touching terrain);
+  * the cube is terrain-following (layer k is heights[k] above ground), so z
+    is height above ground by default; vertical="asl" takes absolute
+    elevations and subtracts a (ny, nx) ground surface sampled bilinearly on
+    the same horizontal grid.
+
+Points outside the grid (or with NaN coordinates) return fill_value.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+NAN_POLICIES = ("propagate", "renormalize")
+VERTICAL_MODES = ("agl", "asl")
+
+# A fractional index this close to a node is snapped onto it, so linspace
+# round-off never gives a tiny weight to the neighbouring (possibly NaN) cell.
+_SNAP = 1e-6
+
+
+class GridAxis:
+    """One strictly increasing axis; locates coordinates arithmetically when uniform."""
+
+    def __init__(self, coords, name: str = "axis"):
+        coords = np.asarray(coords, dtype=np.float64)
+        if coords.ndim != 1 or len(coords) == 0:
+            raise ValueError(f"{name} must be a non-empty 1-D array")
+        steps = np.diff(coords)
+        if np.any(steps <= 0):
+            raise ValueError(f"{name} must be strictly increasing")
+        self.coords = coords
+        self.n = len(coords)
+        self.lo = float(coords[0])
+        self.hi = float(coords[-1])
+        self.step = (self.hi - self.lo) / (self.n - 1) if self.n > 1 else 1.0
+        self.uniform = self.n < 3 or bool(np.allclose(steps, self.step, rtol=1e-6, atol=0.0))
+
+    def locate(self, c, clamp: bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (lower index, fraction in [0, 1] as float32, valid mask) for coordinates c.
+
+        Out-of-range coordinates are invalid unless clamp=True, which moves them
+        onto the nearest edge (np.interp semantics). NaN is always invalid.
+        """
+        c = np.asarray(c, dtype=np.float64)
+        valid = ~np.isnan(c) if clamp else (c >= self.lo) & (c <= self.hi)
+        if clamp:
+            c = np.minimum(np.maximum(c, self.lo), self.hi)
+        if self.n == 1:
+            zeros = np.zeros(c.shape, dtype=np.intp)
+            return zeros, np.zeros(c.shape, dtype=np.float32), valid
+        if self.uniform:
+            f = (c - self.lo) / self.step
+        else:
+            f = np.interp(c, self.coords, np.arange(self.n, dtype=np.float64))
+        f = np.where(valid, f, 0.0)
+        nearest = np.rint(f)
+        f = np.where(np.abs(f - nearest) < _SNAP, nearest, f)
+        i = np.minimum(np.floor(f), self.n - 2)  # f >= 0 here
+        return i.astype(np.intp), (f - i).astype(np.float32), valid
+
+    @property
+    def stride(self) -> int:
+        """Index offset to the upper neighbour (0 for a single-node axis)."""
+        return 1 if self.n > 1 else 0
+
+
+def _lerp(a: np.ndarray, b: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """(1 - t) * a + t * b, exactly a at t == 0 and b at t == 1 even if the other is NaN."""
+    out = b - a
+    out *= t
+    out += a
+    bad = np.isnan(out)
+    if bad.any():
+        t = np.broadcast_to(t, out.shape)
+        np.copyto(out, np.broadcast_to(a, out.shape), where=bad & (t == 0))
+        np.copyto(out, np.broadcast_to(b, out.shape), where=bad & (t == 1))
+    return out
+
+
+def _blend(corners: np.ndarray, tx: np.ndarray, ty: np.ndarray, tz: np.ndarray) -> np.ndarray:
+    """Separable trilinear blend of (8, N) corners ordered z, y, x (x fastest)."""
+    c = _lerp(corners[0::2], corners[1::2], tx)
+    c = _lerp(c[0::2], c[1::2], ty)
+    return _lerp(c[0], c[1], tz)
+
+
+class GridSampler:
+    """
+    Linear sampler over a (nz, ny, nx) cube with axes (heights, y, x).
+
+    Call it like RegularGridInterpolator: with (..., 3) points ordered
+    (z, y, x), or a single [z, y, x]; returns float32 of shape points.shape[:-1]
+    (shape (1,) for a single point). `grid` holds (heights, y, x).
+    """
+
+    def __init__(self, values, x, y, heights, *, fill_value: float = np.nan,
+                 nan_policy: str = "propagate", ground=None, vertical: str = "agl"):
+        if nan_policy not in NAN_POLICIES:
+            raise ValueError(f"nan_policy must be one of {NAN_POLICIES}, got {nan_policy!r}")
+        if vertical not in VERTICAL_MODES:
+            raise ValueError(f"vertical must be one of {VERTICAL_MODES}, got {vertical!r}")
+        self.x_axis = GridAxis(x, "x")
+        self.y_axis = GridAxis(y, "y")
+        self.z_axis = GridAxis(heights, "heights")
+        shape = (self.z_axis.n, self.y_axis.n, self.x_axis.n)
+
+        if getattr(values, "dtype", None) != np.float32:
+            values = np.asarray(values, dtype=np.float32)
+        if values.shape != shape:
+            raise ValueError(f"values shape {values.shape} does not match axes {shape}")
+        self.values = values
+        # reshape(-1) of a C-contiguous memmap is a view: np.take only pages in the corners.
+        self._flat = values.reshape(-1) if values.flags.c_contiguous else np.ascontiguousarray(values).reshape(-1)
+
+        self.ground = None
+        if vertical == "asl":
+            if ground is None:
+                raise ValueError("vertical='asl' requires a ground elevation array")
+            ground = np.asarray(ground, dtype=np.float32)
+            if ground.shape != shape[1:]:
+                raise ValueError(f"ground shape {ground.shape} does not match (ny, nx) {shape[1:]}")
+            self.ground = ground
+        self.vertical = vertical
+        self.fill_value = fill_value
+        self.nan_policy = nan_policy
+
+        nx = self.x_axis.n
+        plane = self.y_axis.n * nx
+        dz, dy, dx = self.z_axis.stride * plane, self.y_axis.stride * nx, self.x_axis.stride
+        self._offsets = np.array([z + y + x for z in (0, dz) for y in (0, dy) for x in (0, dx)], dtype=np.intp)
+
+    @classmethod
+    def from_axes(cls, values, axes, **kwargs) -> "GridSampler":
+        """Build from a speed_cube.CubeAxes (x, y, heights)."""
+        return cls(values, axes.x, axes.y, axes.heights, **kwargs)
+
+    @property
+    def grid(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.z_axis.coords, self.y_axis.coords, self.x_axis.coords
+
+    def __call__(self, points) -> np.ndarray:
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim == 1:
+            points = points[None, :]
+        if points.shape[-1] != 3:
+            raise ValueError(f"points must have shape (..., 3) ordered (z, y, x), got {points.shape}")
+        flat = points.reshape(-1, 3)
+        return self.sample(flat[:, 2], flat[:, 1], flat[:, 0]).reshape(points.shape[:-1])
+
+    def ground_at(self, x, y) -> np.ndarray:
+        """Bilinear ground elevation (float32) at x, y; NaN outside the grid."""
+        if self.ground is None:
+            raise ValueError("This sampler has no ground surface")
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+        ix, tx, vx = self.x_axis.locate(x.ravel())
+        iy, ty, vy = self.y_axis.locate(y.ravel())
+        out = self._ground(ix, tx, iy, ty)
+        out[~(vx & vy)] = np.nan
+        return out.reshape(x.shape)
+
+    def _ground(self, ix, tx, iy, ty) -> np.ndarray:
+        g = self.ground.reshape(-1)
+        nx = self.x_axis.n
+        base = iy * nx + ix
+        dx, dy = self.x_axis.stride, self.y_axis.stride * nx
+        lower = _lerp(g[base], g[base + dx], tx)
+        upper = _lerp(g[base + dy], g[base + dy + dx], tx)
+        return _lerp(lower, upper, ty)
+
+    def sample(self, x, y, z) -> np.ndarray:
+        """Sample at broadcast coordinates x, y, z (z per the sampler's vertical mode)."""
+        x, y, z = np.broadcast_arrays(*(np.asarray(c, dtype=np.float64) for c in (x, y, z)))
+        shape = x.shape
+        x, y, z = x.ravel(), y.ravel(), z.ravel()
+
+        ix, tx, vx = self.x_axis.locate(x)
+        iy, ty, vy = self.y_axis.locate(y)
+        if self.ground is not None:
+            z = z - self._ground(ix, tx, iy, ty)
+        iz, tz, vz = self.z_axis.locate(z)
+        valid = vx & vy & vz
+
+        base = (iz * self.y_axis.n + iy) * self.x_axis.n + ix
+        corners = np.take(self._flat, self._offsets[:, None] + base)
+        corners = np.asarray(corners, dtype=np.float32)
+
+        if self.nan_policy == "renormalize":
+            finite = np.isfinite(corners)
+            weight = _blend(finite.astype(np.float32), tx, ty, tz)
+            total = _blend(np.where(finite, corners, np.float32(0)), tx, ty, tz)
+            out = np.full(len(x), np.nan, dtype=np.float32)
+            np.divide(total, weight, out=out, where=weight > 0)
+        else:
+            out = _blend(corners, tx, ty, tz)
+
+        out[~valid] = self.fill_value
+        if self.nan_policy == "renormalize" and not np.isnan(self.fill_value):
+            out[np.isnan(out)] = self.fill_value
+        return out.reshape(shape)
+
+
+def resample_grid(values, x_src, y_src, x_dst, y_dst) -> np.ndarray:
+    """
+    Bilinear resample of a (len(y_src), len(x_src)) field onto the
+    (len(y_dst), len(x_dst)) grid, clamping at the edges like np.interp.
+    Separable: two gathers along x, then two along y. Returns float32.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    x_axis, y_axis = GridAxis(x_src, "x_src"), GridAxis(y_src, "y_src")
+    if values.shape != (y_axis.n, x_axis.n):
+        raise ValueError("values shape must match y_src/x_src lengths")
+    ix, tx, _ = x_axis.locate(x_dst, clamp=True)
+    iy, ty, _ = y_axis.locate(y_dst, clamp=True)
+    rows = _lerp(values[:, ix], values[:, ix + x_axis.stride], tx[None, :])
+    return _lerp(rows[iy], rows[iy + y_axis.stride], ty[:, None])
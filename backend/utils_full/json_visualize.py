@@ -13,11 +13,15 @@ import json
 import math
 import argparse
 import numpy as np
-from scipy.interpolate import RegularGridInterpolator
 import sys
 import traceback
 import time
 
+from speed_cube import load_speed_data
+from grid_sampler import GridSampler
+from turbine_samples import (PROFILES_FILE, WAKES_FILE, packed_list, sample_profiles,
+                             sample_wakes, turbine_xy, write_packed)
+
 def numpy_to_python(obj):
     """Convert numpy types to Python native types for JSON serialization."""
     if isinstance(obj, (np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64)):
@@ -45,52 +49,6 @@ def numpy_to_python(obj):
         return str(obj)
 
 
-def load_speed_data(binfile, meta):
-    """Loads speed data, ensuring correct dimensions."""
-    if not meta or not isinstance(meta, dict):
-        raise ValueError("Invalid metadata: metadata must be a dictionary")
-
-    size = meta.get("size")
-    if not size or len(size) != 3:
-        raise ValueError("output.json 'size' must be an array of [width, height, num_layers]")
-
-    # Ensure dimensions are positive integers
-    try:
-        post_width, post_height, num_layers = map(int, size)
-        if not all(d > 0 for d in [post_width, post_height, num_layers]):
-            raise ValueError("Dimensions must be positive integers.")
-    except (ValueError, TypeError) as e:
-        raise ValueError(f"Invalid dimensions in output.json: {size}. {e}") from e
-
-    if not os.path.exists(binfile):
-         raise FileNotFoundError(f"Speed data file not found: {binfile}") # Check file existence here
-
-    try:
-        data = np.fromfile(binfile, dtype=np.float32)
-    except IOError as e:
-        raise IOError(f"Error reading speed data file {binfile}: {e}") from e
-
-    # **Explicitly cast 'data' to float32 to ensure it's the correct type**
-    data = data.astype(np.float32)
-
-    expected_size = post_width * post_height * num_layers
-    if data.size != expected_size:
-        rel_binfile = os.path.relpath(binfile)
-        raise ValueError(
-            f"Data size mismatch in '{rel_binfile}'. "
-            f"Expected {expected_size} values ({post_width}x{post_height}x{num_layers}), "
-            f"but found {data.size}. Check 'size' in output.json or the binary file itself."
-        )
-    data = data.reshape((num_layers, post_height, post_width))
-    
-    # First handle Inf values with np.isinf while the array is still all numeric
-    data = np.where(np.isinf(data), np.nan, data)
-    # Then replace all NaN values with None
-    data = np.where(np.isnan(data), None, data)
-    
-    return data, post_width, post_height, num_layers
-
-
 def precompute_all_data(case_id):
     """Loads all data, performs all calculations, and saves results to cache files."""
     start_time = time.time()
@@ -101,13 +59,9 @@ def precompute_all_data(case_id):
     info_path = os.path.join(base_path, 'info.json')
     cache_base_path = os.path.join(base_path, 'visualization_cache')
     slices_path = os.path.join(cache_base_path, 'slices')
-    profiles_path = os.path.join(cache_base_path, 'profiles')
-    wakes_path = os.path.join(cache_base_path, 'wakes')
 
     # --- 0. 创建缓存目录 ---
     os.makedirs(slices_path, exist_ok=True)
-    os.makedirs(profiles_path, exist_ok=True)
-    os.makedirs(wakes_path, exist_ok=True)
     print(f"Cache directories ensured/created at {cache_base_path}")
 
     try:
@@ -154,10 +108,7 @@ def precompute_all_data(case_id):
         print(f"Speed data loaded. Shape: {data.shape}. Height levels (m): {H_levels_m[0]:.1f} to {H_levels_m[-1]:.1f}")
 
         # --- 3. 创建插值器 ---
-        f_interp = RegularGridInterpolator(
-            (H_levels_m, y_coords_km, x_coords_km), data,
-            bounds_error=False, fill_value=np.nan
-        )
+        f_interp = GridSampler(data, x_coords_km, y_coords_km, H_levels_m, fill_value=np.nan)
         print("Interpolator created.")
 
         # --- 4. 准备并保存元数据 ---
@@ -198,58 +149,28 @@ def precompute_all_data(case_id):
             json.dump(metadata_content, f, default=numpy_to_python, indent=2) # 使用 indent=2 方便查看
         print(f"Metadata saved to {metadata_filepath}")
 
-        # --- 5. 预计算并保存风廓线 ---
+        # --- 5. 预计算并保存风廓线（全部风机一次插值，合并为 profiles.json）---
         print(f"Precomputing profiles for {len(frontend_turbines)} turbines...")
         h_eval_m = np.linspace(float(H_levels_m[0]), float(H_levels_m[-1]), 50)
-        for t_idx, t in enumerate(frontend_turbines):
-            # ... (计算 vp_speed) ...
-            turbine_id = t["id"]
-            tx_km = t["x"]
-            ty_km = t["y"]
-            pts_vp = np.column_stack((h_eval_m, np.full_like(h_eval_m, ty_km), np.full_like(h_eval_m, tx_km)))
-            vp_speed = f_interp(pts_vp)
-            profile_data = {
-                "id": t["id"],
-                "heights": h_eval_m.tolist(), # Convert to Python list directly
-                "speeds": vp_speed.tolist()  # Convert to Python list directly
-            }
-            profile_filepath = os.path.join(profiles_path, f'turbine_{t["id"]}.json')
-            with open(profile_filepath, 'w', encoding='utf-8') as f:
-                json.dump(profile_data, f, default=numpy_to_python) # Use the helper
-            print(f"  Profile {t_idx+1}/{len(frontend_turbines)} saved: {profile_filepath}")
-
-
-        # --- 6. 预计算并保存尾流数据 ---
+        turbine_ids = [t["id"] for t in frontend_turbines]
+        tx_km, ty_km = turbine_xy(frontend_turbines)
+        vp_speed = sample_profiles(f_interp, tx_km, ty_km, h_eval_m)
+        profiles_filepath = os.path.join(cache_base_path, PROFILES_FILE)
+        write_packed(profiles_filepath, {"ids": turbine_ids, "heights": h_eval_m.tolist(),
+                                         "speeds": packed_list(vp_speed)})
+        print(f"  Profiles saved: {profiles_filepath}")
+
+        # --- 6. 预计算并保存尾流数据（全部风机一次插值，合并为 wakes.json）---
         print(f"Precomputing wakes for {len(frontend_turbines)} turbines...")
-        for t_idx, t in enumerate(frontend_turbines):
-             # ... (计算 hp_speed) ...
-            turbine_id = t["id"]
-            tx_km = t["x"]
-            ty_km = t["y"]
-            hub_height_m = t["hubHeight"]
-            rotor_diameter_m = t["rotorDiameter"]
-
-            wake_dist_upstream_km = 5 * rotor_diameter_m * scale_factor
-            wake_dist_downstream_km = 15 * rotor_diameter_m * scale_factor
-            s_vals_km = np.linspace(-wake_dist_upstream_km, wake_dist_downstream_km, 100)
-
-            xp_km = tx_km + s_vals_km * wind_dir_vector[0]
-            yp_km = ty_km + s_vals_km * wind_dir_vector[1]
-
-            sample_height_m = min(hub_height_m, float(H_levels_m[-1]))
-            pts_hp = np.column_stack((np.full_like(s_vals_km, sample_height_m), yp_km, xp_km))
-            hp_speed = f_interp(pts_hp)
-
-            wake_data = {
-                "id": turbine_id,
-                "hubHeightUsed": sample_height_m,
-                "distances": s_vals_km.tolist(), # Convert to Python list directly
-                "speeds": hp_speed.tolist()    # Convert to Python list directly
-            }
-            wake_filepath = os.path.join(wakes_path, f'turbine_{t["id"]}.json')
-            with open(wake_filepath, 'w', encoding='utf-8') as f:
-                json.dump(wake_data, f, default=numpy_to_python) # Use the helper
-            print(f"  Wake {t_idx+1}/{len(frontend_turbines)} saved: {wake_filepath}")
+        rotor_diameter_m = np.array([t["rotorDiameter"] for t in frontend_turbines])
+        hub_height_m = np.array([t["hubHeight"] for t in frontend_turbines])
+        s_vals_km = np.linspace(-5 * rotor_diameter_m * scale_factor, 15 * rotor_diameter_m * scale_factor, 100, axis=1)
+        sample_height_m = np.minimum(hub_height_m, float(H_levels_m[-1]))
+        hp_speed, _ = sample_wakes(f_interp, tx_km, ty_km, sample_height_m, s_vals_km, wind_dir_vector)
+        wakes_filepath = os.path.join(cache_base_path, WAKES_FILE)
+        write_packed(wakes_filepath, {"ids": turbine_ids, "hubHeightUsed": sample_height_m.tolist(),
+                                      "distances": s_vals_km.tolist(), "speeds": packed_list(hp_speed)})
+        print(f"  Wakes saved: {wakes_filepath}")
 
         # --- 7. 预计算并保存速度切片 ---
         total_slices = len(H_levels_m)
@@ -258,16 +179,12 @@ def precompute_all_data(case_id):
             print(f"Processing slice {i+1}/{total_slices} for height {height_m:.1f}m...")
             slice_data = data[i, :, :] # Shape (post_height, post_width)
             
-            # Convert to Python list with proper None handling
-            values_list = []
-            for row in slice_data:
-                row_list = []
-                for v in row:
-                    if v is None:
-                        row_list.append(None)
-                    else:
-                        row_list.append(float(v))
-                values_list.append(row_list)
+            # Convert to Python list with proper None handling (NaN/Inf -> None)
+            finite = np.isfinite(slice_data)
+            values_list = [
+                [float(v) if ok else None for v, ok in zip(row.tolist(), row_ok.tolist())]
+                for row, row_ok in zip(slice_data, finite)
+            ]
                 
             slice_content = {
                 "height": float(height_m),
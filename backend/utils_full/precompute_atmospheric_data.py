@@ -17,11 +17,13 @@
 import os
 import json
 import numpy as np
-from scipy.interpolate import RegularGridInterpolator
 import sys
 import argparse
 import time
 
+from speed_cube import load_speed_data
+from grid_sampler import GridSampler
+
 # ✅ 正确的测量点配置
 MEASUREMENT_POINTS = {
     '平地': 150.0,      
@@ -163,22 +165,6 @@ def simulate_our_algorithm_data(field_data, metodynwt_data, case_id):
     
     return our_data
 
-def load_speed_data(binfile, meta):
-    """加载风速数据"""
-    size = meta.get("size")
-    if not size or len(size) != 3:
-        raise ValueError("output.json 'size' must be an array [width, height, layers]")
-    
-    post_width, post_height, num_layers = map(int, size)
-    data = np.fromfile(binfile, dtype=np.float32)
-    expected_size = post_width * post_height * num_layers
-    if data.size != expected_size:
-        raise ValueError(f"Data size mismatch: expected {expected_size}, got {data.size}")
-    
-    data = data.reshape((num_layers, post_height, post_width))
-    data[np.isinf(data)] = np.nan
-    return data, post_width, post_height, num_layers
-
 def extract_75m_boundary_layer_data(data, radar_pos, wind_angle_deg, domain_size, dh):
     """提取75m边界层测量数据"""
     print("从CFD结果提取75m边界层测量数据...")
@@ -201,10 +187,7 @@ def extract_75m_boundary_layer_data(data, radar_pos, wind_angle_deg, domain_size
         target_height = BOUNDARY_LAYER_HEIGHT
     
     # 创建插值器
-    f_interp = RegularGridInterpolator(
-        (heights, y_coords, x_coords), data,
-        method='linear', bounds_error=False, fill_value=np.nan
-    )
+    f_interp = GridSampler(data, x_coords, y_coords, heights, fill_value=np.nan)
     
     # 测量方向：主导风向
     measurement_azimuth_rad = np.deg2rad(wind_angle_deg)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# utils/precompute_tiles.py
+# ---------------------------------------------------------------
+# 把 speed.bin 的每个高度层切成 256px XYZ 瓦片金字塔，供前端地图按
+# 视野 / 缩放级别只请求可见瓦片：
+#   uploads/<caseId>/visualization_cache/tiles/
+#       tiles.json                     索引（缩放范围、高度、URL 模板）
+#       png/<k>/<z>/<x>/<y>.png        配色后的 RGBA 瓦片（NaN 透明）
+#       f16/<k>/<z>/<x>/<y>.bin        原始 float16 数据瓦片
+# 按 (层, 缩放级) 并行生成；manifest.json 记录输入哈希，重跑只补变化的
+# 瓦片集，--force 全部重建。瓦片布局见 xyz_tiles.py
+# ---------------------------------------------------------------
+
+import os, sys, json, time, argparse, traceback
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from speed_cube import load_speed_data, speed_axes
+from cache_manifest import BuildManifest, digest
+from xyz_tiles import TILE_FORMATS, TILE_SIZE, TileJob, max_zoom, write_index, write_tiles
+
+DEFAULT_CMAP = "jet"   # 与本目录 precompute_visualization 的切片一致
+
+def color_range(meta, data, nx, ny):
+    """与 precompute_visualization 相同：直接使用 output.json range"""
+    vmin, vmax = map(float, meta.get("range", [0, 15]))
+    return vmin, vmax
+
+def precompute_tiles(case_id, formats=("png", "f16"), workers=None, force=False, cmap_name=None,
+                     case_dir=None) -> bool:
+    t0 = time.time()
+    # case_dir 覆盖 uploads/<caseId>（批处理驱动直接处理整理后的工况目录）
+    base_dir = case_dir or os.path.join(os.path.dirname(__file__), "..", "uploads", case_id)
+    tile_dir = os.path.join(base_dir, "visualization_cache", "tiles")
+    os.makedirs(tile_dir, exist_ok=True)
+    manifest = BuildManifest(tile_dir, force=force)
+
+    try:
+        with open(os.path.join(base_dir, "output.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        binfile = meta.get("file", "speed.bin")
+        if not os.path.isabs(binfile):
+            binfile = os.path.join(base_dir, binfile)
+        lt = 10000
+        info_path = os.path.join(base_dir, "info.json")
+        if os.path.exists(info_path):
+            with open(info_path, "r", encoding="utf-8") as f:
+                lt = json.load(f).get("domain", {}).get("lt", 10000)
+
+        data, Nx, Ny, Nz = load_speed_data(binfile, meta)
+        layer_keys = manifest.layer_digests(binfile, data)
+        axes = speed_axes(binfile, meta, float(lt))
+        dx = axes.x[1] - axes.x[0] if Nx > 1 else 0.0
+        dy = axes.y[1] - axes.y[0] if Ny > 1 else 0.0
+        extent_m = [axes.x[0] - dx / 2, axes.x[-1] + dx / 2, axes.y[0] - dy / 2, axes.y[-1] + dy / 2]
+
+        cmap_name = cmap_name or os.getenv("WINDSIM_COLORMAP", DEFAULT_CMAP)
+        try:
+            cmap = plt.get_cmap(cmap_name)
+        except ValueError:
+            print(f"Warning: unknown colormap '{cmap_name}', fallback to '{DEFAULT_CMAP}'.", file=sys.stderr)
+            cmap = plt.get_cmap(DEFAULT_CMAP)
+        vmin, vmax = color_range(meta, data, Nx, Ny)
+        zmax = max_zoom((Ny, Nx))
+        print(f"Speed data ({Nz},{Ny},{Nx}) -> zoom 0..{zmax}, formats {', '.join(formats)}")
+
+        # --------- 找出需要重建的 (层, 缩放级) -----------------------
+        geometry = [Nz, Ny, Nx, zmax, TILE_SIZE]
+        style = [cmap.name, vmin, vmax]
+        keys, units = {}, []
+        for k in range(Nz):
+            for z in range(zmax + 1):
+                stale = []
+                for fmt in formats:
+                    name = f"{fmt}/{k}/{z}"
+                    keys[name] = digest(fmt, layer_keys[k], z, geometry, style if fmt == "png" else None)
+                    if manifest.stale(name, keys[name]):
+                        stale.append(fmt)
+                if stale:
+                    units.append((k, z, tuple(stale)))
+        print(f"{len(units)} of {Nz * (zmax + 1)} tile sets stale.")
+
+        job = TileJob(base_dir, meta, tile_dir, zmax, cmap, vmin, vmax)
+        written = write_tiles(job, units, workers)
+        for k, z, stale in units:
+            for fmt in stale:
+                manifest.record(f"{fmt}/{k}/{z}", keys[f"{fmt}/{k}/{z}"])
+        # 只清理本次生成的格式；其它格式的旧瓦片保留并继续列在索引里
+        for name in manifest.prune(prefixes=tuple(f"{fmt}/" for fmt in formats)):
+            print(f"  - removed stale {name}")
+        available = [fmt for fmt in TILE_FORMATS
+                     if fmt in formats or any(n.startswith(f"{fmt}/") for n in manifest.artifacts)]
+
+        write_index(tile_dir, shape=(Nz, Ny, Nx), heights=axes.heights, zmax=zmax, formats=available,
+                    extent_m=extent_m, cmap_name=cmap.name, vmin=vmin, vmax=vmax)
+        print(f"{sum(written.values())} tiles written in {time.time()-t0:.2f} s.")
+        return True
+
+    except Exception as e:
+        print("Error:", e, file=sys.stderr)
+        traceback.print_exc()
+        return False
+    finally:
+        manifest.save()
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Cut every speed.bin height layer into an XYZ tile pyramid.")
+    p.add_argument("--caseId", required=True, help="case id under uploads/")
+    p.add_argument("--format", choices=["png", "f16", "both"], default="both",
+                   help="png = colormapped tiles, f16 = float16 data tiles (default: both)")
+    p.add_argument("--workers", type=int, default=None,
+                   help="tile processes (default: $PRECOMPUTE_WORKERS, else all CPUs; 1 = serial)")
+    p.add_argument("--cmap", default=None, help=f"PNG colormap (default: $WINDSIM_COLORMAP, else {DEFAULT_CMAP})")
+    p.add_argument("--force", action="store_true", help="rebuild every tile, ignoring tiles/manifest.json")
+    args = p.parse_args()
+
+    fmts = tuple(TILE_FORMATS) if args.format == "both" else (args.format,)
+    ok = precompute_tiles(args.caseId, fmts, args.workers, args.force, args.cmap)
+    sys.exit(0 if ok else 1)
@@ -6,7 +6,6 @@ import json
 import math
 import argparse
 import numpy as np
-from scipy.interpolate import RegularGridInterpolator
 import sys
 import traceback
 import time
@@ -16,7 +15,15 @@ import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 # import io # Potentially useful in the future, but not currently needed
 
-# --- numpy_to_python and load_speed_data remain the same ---
+from speed_cube import load_speed_data
+from grid_sampler import GridSampler
+from turbine_samples import (PROFILES_FILE, WAKES_FILE, packed_list, sample_profiles,
+                             sample_wakes, turbine_xy, write_packed)
+from slice_render import SliceJob, render_slices
+from slice_png import PIL_AVAILABLE, SlicePainter
+from cache_manifest import BuildManifest, digest
+
+# --- numpy_to_python remains the same; load_speed_data lives in speed_cube ---
 def numpy_to_python(obj):
     """Converts numpy types to Python native types for JSON serialization."""
     if isinstance(obj, (np.int_, np.intc, np.intp, np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64)):
@@ -47,62 +54,141 @@ def numpy_to_python(obj):
             print(f"  Failed to convert {type(obj)} to string: {e}", file=sys.stderr)
             return None
 
-def load_speed_data(binfile, meta):
-    """Loads speed data, ensuring correct dimensions."""
-    if not meta or not isinstance(meta, dict):
-        raise ValueError("Invalid metadata: metadata must be a dictionary")
-    size = meta.get("size")
-    if not size or len(size) != 3:
-        raise ValueError("output.json 'size' must be an array [width, height, layers]")
-    try:
-        post_width, post_height, num_layers = map(int, size)
-        if not all(d > 0 for d in [post_width, post_height, num_layers]):
-            raise ValueError("Dimensions must be positive integers.")
-    except (ValueError, TypeError) as e:
-        raise ValueError(f"Invalid dimensions in output.json: {size}. {e}") from e
-    if not os.path.exists(binfile):
-        raise FileNotFoundError(f"Speed data file not found: {binfile}")
-    try:
-        data = np.fromfile(binfile, dtype=np.float32)
-    except IOError as e:
-        raise IOError(f"Error reading speed data file {binfile}: {e}") from e
-
-    data = data.astype(np.float32) # Ensure float32
-    expected_size = post_width * post_height * num_layers
-    if data.size != expected_size:
-        rel_binfile = os.path.relpath(binfile)
-        raise ValueError(
-            f"Data size mismatch in '{rel_binfile}'. "
-            f"Expected {expected_size} values ({post_width}x{post_height}x{num_layers}), "
-            f"but found {data.size}. Check 'size' in output.json or the binary file."
-        )
-    data = data.reshape((num_layers, post_height, post_width))
-    data[np.isinf(data)] = np.nan # Replace Inf with NaN for interpolation/plotting
-    return data, post_width, post_height, num_layers
-
 # --- Removed get_plot_area_pixels function ---
 
-def precompute_all_data(case_id):
-    """Loads all data, performs all calculations, and saves results to cache files."""
+RENDERERS = ("matplotlib", "pillow")
+
+def slice_files(height_m):
+    """PNG / slice_info filenames for one height, i.e. its "heightLevelsInfo" entry."""
+    height_str = f"{height_m:.1f}" # Consistent formatting
+    return {
+         "height": float(height_m),
+         "imageFile": f'slice_height_{height_str}.png', # Store filename for easier lookup
+         "infoFile": f'slice_info_{height_str}.json' # Store filename
+    }
+
+class SliceRenderer:
+    """
+    One reusable slice figure per process, built on the first layer.
+    renderer="matplotlib" (default): each layer swaps the image data and title, then savefig;
+    the PNGs are byte-identical to drawing each layer from scratch.
+    renderer="pillow" (opt-in): the figure only provides the static frame/colorbar; SlicePainter
+    colormaps each layer through a LUT and writes the PNG directly (~10-20 ms per layer). Pixels are
+    sampled nearest-neighbour, so they differ from matplotlib's resampled image.
+    png_layers: layer indices whose PNG is rewritten (None = all); the others only get slice_info.
+    """
+
+    def __init__(self, *, figsize, img_dpi, extent_km, cmap, vmin, vmax, turbines, total_slices,
+                 slices_img_path, slices_info_path, renderer="matplotlib", png_layers=None):
+        self.figsize, self.img_dpi = figsize, img_dpi
+        self.extent_km = extent_km
+        self.cmap = cmap
+        self.vmin, self.vmax = vmin, vmax
+        self.turbines = turbines
+        self.total_slices = total_slices
+        self.slices_img_path = slices_img_path
+        self.slices_info_path = slices_info_path
+        self.renderer = renderer if PIL_AVAILABLE else "matplotlib"
+        self.png_layers = png_layers
+        self.painter = None
+        self.fig = None
+
+    def _build(self, slice_data_np, title):
+        norm = mcolors.Normalize(vmin=self.vmin, vmax=self.vmax)
+        fig, ax = plt.subplots(figsize=self.figsize, dpi=self.img_dpi)
+        fig.subplots_adjust(left=0.12, right=0.90, bottom=0.12, top=0.90)
+        self.im = ax.imshow(slice_data_np, cmap=self.cmap, norm=norm, interpolation='nearest', origin='lower', extent=self.extent_km, aspect='auto')
+        ax.set_xlabel('X (km)'); ax.set_ylabel('Y (km)'); ax.set_title(title)
+        cbar = plt.colorbar(self.im, ax=ax, shrink=0.8, pad=0.03); cbar.set_label('Wind Speed (m/s)')
+
+        # --- Turbine pixel coordinates: the layout is fixed, so they are the same for every slice ---
+        fig.canvas.draw() # IMPORTANT: Ensure layout is finalized BEFORE transforming
+        fig_width_px = fig.get_size_inches()[0] * self.img_dpi
+        fig_height_px = fig.get_size_inches()[1] * self.img_dpi
+        self.image_dims = {"width": int(round(fig_width_px)), "height": int(round(fig_height_px)), "dpi": int(self.img_dpi)}
+        self.turbines_pixels = []
+        if self.renderer == "pillow":
+            self.painter = SlicePainter(fig, ax, self.im) # pixel coords follow analytically from extent + axes box
+        for turbine in self.turbines:
+            tx_km, ty_km = turbine['x'], turbine['y']
+            try:
+                if self.painter is not None:
+                    pixel_x, pixel_y = (float(v) for v in self.painter.pixel_coords(tx_km, ty_km))
+                else:
+                    display_coords = ax.transData.transform((tx_km, ty_km))
+                    pixel_x = display_coords[0]
+                    pixel_y = fig_height_px - display_coords[1] # Invert Y-axis for top-left origin
+                buffer = 10 # Allow markers slightly outside strict bounds
+                if -buffer <= pixel_x <= fig_width_px + buffer and -buffer <= pixel_y <= fig_height_px + buffer:
+                     self.turbines_pixels.append({
+                        "id": turbine['id'], "x": float(round(pixel_x, 2)), "y": float(round(pixel_y, 2))
+                    })
+            except Exception as transform_err:
+                print(f"    Error transforming coords for turbine {turbine['id']}: {transform_err}", file=sys.stderr)
+        self.fig, self.ax = fig, ax
+
+    def render(self, i, height_m, layer):
+        print(f"  Processing slice {i + 1}/{self.total_slices}, height {height_m:.1f}m...")
+        title = f'Wind Speed at {height_m:.1f} m'
+        if self.fig is None:
+            self._build(layer.astype(float), title)
+
+        # --- Save slice info JSON ---
+        entry = slice_files(height_m)
+        slice_info_filename = entry["infoFile"]
+        slice_info_filepath = os.path.join(self.slices_info_path, slice_info_filename)
+        slice_info_data = {
+            "actualHeight": float(height_m),
+            "imageDimensions": self.image_dims,
+            "turbinesPixels": self.turbines_pixels
+        }
+        try:
+            with open(slice_info_filepath, 'w', encoding='utf-8') as f:
+                json.dump(slice_info_data, f, default=numpy_to_python, indent=2)
+        except IOError as io_err: print(f"    Error saving slice info JSON '{slice_info_filepath}': {io_err}", file=sys.stderr)
+
+        # --- Save slice image (includes ground truth markers now) ---
+        image_filepath = os.path.join(self.slices_img_path, entry["imageFile"])
+        if self.png_layers is not None and i not in self.png_layers:
+            return entry # PNG is up to date
+        try:
+            if self.painter is not None:
+                self.painter.save(image_filepath, layer, title, dpi=self.img_dpi)
+            else:
+                self.im.set_data(layer.astype(float)); self.ax.set_title(title)
+                self.fig.savefig(image_filepath, dpi=self.img_dpi, transparent=False, facecolor='white')
+            print(f"    Image with ground truth markers saved: {image_filepath}")
+        except Exception as img_err: print(f"    Error saving image for height {height_m:.1f}m: {img_err}", file=sys.stderr); traceback.print_exc(file=sys.stderr)
+
+        # Info for main metadata (including generated filenames)
+        return entry
+
+    def close(self):
+        if self.fig is not None:
+            plt.close(self.fig) # Close figure
+            self.fig = None
+
+def precompute_all_data(case_id, workers=None, renderer="matplotlib", force=False, case_dir=None):
+    """
+    Loads all data, performs all calculations, and saves results to cache files.
+    case_dir overrides uploads/<case_id> (batch_precompute.py runs on post_processing/data/<n>).
+    """
     start_time = time.time()
     print(f"Starting precomputation for case: {case_id}")
 
     # --- Paths ---
-    base_path = os.path.join(os.path.dirname(__file__), '..', 'uploads', case_id)
+    base_path = case_dir or os.path.join(os.path.dirname(__file__), '..', 'uploads', case_id)
     meta_path = os.path.join(base_path, 'output.json')
     info_path = os.path.join(base_path, 'info.json')
     cache_base_path = os.path.join(base_path, 'visualization_cache')
-    profiles_path = os.path.join(cache_base_path, 'profiles')
-    wakes_path = os.path.join(cache_base_path, 'wakes')
     slices_img_path = os.path.join(cache_base_path, 'slices_img')
     slices_info_path = os.path.join(cache_base_path, 'slices_info') # Directory for per-slice info JSONs
 
     # --- 0. Create cache directories ---
-    os.makedirs(profiles_path, exist_ok=True)
-    os.makedirs(wakes_path, exist_ok=True)
     os.makedirs(slices_img_path, exist_ok=True)
     os.makedirs(slices_info_path, exist_ok=True)
     print(f"Cache directories ensured/created at {cache_base_path}")
+    manifest = BuildManifest(cache_base_path, force=force) # inputs of every artifact, for incremental rebuilds
 
     try:
         # --- 1. Load metadata and case info ---
@@ -139,12 +225,10 @@ def precompute_all_data(case_id):
         dh = float(meta.get("dh", 10))
         H_levels_m = np.arange(1, num_layers + 1) * dh
         print(f"Speed data loaded. Shape: {data.shape}. Height levels (m): {H_levels_m[0]:.1f} to {H_levels_m[-1]:.1f}")
+        layer_keys = manifest.layer_digests(binfile, data) # per-layer content hashes, reused while speed.bin is unchanged
 
         # --- 3. Create interpolator ---
-        f_interp = RegularGridInterpolator(
-            (H_levels_m, y_coords_km, x_coords_km), data,
-            method='linear', bounds_error=False, fill_value=np.nan
-        )
+        f_interp = GridSampler(data, x_coords_km, y_coords_km, H_levels_m, fill_value=np.nan)
         print("Interpolator created.")
 
         # --- 4. Prepare metadata (wind direction, turbines in km) ---
@@ -164,39 +248,41 @@ def precompute_all_data(case_id):
                 else: print(f"Warning: Turbine {t.get('id', i+1)} missing coords, skipped.", file=sys.stderr)
         else: print("Warning: No turbine info found.")
 
-        # --- 5. Precompute and save wind profiles ---
-        print(f"Precomputing wind profiles for {len(frontend_turbines)} turbines...")
+        # --- Inputs each artifact depends on (see cache_manifest) ---
+        grid_key = {"shape": list(data.shape), "domainKm": domain_size_km, "dh": dh}
+        turbine_pos = [[t["id"], t["x"], t["y"]] for t in frontend_turbines]
+        turbine_geom = [[t["id"], t["x"], t["y"], t["hubHeight"], t["rotorDiameter"]] for t in frontend_turbines]
+        profiles_key = digest("profiles", layer_keys, grid_key, turbine_pos)
+        wakes_key = digest("wakes", layer_keys, grid_key, turbine_geom, float(wind_angle), float(scale_factor))
+
+        # --- 5. Precompute and save wind profiles (all turbines in one interpolator call) ---
         h_eval_m = np.linspace(float(H_levels_m[0]), float(H_levels_m[-1]), 50)
-        for t_idx, t in enumerate(frontend_turbines):
-            turbine_id = t["id"]; tx_km = t["x"]; ty_km = t["y"]
-            pts_vp = np.column_stack((h_eval_m, np.full_like(h_eval_m, ty_km), np.full_like(h_eval_m, tx_km)))
-            vp_speed = f_interp(pts_vp)
-            # Directly save the structure expected by the frontend/backend API
-            profile_data = {"id": turbine_id, "heights": h_eval_m.tolist(), "speeds": vp_speed.tolist()}
-            profile_filepath = os.path.join(profiles_path, f'turbine_{turbine_id}.json')
-            with open(profile_filepath, 'w', encoding='utf-8') as f:
-                json.dump(profile_data, f, default=numpy_to_python, indent=2)
-        print("Wind profile precomputation complete.")
-
-        # --- 6. Precompute and save wake data ---
-        print(f"Precomputing wake data for {len(frontend_turbines)} turbines...")
-        for t_idx, t in enumerate(frontend_turbines):
-            turbine_id = t["id"]; tx_km = t["x"]; ty_km = t["y"]
-            hub_height_m = t["hubHeight"]; rotor_diameter_m = t["rotorDiameter"]
-            wake_dist_upstream_km = 2 * rotor_diameter_m * scale_factor
-            wake_dist_downstream_km = 10 * rotor_diameter_m * scale_factor
-            s_vals_km = np.linspace(-wake_dist_upstream_km, wake_dist_downstream_km, 100)
-            xp_km = tx_km + s_vals_km * wind_dir_vector[0]
-            yp_km = ty_km + s_vals_km * wind_dir_vector[1]
-            sample_height_m = max(H_levels_m[0], min(hub_height_m, H_levels_m[-1])) # Clamp height
-            pts_hp = np.column_stack((np.full_like(s_vals_km, sample_height_m), yp_km, xp_km))
-            hp_speed = f_interp(pts_hp)
-            # Directly save the structure expected by the frontend/backend API
-            wake_data = {"id": turbine_id, "hubHeightUsed": float(sample_height_m), "distances": s_vals_km.tolist(), "speeds": hp_speed.tolist()}
-            wake_filepath = os.path.join(wakes_path, f'turbine_{turbine_id}.json')
-            with open(wake_filepath, 'w', encoding='utf-8') as f:
-                json.dump(wake_data, f, default=numpy_to_python, indent=2)
-        print("Wake precomputation complete.")
+        turbine_ids = [t["id"] for t in frontend_turbines]
+        tx_km, ty_km = turbine_xy(frontend_turbines)
+        if manifest.stale(PROFILES_FILE, profiles_key):
+            print(f"Precomputing wind profiles for {len(frontend_turbines)} turbines...")
+            vp_speed = sample_profiles(f_interp, tx_km, ty_km, h_eval_m)
+            # One packed file per case; the backend API slices out a single turbine
+            write_packed(os.path.join(cache_base_path, PROFILES_FILE),
+                         {"ids": turbine_ids, "heights": h_eval_m.tolist(), "speeds": packed_list(vp_speed)})
+            manifest.record(PROFILES_FILE, profiles_key)
+            print("Wind profile precomputation complete.")
+        else: print("Wind profiles up to date.")
+
+        # --- 6. Precompute and save wake data (all turbines in one interpolator call) ---
+        rotor_diameter_m = np.array([t["rotorDiameter"] for t in frontend_turbines])
+        hub_height_m = np.array([t["hubHeight"] for t in frontend_turbines])
+        s_vals_km = np.linspace(-2 * rotor_diameter_m * scale_factor, 10 * rotor_diameter_m * scale_factor, 100, axis=1)
+        sample_height_m = np.maximum(H_levels_m[0], np.minimum(hub_height_m, H_levels_m[-1])) # Clamp height
+        if manifest.stale(WAKES_FILE, wakes_key):
+            print(f"Precomputing wake data for {len(frontend_turbines)} turbines...")
+            hp_speed, _ = sample_wakes(f_interp, tx_km, ty_km, sample_height_m, s_vals_km, wind_dir_vector)
+            write_packed(os.path.join(cache_base_path, WAKES_FILE),
+                         {"ids": turbine_ids, "hubHeightUsed": sample_height_m.tolist(),
+                          "distances": s_vals_km.tolist(), "speeds": packed_list(hp_speed)})
+            manifest.record(WAKES_FILE, wakes_key)
+            print("Wake precomputation complete.")
+        else: print("Wake data up to date.")
 
         # --- 7. Precompute velocity slices: Save images (WITH GROUND TRUTH MARKERS) AND calculate turbine pixel coords ---
         total_slices = len(H_levels_m)
@@ -204,7 +290,6 @@ def precompute_all_data(case_id):
         vmin = float(meta.get("range", [0, 15])[0])
         vmax = float(meta.get("range", [0, 15])[1])
         cmap = plt.get_cmap('jet')
-        norm = mcolors.Normalize(vmin=vmin, vmax=vmax)
         img_width_pixels = 800; img_dpi = 100
         domain_width_km = extent_km[1] - extent_km[0]
         domain_height_km = extent_km[3] - extent_km[2]
@@ -212,69 +297,30 @@ def precompute_all_data(case_id):
         img_height_pixels = max(1, int(img_width_pixels * aspect_ratio))
         figsize = (img_width_pixels / img_dpi, img_height_pixels / img_dpi)
 
-        all_heights_info = [] # To store info for main metadata
-
-        for i, height_m in enumerate(H_levels_m):
-            print(f"  Processing slice {i + 1}/{total_slices}, height {height_m:.1f}m...")
-            slice_data_np = data[i, :, :].copy().astype(float)
-
-            fig, ax = plt.subplots(figsize=figsize, dpi=img_dpi)
-            fig.subplots_adjust(left=0.12, right=0.90, bottom=0.12, top=0.90)
-            im = ax.imshow(slice_data_np, cmap=cmap, norm=norm, interpolation='nearest', origin='lower', extent=extent_km, aspect='auto')
-            ax.set_xlabel('X (km)'); ax.set_ylabel('Y (km)'); ax.set_title(f'Wind Speed at {height_m:.1f} m')
-            cbar = plt.colorbar(im, ax=ax, shrink=0.8, pad=0.03); cbar.set_label('Wind Speed (m/s)')
-
-
-            # --- Calculate turbine pixel coordinates for THIS slice image ---
-            fig.canvas.draw() # IMPORTANT: Ensure layout is finalized BEFORE transforming
-            fig_width_px = fig.get_size_inches()[0] * img_dpi
-            fig_height_px = fig.get_size_inches()[1] * img_dpi
-            image_dims = {"width": int(round(fig_width_px)), "height": int(round(fig_height_px)), "dpi": int(img_dpi)}
-            slice_turbines_pixels = []
-            for turbine in frontend_turbines:
-                tx_km, ty_km = turbine['x'], turbine['y']
-                try:
-                    display_coords = ax.transData.transform((tx_km, ty_km))
-                    pixel_x = display_coords[0]
-                    pixel_y = fig_height_px - display_coords[1] # Invert Y-axis for top-left origin
-                    buffer = 10 # Allow markers slightly outside strict bounds
-                    if -buffer <= pixel_x <= fig_width_px + buffer and -buffer <= pixel_y <= fig_height_px + buffer:
-                         slice_turbines_pixels.append({
-                            "id": turbine['id'], "x": float(round(pixel_x, 2)), "y": float(round(pixel_y, 2))
-                        })
-                except Exception as transform_err:
-                    print(f"    Error transforming coords for turbine {turbine['id']} on slice {height_m:.1f}m: {transform_err}", file=sys.stderr)
-
-            # --- Save slice info JSON ---
-            height_str = f"{height_m:.1f}" # Consistent formatting
-            slice_info_filename = f'slice_info_{height_str}.json'
-            slice_info_filepath = os.path.join(slices_info_path, slice_info_filename)
-            slice_info_data = {
-                "actualHeight": float(height_m),
-                "imageDimensions": image_dims,
-                "turbinesPixels": slice_turbines_pixels
-            }
-            try:
-                with open(slice_info_filepath, 'w', encoding='utf-8') as f:
-                    json.dump(slice_info_data, f, default=numpy_to_python, indent=2)
-            except IOError as io_err: print(f"    Error saving slice info JSON '{slice_info_filepath}': {io_err}", file=sys.stderr)
-
-            # --- Save slice image (includes ground truth markers now) ---
-            image_filename = f'slice_height_{height_str}.png'
-            image_filepath = os.path.join(slices_img_path, image_filename)
-            try:
-                fig.savefig(image_filepath, dpi=img_dpi, transparent=False, facecolor='white')
-                print(f"    Image with ground truth markers saved: {image_filepath}")
-            except Exception as img_err: print(f"    Error saving image for height {height_m:.1f}m: {img_err}", file=sys.stderr); traceback.print_exc(file=sys.stderr)
-
-            plt.close(fig) # Close figure
+        # A PNG depends on its layer and the colormap/figure; slice_info only on the figure and turbine positions
+        png_style = [cmap.name, vmin, vmax, list(figsize), img_dpi, extent_km, renderer]
+        info_style = [list(figsize), img_dpi, extent_km, turbine_pos]
+        all_heights_info = [slice_files(h) for h in H_levels_m] # To store info for main metadata
+        png_keys, info_keys, png_layers, info_layers = [], [], set(), set()
+        for k, (h, entry) in enumerate(zip(H_levels_m, all_heights_info)):
+            png_keys.append(digest("png", layer_keys[k], float(h), png_style))
+            info_keys.append(digest("info", float(h), info_style))
+            if manifest.stale(f"slices_img/{entry['imageFile']}", png_keys[k]): png_layers.add(k)
+            if manifest.stale(f"slices_info/{entry['infoFile']}", info_keys[k]): info_layers.add(k)
+        todo = png_layers | info_layers
+        print(f"{len(png_layers)} slice images and {len(info_layers)} slice info files of {total_slices} are stale.")
 
-            # Add info for main metadata (including generated filenames)
-            all_heights_info.append({
-                 "height": float(height_m),
-                 "imageFile": image_filename, # Store filename for easier lookup
-                 "infoFile": slice_info_filename # Store filename
-            })
+        job = SliceJob(binfile, meta, SliceRenderer, dict(
+            figsize=figsize, img_dpi=img_dpi, extent_km=extent_km, cmap=cmap, vmin=vmin, vmax=vmax,
+            turbines=frontend_turbines, total_slices=total_slices,
+            slices_img_path=slices_img_path, slices_info_path=slices_info_path, renderer=renderer,
+            png_layers=frozenset(png_layers)))
+        render_slices(job, H_levels_m, workers, layers=todo)
+        for k in sorted(todo):
+            entry = all_heights_info[k]
+            manifest.record(f"slices_info/{entry['infoFile']}", info_keys[k])
+            if k in png_layers: manifest.record(f"slices_img/{entry['imageFile']}", png_keys[k])
+        for name in manifest.prune(): print(f"  Removed stale {name}")
 
         print("Slice images and turbine pixel info precomputation complete.")
 
@@ -305,11 +351,19 @@ def precompute_all_data(case_id):
     except FileNotFoundError as e: print(f"File Error: {e}", file=sys.stderr); traceback.print_exc(file=sys.stderr); return False
     except ValueError as e: print(f"Data Error: {e}", file=sys.stderr); traceback.print_exc(file=sys.stderr); return False
     except Exception as e: print(f"An unexpected error occurred: {e}", file=sys.stderr); print(traceback.format_exc(), file=sys.stderr); return False
+    finally: manifest.save() # Keep what was built; the next run only fills in the rest
 
 # --- Main entry point ---
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Precompute visualization data for a case study.")
     parser.add_argument("--caseId", required=True, help="The Case ID")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Slice rendering processes (default: $PRECOMPUTE_WORKERS, else all CPUs; 1 = serial)")
+    parser.add_argument("--renderer", choices=RENDERERS, default=os.getenv("PRECOMPUTE_RENDERER", "matplotlib"),
+                        help="Slice PNG renderer (default: $PRECOMPUTE_RENDERER, else matplotlib; "
+                             "pillow is faster but its nearest-neighbour pixels differ)")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild every artifact, ignoring visualization_cache/manifest.json")
     args = parser.parse_args()
-    success = precompute_all_data(args.caseId)
+    success = precompute_all_data(args.caseId, args.workers, args.renderer, args.force)
     sys.exit(0 if success else 1)
\ No newline at end of file
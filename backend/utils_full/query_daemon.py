@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# backend/utils/query_daemon.py
+"""
+常驻的单点风速查询服务：stdin 逐行读入 JSON 请求，stdout 逐行写出 JSON 响应。
+
+由 routes/cases.js 启动并复用，避免每次点击都重新启动 Python、导入
+numpy 并重建插值器。每个 caseId 的插值器（基于只读内存映射的
+speed.bin）保存在 LRU 中，speed.bin / output.json / info.json 的
+mtime 或大小变化时自动失效。
+
+请求:  {"id": 1, "caseId": "abc", "points": [[x, y, z], ...]}
+       {"id": 2, "caseId": "abc", "x": 0, "y": 0, "z": 100}
+       折线 / 竖直廓线请求见 query_speed.build_query，响应为 json_payload 格式
+       {"id": 3, "op": "ping"} | {"id": 4, "op": "stats"}
+响应:  {"id": 1, "success": true, "results": [{"success": true, "speed": 7.2}, ...]}
+       {"id": 1, "success": false, "error": "..."}
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError as e:
+    print(json.dumps({"success": False, "error": f"Missing required Python package: {e}. Please ensure numpy is installed in your conda environment."}), flush=True)
+    sys.exit(1)
+
+import query_speed
+from query_speed import QueryError, case_stamp, json_payload, load_interpolator, point_results, query_case
+
+DEFAULT_CACHE_SIZE = int(os.environ.get("QUERY_DAEMON_CACHE", "8"))
+
+
+class CaseCache:
+    """caseId -> (stamp, interpolator) 的 LRU，stamp 变化时重建"""
+
+    def __init__(self, uploads_dir, max_cases=DEFAULT_CACHE_SIZE):
+        self.uploads_dir = uploads_dir
+        self.max_cases = max(1, int(max_cases))
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, case_id):
+        stamp = case_stamp(case_id, self.uploads_dir)
+        entry = self.entries.get(case_id)
+        if entry is not None and entry[0] == stamp:
+            self.entries.move_to_end(case_id)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        self.entries.pop(case_id, None)
+        interpolator = load_interpolator(case_id, self.uploads_dir)
+        self.entries[case_id] = (stamp, interpolator)
+        while len(self.entries) > self.max_cases:
+            self.entries.popitem(last=False)
+        return interpolator
+
+
+def handle(request, cache, stats):
+    op = request.get("op", "query")
+    if op == "ping":
+        return {"success": True, "pid": os.getpid()}
+    if op == "stats":
+        return {"success": True, "cases": list(cache.entries), "hits": cache.hits,
+                "misses": cache.misses, **stats}
+    if op != "query":
+        raise QueryError(f"Unknown op: {op!r}")
+
+    interpolator = cache.get(str(request.get("caseId", "")))
+    kind, points, speeds, extra = query_case(None, request, interpolator=interpolator)
+    stats["points"] += len(points)
+    if kind == "points":
+        return {"success": True, "results": point_results(speeds)}
+    return json_payload(kind, points, speeds, extra)
+
+
+def serve(stdin, stdout, cache):
+    stats = {"requests": 0, "points": 0, "started": time.time()}
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise QueryError("Request must be a JSON object")
+            request_id = request.get("id")
+            stats["requests"] += 1
+            response = handle(request, cache, stats)
+        except Exception as e:
+            response = {"success": False, "error": str(e)}
+        response["id"] = request_id
+        stdout.write(json.dumps(response) + "\n")
+        stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve point wind-speed queries as JSON lines over stdin/stdout.")
+    parser.add_argument("--uploads", default=query_speed.UPLOADS_DIR, help="Directory containing the case folders")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="Number of cases kept open")
+    args = parser.parse_args()
+
+    serve(sys.stdin, sys.stdout, CaseCache(args.uploads, args.cache_size))
+
+
+if __name__ == "__main__":
+    main()
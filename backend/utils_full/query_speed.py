@@ -8,85 +8,248 @@ import argparse
 
 try:
     import numpy as np
-    from scipy.interpolate import RegularGridInterpolator
 except ImportError as e:
-    print(json.dumps({"success": False, "error": f"Missing required Python package: {e}. Please ensure numpy and scipy are installed in your conda environment."}))
+    print(json.dumps({"success": False, "error": f"Missing required Python package: {e}. Please ensure numpy is installed in your conda environment."}))
     sys.exit(1)
 
-def get_speed_at_point(case_id, x_query, y_query, z_query):
+from grid_sampler import GridSampler
+from speed_cube import file_key, load_speed_data, speed_axes
+
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "uploads")
+
+
+class QueryError(Exception):
+    """算例级错误（文件缺失、元数据无效等），以 {"success": False, "error": ...} 返回"""
+
+
+def case_paths(case_id, uploads_dir=UPLOADS_DIR):
+    """返回 (output.json, speed.bin, info.json) 的路径"""
+    if not case_id or os.path.basename(case_id) != case_id or case_id in (".", ".."):
+        raise QueryError(f"Invalid caseId: {case_id!r}")
+    base_dir = os.path.join(uploads_dir, case_id)
+    return (os.path.join(base_dir, "output.json"),
+            os.path.join(base_dir, "speed.bin"),
+            os.path.join(base_dir, "info.json"))
+
+
+def case_stamp(case_id, uploads_dir=UPLOADS_DIR):
+    """三个输入文件的 (路径, mtime_ns, size)，任一变化即视为算例已更新"""
+    return tuple(file_key(p) if os.path.exists(p) else None for p in case_paths(case_id, uploads_dir))
+
+
+def load_interpolator(case_id, uploads_dir=UPLOADS_DIR):
+    """基于只读内存映射的 speed.bin 构建 (z, y, x) 三线性采样器（grid_sampler.GridSampler）"""
+    meta_path, bin_path, info_path = case_paths(case_id, uploads_dir)
+    if not os.path.exists(meta_path) or not os.path.exists(bin_path):
+        raise QueryError("Data files (output.json/speed.bin) not found.")
+
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    size = meta.get("size")
+    if not size or len(size) != 3:
+        raise QueryError("Invalid 'size' in metadata.")
+
+    lt = 10000
+    if os.path.exists(info_path):
+        with open(info_path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        lt = info.get("domain", {}).get("lt", lt)
+
+    # 只读内存映射，插值只触及查询点周围的 8 个格点
     try:
-        base_dir = os.path.join(os.path.dirname(__file__), "..", "uploads", case_id)
-        meta_path = os.path.join(base_dir, "output.json")
-        bin_path = os.path.join(base_dir, "speed.bin")
-
-        if not os.path.exists(meta_path) or not os.path.exists(bin_path):
-            return {"success": False, "error": "Data files (output.json/speed.bin) not found."}
-
-        with open(meta_path, "r", encoding="utf-8") as f:
-            meta = json.load(f)
-        
-        size = meta.get("size")
-        if not size or len(size) != 3:
-            return {"success": False, "error": "Invalid 'size' in metadata."}
-        
-        Nx, Ny, Nz = map(int, size)
-        dh = float(meta.get("dh", 10))
-        
-        lt = 10000
-        info_path = os.path.join(base_dir, "info.json")
-        if os.path.exists(info_path):
-            with open(info_path, "r", encoding="utf-8") as f:
-                info = json.load(f)
-            lt = info.get("domain", {}).get("lt", lt)
-
-        expected_elements = Nx * Ny * Nz
-        data = np.fromfile(bin_path, dtype=np.float32)
-        if data.size != expected_elements:
-            return {"success": False, "error": f"Binary data size mismatch. Expected {expected_elements}, got {data.size}."}
-        
-        data = data.reshape((Nz, Ny, Nx))
-
-        domain_size_m = float(lt)
-        x_coords = np.linspace(-domain_size_m / 2, domain_size_m / 2, Nx)
-        y_coords = np.linspace(-domain_size_m / 2, domain_size_m / 2, Ny)
-        H_levels = np.arange(1, Nz + 1) * dh
-
-        interpolator = RegularGridInterpolator(
-            (H_levels, y_coords, x_coords),
-            data,
-            method="linear",
-            bounds_error=False,
-            fill_value=np.nan
-        )
-
-        point = (z_query, y_query, x_query)
-        
-        # --- FIX: Robustly handle interpolator output ---
-        interpolated_value = interpolator(point)
-
-        # np.isnan() works correctly on both 0-dim and 1-dim arrays
-        if np.isnan(interpolated_value):
-            return {"success": True, "speed": None, "message": "Point is outside the computation domain."}
+        data, Nx, Ny, Nz = load_speed_data(bin_path, meta)
+    except ValueError as e:
+        raise QueryError(str(e))
+    axes = speed_axes(bin_path, meta, float(lt))
+
+    return GridSampler.from_axes(data, axes, fill_value=np.nan)
+
+
+def point_results(values):
+    """插值结果 -> 每点一个 {"success", "speed"[, "message"]}，域外点 speed 为 None"""
+    results = []
+    for value in np.asarray(values, dtype=np.float64).ravel().tolist():
+        if np.isnan(value):
+            results.append({"success": True, "speed": None, "message": "Point is outside the computation domain."})
         else:
-            # Use .item() to safely extract the scalar value
-            speed = float(interpolated_value.item())
-            return {"success": True, "speed": speed}
+            results.append({"success": True, "speed": value})
+    return results
+
+
+def _float_array(value, name, ndim):
+    try:
+        arr = np.asarray(value, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise QueryError(f"'{name}' must be numeric")
+    if arr.ndim != ndim:
+        raise QueryError(f"'{name}' must be a {ndim}-D array")
+    return arr
+
+
+def polyline_points(vertices, spacing, height=None):
+    """
+    沿折线按 spacing（米）等距采样，首尾顶点必定包含
+    vertices: [[x, y], ...] 配合 height，或 [[x, y, z], ...]（z 沿线段线性变化）
+    返回 (N, 3) 采样点和各点沿线距离
+    """
+    vertices = _float_array(vertices, "polyline", 2)
+    if len(vertices) < 2 or vertices.shape[1] not in (2, 3):
+        raise QueryError("'polyline' needs at least two [x, y] or [x, y, z] vertices")
+    if vertices.shape[1] == 2:
+        if height is None:
+            raise QueryError("'height' is required for [x, y] polyline vertices")
+        vertices = np.column_stack([vertices, np.full(len(vertices), float(height))])
+    spacing = float(spacing)
+    if not spacing > 0:
+        raise QueryError("'spacing' must be positive")
+
+    seg = np.hypot(*np.diff(vertices[:, :2], axis=0).T)
+    cum = np.concatenate([[0.0], np.cumsum(seg)])
+    distance = np.arange(0.0, cum[-1], spacing) if cum[-1] > 0 else np.zeros(1)
+    distance = np.append(distance, cum[-1]) if cum[-1] - distance[-1] > 1e-9 * max(spacing, 1.0) else distance
+    points = np.column_stack([np.interp(distance, cum, vertices[:, k]) for k in range(3)])
+    return points, distance
 
+
+def column_points(x, y, heights):
+    """(x, y) 处的竖直廓线，heights 为离地高度列表"""
+    heights = _float_array(heights, "heights", 1)
+    return np.column_stack([np.full(len(heights), float(x)), np.full(len(heights), float(y)), heights])
+
+
+def build_query(request, default_heights=None):
+    """
+    将请求解析为 (kind, (N, 3) 点数组, 附加输出)
+    z 一律为离地高度：postFoam 按地形跟随面取层，speed.bin 的第 k 层即离地 heights[k] 米
+      {"points": [[x, y, z], ...]}
+      {"x": .., "y": .., "z": ..}
+      {"polyline": [[x, y], ...], "spacing": 50, "height": 100}
+      {"column": [x, y], "heights": [10, 20, ...]}   heights 缺省为全部层高
+    """
+    if "points" in request:
+        points = _float_array(request["points"], "points", 2)
+        if points.shape[1:] != (3,):
+            raise QueryError("'points' must be a list of [x, y, z]")
+        return "points", points, {}
+    if "polyline" in request:
+        points, distance = polyline_points(request["polyline"], request.get("spacing", 10.0), request.get("height"))
+        return "polyline", points, {"distance": distance}
+    if "column" in request:
+        xy = _float_array(request["column"], "column", 1)
+        if xy.shape != (2,):
+            raise QueryError("'column' must be [x, y]")
+        heights = request.get("heights", default_heights)
+        if heights is None:
+            raise QueryError("'heights' is required for a column query")
+        points = column_points(xy[0], xy[1], heights)
+        return "column", points, {"heights": points[:, 2]}
+    try:
+        return "points", np.array([[request["x"], request["y"], request["z"]]], dtype=np.float64), {}
+    except KeyError as e:
+        raise QueryError(f"Missing coordinate {e}")
+
+
+def interpolate_points(interpolator, points):
+    """(N, 3) 的 (x, y, z) -> N 个风速（float64，域外为 NaN），一次向量化插值"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    if len(points) == 0:
+        return np.empty(0)
+    return interpolator(points[:, ::-1])
+
+
+def query_case(case_id, request, uploads_dir=UPLOADS_DIR, interpolator=None):
+    """解析请求并插值，返回 (kind, 点数组, 风速数组, 附加输出)"""
+    if interpolator is None:
+        interpolator = load_interpolator(case_id, uploads_dir)
+    kind, points, extra = build_query(request, default_heights=interpolator.grid[0])
+    return kind, points, interpolate_points(interpolator, points), extra
+
+
+def json_payload(kind, points, speeds, extra):
+    """批量结果的 JSON 形式；域外点为 null"""
+    payload = {"success": True, "kind": kind, "count": int(len(speeds)),
+               "speeds": [None if np.isnan(v) else v for v in speeds.tolist()]}
+    if kind != "points":
+        payload["points"] = points.tolist()
+    payload.update({k: np.asarray(v).tolist() for k, v in extra.items()})
+    return payload
+
+
+def write_binary(stream, kind, points, speeds, extra):
+    """
+    一行 JSON 头后紧跟小端 float32 数组（按头中 "arrays" 的顺序，各 count 个值；
+    "points" 为 count x 3）。域外点为 NaN
+    """
+    arrays = {"speeds": speeds}
+    if kind != "points":
+        arrays["points"] = points
+    arrays.update(extra)
+    header = {"success": True, "kind": kind, "count": int(len(speeds)), "dtype": "<f4",
+              "arrays": [[name, list(np.shape(arr))] for name, arr in arrays.items()]}
+    stream.write(json.dumps(header).encode("utf-8") + b"\n")
+    for arr in arrays.values():
+        stream.write(np.ascontiguousarray(arr, dtype="<f4").tobytes())
+    stream.flush()
+
+
+def get_speed_at_point(case_id, x_query, y_query, z_query):
+    try:
+        interpolator = load_interpolator(case_id)
+        return point_results(interpolate_points(interpolator, [(x_query, y_query, z_query)]))[0]
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+def read_request(args):
+    """--request (JSON 文件或 - 表示 stdin)、--points-bin (float32 x,y,z 三元组) 或单点参数"""
+    if args.request is not None:
+        if args.request == "-":
+            return json.load(sys.stdin)
+        with open(args.request, "r", encoding="utf-8") as f:
+            return json.load(f)
+    if args.points_bin is not None:
+        stream = sys.stdin.buffer if args.points_bin == "-" else open(args.points_bin, "rb")
+        with stream:
+            raw = np.frombuffer(stream.read(), dtype="<f4")
+        if raw.size % 3:
+            raise QueryError("--points-bin must contain float32 (x, y, z) triples")
+        return {"points": raw.reshape(-1, 3)}
+    if None in (args.x, args.y, args.z):
+        raise QueryError("Either --x/--y/--z, --request or --points-bin is required")
+    return None
+
+
 def main():
     """主执行函数，包含参数解析和错误捕获。"""
-    parser = argparse.ArgumentParser(description="Query wind speed at a specific point.")
+    parser = argparse.ArgumentParser(description="Query wind speed at points, along polylines or vertical columns.")
     parser.add_argument("--caseId", required=True, help="Case ID")
-    parser.add_argument("--x", required=True, type=float, help="X coordinate")
-    parser.add_argument("--y", required=True, type=float, help="Y coordinate")
-    parser.add_argument("--z", required=True, type=float, help="Z coordinate (height)")
+    parser.add_argument("--x", type=float, help="X coordinate")
+    parser.add_argument("--y", type=float, help="Y coordinate")
+    parser.add_argument("--z", type=float, help="Z coordinate (height above ground)")
+    parser.add_argument("--request", help="JSON request file (points/polyline/column), '-' for stdin")
+    parser.add_argument("--points-bin", help="Raw float32 (x, y, z) triples, '-' for stdin")
+    parser.add_argument("--format", choices=["json", "binary"], default="json",
+                        help="Output format for batched requests")
     args = parser.parse_args()
 
-    result = get_speed_at_point(args.caseId, args.x, args.y, args.z)
-    
-    print(json.dumps(result))
+    try:
+        request = read_request(args)
+    except Exception as e:
+        print(json.dumps({"success": False, "error": str(e)}))
+        return
+    if request is None:
+        print(json.dumps(get_speed_at_point(args.caseId, args.x, args.y, args.z)))
+        return
+
+    try:
+        result = query_case(args.caseId, request)
+    except Exception as e:
+        print(json.dumps({"success": False, "error": str(e)}))
+        return
+    if args.format == "binary":
+        write_binary(sys.stdout.buffer, *result)
+    else:
+        print(json.dumps(json_payload(*result)))
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Direct colormap -> PNG painter for the slice images of precompute_visualization.
+
+A slice PNG is a colormapped layer inside a fixed frame (axes, ticks, labels,
+colorbar) plus a per-layer title. SlicePainter takes the frame from a
+matplotlib figure ONCE: the figure is drawn with the image hidden, the title
+blank and transparent figure/axes faces, and the RGBA buffer is kept as a
+static overlay. Per layer it then only
+
+  * maps the layer through the colormap's 8-bit LUT (norm, under/over/bad
+    colours included) with a precomputed nearest-neighbour pixel -> cell index,
+  * pastes it into the axes box of the pre-composited background and blends
+    back the few overlay pixels that fall inside the box (spines),
+  * draws the title with Pillow in the figure's title font, and
+  * writes the PNG straight from the RGB buffer (unfiltered rows, zlib level 1).
+
+Turbine pixel positions follow analytically from the data extent and the axes
+box (top-left origin), with no transData round trip.
+
+Pixels differ slightly from imshow's resampling (nearest-neighbour instead of
+matplotlib's antialiasing filter); the frame, layout and pixel mapping are
+the same. Pillow is optional: callers should check PIL_AVAILABLE and fall
+back to savefig.
+"""
+
+from __future__ import annotations
+
+import struct
+import zlib
+
+import numpy as np
+from matplotlib import colors as mcolors
+from matplotlib import font_manager
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+    PIL_AVAILABLE = True
+except ImportError:  # rendering falls back to matplotlib
+    PIL_AVAILABLE = False
+
+# zlib level: 1 is several times faster than the default 6 for somewhat larger files.
+PNG_COMPRESS_LEVEL = 1
+
+
+def _rgb(color, background) -> np.ndarray:
+    """RGBA (0..1) composited over an RGB background, as uint8."""
+    r, g, b, a = mcolors.to_rgba(color)
+    bg = np.asarray(background[:3], dtype=np.float64)
+    return np.round((np.array([r, g, b]) * a + bg * (1 - a)) * 255).astype(np.uint8)
+
+
+def _lut_colors(cmap) -> list:
+    return [cmap.get_under(), *cmap(np.arange(cmap.N)), cmap.get_over(), cmap.get_bad()]
+
+
+def colormap_lut(cmap, background=(1.0, 1.0, 1.0)) -> np.ndarray:
+    """(N + 3, 3) uint8: under, the N colormap entries, over, bad."""
+    return np.stack([_rgb(c, background) for c in _lut_colors(cmap)])
+
+
+def colormap_rgba_lut(cmap) -> np.ndarray:
+    """(N + 3, 4) uint8 in the same row order, keeping alpha (bad is transparent by default)."""
+    return np.round(np.array([mcolors.to_rgba(c) for c in _lut_colors(cmap)]) * 255).astype(np.uint8)
+
+
+def lut_index(values, vmin: float, vmax: float, n_colors: int) -> np.ndarray:
+    """LUT row (int16) of every value for a colormap with n_colors entries and Normalize(vmin, vmax)."""
+    values = np.asarray(values)
+    n = n_colors
+    span = vmax - vmin
+    # LUT row = floor(normalized * N) + 1, clipped to [0 (under), N + 1 (over)];
+    # truncation equals floor once everything is non-negative. Same float32
+    # operations as Normalize (subtract, divide by the span) so values right
+    # at a colour boundary land in the same entry.
+    scaled = np.asarray(values, dtype=np.float32) - np.float32(vmin)
+    if span > 0:
+        scaled /= np.float32(span)
+    else:
+        scaled[...] = 0
+    scaled *= np.float32(n)
+    scaled += np.float32(1)
+    np.clip(scaled, 0, n + 1, out=scaled)
+    scaled[np.isnan(scaled)] = n + 2
+    idx = scaled.astype(np.int16)
+    # Colormap.__call__ maps exactly vmax to the last entry, not to "over".
+    idx[values == vmax] = n
+    return idx
+
+
+def encode_png(rgb: np.ndarray, dpi: int | None = None, level: int = PNG_COMPRESS_LEVEL) -> bytes:
+    """
+    (H, W, 3) RGB or (H, W, 4) RGBA uint8 -> PNG bytes, every row with filter type 0 (None).
+
+    Pillow always runs the adaptive per-row filter search, which costs more
+    than the rest of a slice put together; smooth colormapped fields compress
+    well without it.
+    """
+    h, w, channels = rgb.shape
+    rows = np.empty((h, w * channels + 1), dtype=np.uint8)
+    rows[:, 0] = 0
+    rows[:, 1:] = rgb.reshape(h, w * channels)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    parts = [b"\x89PNG\r\n\x1a\n", chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 6 if channels == 4 else 2, 0, 0, 0))]
+    if dpi:
+        ppm = int(round(dpi / 0.0254))
+        parts.append(chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1)))
+    parts.append(chunk(b"IDAT", zlib.compress(rows.tobytes(), level)))
+    parts.append(chunk(b"IEND", b""))
+    return b"".join(parts)
+
+
+class SlicePainter:
+    def __init__(self, fig, ax, im, *, compress_level: int = PNG_COMPRESS_LEVEL):
+        if not PIL_AVAILABLE:
+            raise ImportError("Pillow is required for the direct PNG renderer")
+        self.compress_level = compress_level
+        self.vmin, self.vmax = float(im.norm.vmin), float(im.norm.vmax)
+        self.extent = [float(v) for v in im.get_extent()]
+        self.origin_lower = im.origin == "lower"
+        self.lut = colormap_lut(im.cmap, mcolors.to_rgb(ax.get_facecolor()))
+        self.n_colors = im.cmap.N
+
+        # Title font and position, measured on a placeholder title.
+        title = ax.title
+        placeholder = title.get_text() or "Wind speed @ 100.0 m"
+        title.set_text(placeholder)
+        fig.canvas.draw()
+        box = title.get_window_extent(fig.canvas.get_renderer())
+        font_path = font_manager.findfont(title.get_fontproperties())
+        self.font = ImageFont.truetype(font_path, max(1, int(round(title.get_fontsize() * fig.dpi / 72))))
+        self.title_color = tuple(int(v) for v in _rgb(title.get_color(), (1.0, 1.0, 1.0)))
+
+        # Static overlay: frame and colorbar without the image and title.
+        face, ax_face = fig.patch.get_facecolor(), ax.patch.get_facecolor()
+        visible = im.get_visible()
+        title.set_text("")
+        im.set_visible(False)
+        fig.patch.set_alpha(0)
+        ax.patch.set_alpha(0)
+        fig.canvas.draw()
+        overlay = np.asarray(fig.canvas.buffer_rgba()).astype(np.float32) / 255
+        ax_box = ax.get_window_extent(fig.canvas.get_renderer())
+        fig.patch.set_facecolor(face)
+        ax.patch.set_facecolor(ax_face)
+        im.set_visible(visible)
+        title.set_text(placeholder)
+
+        self.height, self.width = overlay.shape[:2]
+        alpha = overlay[..., 3:]
+        fig_bg = np.asarray(mcolors.to_rgb(face), dtype=np.float32)
+        self.background = np.round((overlay[..., :3] * alpha + fig_bg * (1 - alpha)) * 255).astype(np.uint8)
+        self.title_xy = (float((box.x0 + box.x1) / 2), float(self.height - (box.y0 + box.y1) / 2))
+
+        # Axes box in pixel rows/columns (top-left origin).
+        self.box = (float(ax_box.x0), float(ax_box.y0), float(ax_box.x1), float(ax_box.y1))
+        c0, c1 = int(round(ax_box.x0)), int(round(ax_box.x1))
+        r0, r1 = self.height - int(round(ax_box.y1)), self.height - int(round(ax_box.y0))
+        self.rows, self.cols = slice(max(r0, 0), min(r1, self.height)), slice(max(c0, 0), min(c1, self.width))
+        box_alpha = alpha[self.rows, self.cols, 0]
+        self.edge = np.nonzero(box_alpha > 0)
+        self.edge_alpha = box_alpha[self.edge][:, None]
+        self.edge_rgb = overlay[self.rows, self.cols, :3][self.edge] * 255
+        self._index_shape = None
+
+    def pixel_coords(self, x, y) -> tuple[np.ndarray, np.ndarray]:
+        """Figure pixel (px, py), top-left origin, of data coordinates x, y."""
+        x0, y0, x1, y1 = self.box
+        ex0, ex1, ey0, ey1 = self.extent
+        px = x0 + (np.asarray(x, dtype=np.float64) - ex0) / (ex1 - ex0) * (x1 - x0)
+        py = y0 + (np.asarray(y, dtype=np.float64) - ey0) / (ey1 - ey0) * (y1 - y0)
+        return px, self.height - py
+
+    def _cell_index(self, shape) -> tuple[np.ndarray, np.ndarray]:
+        """Nearest layer row/column for every pixel of the axes box."""
+        if self._index_shape != shape:
+            ny, nx = shape
+            h = self.rows.stop - self.rows.start
+            w = self.cols.stop - self.cols.start
+            cols = np.minimum(((np.arange(w) + 0.5) / w * nx).astype(np.intp), nx - 1)
+            rows = np.minimum(((np.arange(h) + 0.5) / h * ny).astype(np.intp), ny - 1)
+            if self.origin_lower:
+                rows = ny - 1 - rows
+            self._index = (rows[:, None], cols[None, :])
+            self._index_shape = shape
+        return self._index
+
+    def colorize(self, values: np.ndarray) -> np.ndarray:
+        """Values -> RGB uint8 through Normalize(vmin, vmax) and the colormap LUT."""
+        return np.take(self.lut, lut_index(values, self.vmin, self.vmax, self.n_colors), axis=0)
+
+    def image(self, layer: np.ndarray, title: str = ""):
+        """The full slice as a PIL RGB image; layer is (ny, nx), any float dtype."""
+        out = self.background.copy()
+        box = self.colorize(np.asarray(layer)[self._cell_index(layer.shape)])
+        if self.edge[0].size:
+            blended = self.edge_rgb * self.edge_alpha + box[self.edge] * (1 - self.edge_alpha)
+            box[self.edge] = np.round(blended).astype(np.uint8)
+        out[self.rows, self.cols] = box
+        image = Image.fromarray(out)
+        if title:
+            ImageDraw.Draw(image).text(self.title_xy, title, font=self.font, fill=self.title_color, anchor="mm")
+        return image
+
+    def save(self, path: str, layer: np.ndarray, title: str = "", dpi: int | None = None) -> None:
+        data = encode_png(np.asarray(self.image(layer, title)), dpi, self.compress_level)
+        with open(path, "wb") as f:
+            f.write(data)
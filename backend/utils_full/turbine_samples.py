@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Vectorized per-turbine sampling: vertical wind profiles and hub-height wake lines.
+
+The sample points of all turbines are stacked into one (T*K, 3) array of
+(height, y, x) and evaluated with a single interpolator call, so the cost is
+one interpolator pass instead of T Python-level calls. Results are
+packed (T, K) arrays. x/y are in whatever unit the interpolator's horizontal
+axes use (km in process_speed_data / json_visualize, metres in
+precompute_visualization); heights are always metres.
+
+Per-case cache files (visualization_cache/profiles.json, wakes.json) hold the
+packed arrays for every turbine, replacing one JSON file per turbine:
+
+  profiles.json  {"ids": [...], "heights": [K], "speeds": [[K] * T]}
+  wakes.json     {"ids": [...], "hubHeightUsed": [T], "distances": [[K] * T],
+                  "speeds": [[K] * T]}
+
+Non-finite speeds are stored as null.
+"""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+
+from speed_cube import atomic_write_json
+
+PROFILES_FILE = "profiles.json"
+WAKES_FILE = "wakes.json"
+
+
+def turbine_xy(turbines: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    """x, y arrays (T,) from frontend turbine dicts."""
+    x = np.array([t["x"] for t in turbines], dtype=np.float64)
+    y = np.array([t["y"] for t in turbines], dtype=np.float64)
+    return x, y
+
+
+def sample_profiles(f_interp, x: np.ndarray, y: np.ndarray, heights: np.ndarray) -> np.ndarray:
+    """Speeds (T, K) at heights (K,) above each turbine position."""
+    heights = np.asarray(heights, dtype=np.float64)
+    T, K = len(x), len(heights)
+    if T == 0:
+        return np.empty((0, K))
+    pts = np.column_stack((np.tile(heights, T), np.repeat(y, K), np.repeat(x, K)))
+    return f_interp(pts).reshape(T, K)
+
+
+def sample_wakes(f_interp, x: np.ndarray, y: np.ndarray, sample_height: np.ndarray,
+                 s_vals: np.ndarray, wind_vec, extent=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Speeds (T, K) along the wind direction through each turbine, and the (T, K) mask
+    of points that were interpolated.
+
+    s_vals: signed distances (T, K) from the turbine (negative = upstream).
+    sample_height: (T,) height of each line. With extent = [xmin, xmax, ymin, ymax],
+    points outside it are not interpolated and come back as NaN.
+    """
+    s_vals = np.asarray(s_vals, dtype=np.float64)
+    T, K = s_vals.shape
+    xp = x[:, None] + s_vals * wind_vec[0]
+    yp = y[:, None] + s_vals * wind_vec[1]
+    zp = np.broadcast_to(np.asarray(sample_height, dtype=np.float64)[:, None], (T, K))
+    speeds = np.full((T, K), np.nan)
+    if extent is None:
+        inside = np.ones((T, K), dtype=bool)
+    else:
+        xmin, xmax, ymin, ymax = extent
+        inside = (xp >= xmin) & (xp <= xmax) & (yp >= ymin) & (yp <= ymax)
+    if inside.any():
+        speeds[inside] = f_interp(np.column_stack((zp[inside], yp[inside], xp[inside])))
+    return speeds, inside
+
+
+def packed_list(arr: np.ndarray) -> list:
+    """Nested list of floats with NaN/Inf -> None."""
+    arr = np.asarray(arr, dtype=np.float64)
+    out = arr.tolist()
+    bad = np.argwhere(~np.isfinite(arr)).tolist()
+    if arr.ndim == 1:
+        for (i,) in bad:
+            out[i] = None
+    else:
+        for index in bad:
+            row = out
+            for i in index[:-1]:
+                row = row[i]
+            row[index[-1]] = None
+    return out
+
+
+def write_packed(path: str, payload: dict, **dump_kwargs) -> None:
+    """Atomically write a packed profiles/wakes file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    atomic_write_json(path, payload, **dump_kwargs)
+
@@ -20,10 +20,12 @@ import json
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.colors import Normalize
-from scipy.interpolate import RegularGridInterpolator
 import argparse
 import sys
 
+from speed_cube import load_speed_data
+from grid_sampler import GridSampler
+
 # Optional dependency for more natural masking
 try:
     from perlin_noise import PerlinNoise
@@ -46,14 +48,6 @@ def set_font():
     except Exception as e:
         print(f"Font setting error: {e}")
 
-def load_speed_data(binfile, meta):
-    """加载风速数据"""
-    size = meta.get("size")
-    w, h, l = map(int, size)
-    data = np.fromfile(binfile, dtype=np.float32).reshape((l, h, w))
-    data[np.isinf(data)] = np.nan
-    return data, w, h, l
-
 def improved_range_decay(max_range, R_center_m):
     """改进的径向距离衰减"""
     near_threshold = max_range * 0.3 
@@ -112,10 +106,7 @@ def create_atmospheric_radar_visualization(case_dir, height, radar_config, outpu
     H_levels_m = np.arange(1, num_layers + 1) * dh
     
     # 创建插值器
-    f_interp = RegularGridInterpolator(
-        (H_levels_m, y_coords_km, x_coords_km), data,
-        method='linear', bounds_error=False, fill_value=np.nan
-    )
+    f_interp = GridSampler(data, x_coords_km, y_coords_km, H_levels_m, fill_value=np.nan)
     
     # 雷达扫描参数
     max_range = radar_config.get('max_range', 1500.0)
@@ -266,7 +257,8 @@ def create_atmospheric_radar_visualization(case_dir, height, radar_config, outpu
     
     print(f"大气雷达扫描图已保存: {output_file}")
 
-def main():
+def parse_args(argv=None):
+    """argv 为 None 时读取命令行；批处理驱动 (batch_precompute.py) 传入参数列表"""
     parser = argparse.ArgumentParser(description="生成大气边界层雷达扫描可视化")
     parser.add_argument("input_dir", help="包含数字子文件夹的主数据文件夹路径")
     parser.add_argument("--height", type=float, default=100.0, help="目标绘图高度 (米)")
@@ -274,42 +266,53 @@ def main():
     parser.add_argument("--az_width", type=float, default=40.0, help="扫描扇区宽度 (度)")
     parser.add_argument("--dpi", type=int, default=300, help="输出图像DPI")
     parser.add_argument("--add_mask_noise", action='store_true', help="添加Perlin噪声获得更自然的边缘")
+    return parser.parse_args(argv)
+
+def radar_config_from_args(args):
+    return {
+        'max_range': args.max_range,
+        'az_width': args.az_width,
+        'radial_res': 120,
+        'azimuthal_res': 60,
+        'add_mask_noise': args.add_mask_noise
+    }
+
+def run_radar_for_case(item_path, args, output_pic_dir, radar_config=None):
+    """为一个工况子文件夹生成雷达扫描图；缺少 info.json 时返回 False"""
+    # 获取风况信息用于文件命名
+    info_path = os.path.join(item_path, "info.json")
+    if not os.path.exists(info_path):
+        return False
+    with open(info_path, 'r') as f:
+        info_data = json.load(f)
+    wind_angle = info_data.get("wind", {}).get("angle", 0)
+    wind_speed = info_data.get("wind", {}).get("speed", 10)
     
-    args = parser.parse_args()
+    item_name = os.path.basename(os.path.normpath(item_path))
+    output_filename = f"Atmospheric_Radar_WD{wind_angle:.0f}_WS{wind_speed:.1f}_Case{item_name}_H{args.height:.0f}m.png"
+    output_file = os.path.join(output_pic_dir, output_filename)
+    create_atmospheric_radar_visualization(item_path, args.height, radar_config or radar_config_from_args(args), output_file)
+    return True
+
+def main():
+    args = parse_args()
     set_font()
     
     base_input_dir = os.path.abspath(args.input_dir)
     output_pic_dir = os.path.join(base_input_dir, "atmospheric_radar_pics")
     os.makedirs(output_pic_dir, exist_ok=True)
     
-    radar_config = {
-        'max_range': args.max_range,
-        'az_width': args.az_width,
-        'radial_res': 120,
-        'azimuthal_res': 60,
-        'add_mask_noise': args.add_mask_noise
-    }
+    radar_config = radar_config_from_args(args)
     
     processed_count = 0
     for item_name in os.listdir(base_input_dir):
         item_path = os.path.join(base_input_dir, item_name)
         if os.path.isdir(item_path) and item_name.isdigit():
-            # 获取风况信息用于文件命名
-            info_path = os.path.join(item_path, "info.json")
-            if os.path.exists(info_path):
-                with open(info_path, 'r') as f:
-                    info_data = json.load(f)
-                wind_angle = info_data.get("wind", {}).get("angle", 0)
-                wind_speed = info_data.get("wind", {}).get("speed", 10)
-                
-                output_filename = f"Atmospheric_Radar_WD{wind_angle:.0f}_WS{wind_speed:.1f}_Case{item_name}_H{args.height:.0f}m.png"
-                output_file = os.path.join(output_pic_dir, output_filename)
-                
-                try:
-                    create_atmospheric_radar_visualization(item_path, args.height, radar_config, output_file)
+            try:
+                if run_radar_for_case(item_path, args, output_pic_dir, radar_config):
                     processed_count += 1
-                except Exception as e:
-                    print(f"处理案例 {item_name} 时出错: {e}")
+            except Exception as e:
+                print(f"处理案例 {item_name} 时出错: {e}")
     
     print(f"处理完成，共生成 {processed_count} 张大气雷达扫描图")
 
@@ -34,10 +34,12 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.colors import Normalize
 from matplotlib.offsetbox import OffsetImage, AnnotationBbox
-from scipy.interpolate import RegularGridInterpolator
 import warnings
 import sys
 
+from speed_cube import load_speed_data
+from grid_sampler import GridSampler
+
 # Optional dependency for more natural masking
 try:
     from perlin_noise import PerlinNoise
@@ -75,23 +77,9 @@ def set_academic_font():
     })
 
 
-# --- Data Loading ---
-def load_speed_data(binfile, meta):
-    """Loads speed data from .bin file based on metadata."""
-    size = meta.get("size")
-    assert size and len(size) == 3, "output.json 'size' missing/invalid."
-    w, h, l = map(int, size)
-    assert os.path.exists(binfile), f"File not found: {binfile}"
-    try:
-        data = np.fromfile(binfile, dtype=np.float32)
-        assert data.size == w * h * l, f"Data size mismatch: expected {w*h*l}, got {data.size}."
-        return data.reshape((l, h, w)), w, h, l
-    except Exception as e:
-        raise IOError(f"Error reading or reshaping speed data from {binfile}: {e}")
-
 # --- Argument Parsing ---
-def parse_args():
-    """Parses command-line arguments."""
+def parse_args(argv=None):
+    """Parses command-line arguments (argv=None: sys.argv; batch_precompute.py passes a list)."""
     parser = argparse.ArgumentParser(description="生成激光雷达视角尾流风速云图 (2D PPI), 可遍历处理子文件夹.")
     parser.add_argument("input_dir", type=str, help="包含数字子文件夹 (如 '1', '2') 的主数据文件夹路径. 每个子文件夹应包含 speed.bin, info.json, output.json.")
     parser.add_argument("--height", type=float, default=120.0, help="目标绘图高度 (米)，默认为 120.0")
@@ -113,7 +101,7 @@ def parse_args():
     parser.add_argument("--icon_zoom", type=float, default=0.1, help="风机图标的缩放比例")
     parser.add_argument("--dpi", type=int, default=150, help="输出图像的 DPI")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     if args.add_mask_noise and not _PERLIN_AVAILABLE:
         warnings.warn("Perlin noise requested (--add_mask_noise) but 'perlin-noise' library not found. Disabling noise feature.")
         args.add_mask_noise = False
@@ -269,10 +257,7 @@ def run_visualization_for_case(current_case_dir, base_args, output_pic_dir_base)
     H_levels = np.arange(1, num_layers + 1) * dh
 
     try:
-        f_interp = RegularGridInterpolator(
-            (H_levels, y_sim_m, x_sim_m), data,
-            method='linear', bounds_error=False, fill_value=np.nan
-        )
+        f_interp = GridSampler(data, x_sim_m, y_sim_m, H_levels, fill_value=np.nan)
     except ValueError as e:
         print(f"    创建插值器时出错 for case {case_name_part}: {e}. 跳过此工况。")
         return
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Process pool shared by the parallel precompute steps (slice_render, xyz_tiles,
+preStreamLines, batch_precompute) and base/solver/post.py.
+
+run_pool() calls task(*args) for every argument tuple on a pool whose workers
+each run initializer(*initargs) once, and returns the results in task order;
+on_result(i, result) sees them as they finish. The pool forks where possible,
+so workers inherit what the parent already loaded. With one worker, or when a
+pool cannot be started (no semaphores, restricted sandbox), the tasks run in
+this process after the same initializer.
+
+A worker that dies (segfault, os._exit) breaks the whole pool. Tasks that had
+not started are resubmitted to a fresh pool; the ones that were running are
+re-run one at a time in a single-worker pool, and only a task that dies there
+is charged: its result is crashed(*args), or BrokenProcessPool is raised when
+no crashed callback is given.
+
+Worker count: the `workers` argument, else the environment variable `env`
+(PRECOMPUTE_WORKERS unless the caller names another), else `default`;
+<= 0 means every CPU.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable
+
+
+def resolve_workers(workers: int | None, n_tasks: int, env: str = "PRECOMPUTE_WORKERS", default: int = 0) -> int:
+    """--workers first, then the environment variable; <= 0 means every CPU. Never more than the tasks."""
+    if workers is None:
+        try:
+            workers = int(os.environ.get(env, "") or default)
+        except ValueError:
+            print(f"Warning: invalid {env}={os.environ.get(env)!r}, using "
+                  f"{'all CPUs' if default <= 0 else default}.", file=sys.stderr)
+            workers = default
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, n_tasks))
+
+
+def pool_context():
+    """fork where the platform has it, else the default start method."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("fork" if "fork" in methods else None)
+
+
+# Per-process state: the task function and the shared flags marking started tasks.
+_task = None
+_started = None
+
+
+def _init_pool_worker(task: Callable, started, initializer: Callable | None, initargs: tuple) -> None:
+    global _task, _started
+    _task, _started = task, started
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_task(i: int, args: tuple):
+    _started[i] = 1
+    return _task(*args)
+
+
+def run_pool(task: Callable, tasks: Iterable, workers: int | None = None, *,
+             initializer: Callable | None = None, initargs: tuple = (),
+             crashed: Callable | None = None, on_result: Callable | None = None, label: str = "tasks") -> list:
+    """
+    Run task(*args) for every tuple in `tasks`; returns the results in task order.
+    `task` and `initializer` must be module-level (picklable) functions.
+    """
+    tasks = [tuple(args) for args in tasks]
+    results = [None] * len(tasks)
+    done = [False] * len(tasks)
+
+    def finish(i, result):
+        results[i], done[i] = result, True
+        if on_result is not None:
+            on_result(i, result)
+
+    workers = resolve_workers(workers, len(tasks))
+    if workers > 1:
+        context = pool_context()
+        pending, suspects = list(range(len(tasks))), []
+        while pending or suspects:
+            solo = not pending
+            group = suspects if solo else pending
+            started = context.RawArray("b", len(tasks))
+            executor = None
+            try:
+                executor = ProcessPoolExecutor(max_workers=1 if solo else min(workers, len(group)),
+                                               mp_context=context, initializer=_init_pool_worker,
+                                               initargs=(task, started, initializer, initargs))
+                futures = {executor.submit(_run_task, i, tasks[i]): i for i in group}
+            except (PermissionError, OSError, NotImplementedError) as pool_err:
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                print(f"Warning: unable to start worker processes ({pool_err}), running {label} serially.",
+                      file=sys.stderr)
+                break
+            broken = False
+            with executor:
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                    else:
+                        finish(futures[future], result)
+            running = [i for i in group if started[i] and not done[i]] if broken else []
+            if broken and not running:
+                print(f"Warning: worker processes died before starting any {label}, running them serially.",
+                      file=sys.stderr)
+                break
+            if solo:
+                for i in running:
+                    if crashed is None:
+                        raise BrokenProcessPool(f"a worker process died running {label} {tasks[i]!r}")
+                    finish(i, crashed(*tasks[i]))
+            elif running:
+                print(f"Warning: a worker process died; re-running {len(running)} {label} one at a time.",
+                      file=sys.stderr)
+                suspects += running
+            pending = [i for i in pending if not done[i] and i not in running]
+            suspects = [i for i in suspects if not done[i]]
+
+    remaining = [i for i in range(len(tasks)) if not done[i]]
+    if remaining:
+        if initializer is not None:
+            initializer(*initargs)
+        for i in remaining:
+            finish(i, task(*tasks[i]))
+    return results